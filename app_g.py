@@ -1,55 +1,22 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from datetime import datetime
 
-# ==============================================================================
-# 1. הגדרות וקבועים גלובליים (מבוסס על הטבלה המלאה שאושרה)
-# ==============================================================================
-# --- תעריפים ---
-DAILY_ADDITIONAL_GRANT_RATE = 144.43
-MINIMUM_NII_DAILY_RATE = 310.5
-
-# --- מענקים ---
-FAMILY_GRANT_CHILDREN = 2500
-FAMILY_GRANT_COMBATANT = 2000
-COUPLES_ASSISTANCE_GRANT = 2500
-SPOUSE_GRANT_MAX = 4000
-
-# --- מענק שנתי ---
-ANNUAL_GRANT_THRESHOLDS = {
-    37: 5400,
-    20: 4050,
-    15: 2700,
-    10: 1350
-}
+from assets import image_source
+from benefit_records import sum_shekels
+from benefits_batch import MAX_RESERVE_DAYS, calculate_benefit_curve_cached, calculate_sweep_cached, curve_breakpoints
+from benefits_g import UNIT_TYPES, ProfileInputs, calculate_all_benefits_cached, results_frame
+from rates import current_rates, pinned_rates, pinned_to
+from rule_engine import get_ruleset
+from charts import COMPOSITION_LABELS, pie_chart
 
-# --- שוברים ---
-VACATION_VOUCHER_THRESHOLDS = {
-    "לוחם/ת": {"days": 45, "value": 4500},
-    "תומכ/ת לחימה": {"days": 45, "value": 3000},
-    "עורפי/ת": {"days": 45, "value": 1500}
-}
-PROFESSIONAL_TRAINING_VOUCHER_VALUE = 7500
+INSIGNIA_WIDTH = 120
 
-# --- תקרות להחזרים ---
-EXPENSE_CEILINGS = {
-    "therapy": 1500,
-    "babysitter_combatant": 2500,
-    "babysitter_other": 1500,
-    "camps_per_child": 2000,
-    "vacation_cancel_family": 5000,
-    "vacation_cancel_per_child": 2500,
-    "pet_boarding": 500,
-    "tuition_combatant": 12000,
-    "tuition_other": 5000
-}
-
-# --- הטבות אקדמיות ---
-ACADEMIC_CREDITS_THRESHOLDS = {28: "4 נ\"ז", 14: "2 נ\"ז"}
+# מקטעי עמוד התוצאות רצים מחדש בנפרד מהעמוד: הם מצמידים את התעריפים שבהם חושבו התוצאות
+session_rates = pinned_to(lambda: st.session_state.get("rates"))
 
 # ==============================================================================
-# 2. פונקציות עזר (UI ומצב אפליקציה)
+# 1. פונקציות עזר (UI ומצב אפליקציה)
 # ==============================================================================
 def change_app_state(new_state):
     st.session_state.app_state = new_state
@@ -66,71 +33,11 @@ def add_footer():
     st.markdown("All rights reserved")
 
 # ==============================================================================
-# 3. פונקציית החישוב המרכזית (יישום מלא של הטבלה)
-# ==============================================================================
-def calculate_all_benefits(inputs):
-    direct, future, potential = [], [], []
-    days = inputs["reserve_days"]
-    unit = inputs["unit_type"]
-    children = inputs["num_children"]
-
-    # לוגיקה מלאה כפי שהייתה בגרסה הקודמת והמלאה...
-    # (העתקתי את כל הלוגיקה כדי להבטיח שלא חסר כלום)
-    daily_nii = max(inputs["gross_salary"] / 30, MINIMUM_NII_DAILY_RATE)
-    direct.append({"רכיב": "תגמול מביטוח לאומי", "פירוט": f"({daily_nii:,.2f} ₪ ליום)", "סכום (₪)": daily_nii * days})
-    if inputs["is_tzav_8"]:
-        direct.append({"רכיב": "תגמול נוסף (חרבות ברזל)", "פירוט": f"({DAILY_ADDITIONAL_GRANT_RATE} ₪ ליום)", "סכום (₪)": DAILY_ADDITIONAL_GRANT_RATE * days})
-    if children > 0 and days >= 8 and inputs["is_tzav_8"]:
-        direct.append({"רכיב": "מענק משפחה (ילדים עד גיל 14)", "פירוט": "מענק חד-פעמי", "סכום (₪)": FAMILY_GRANT_CHILDREN})
-    if unit == "לוחם/ת" and days >= 10:
-        direct.append({"רכיב": "מענק משפחה מוגדל (לוחמים)", "פירוט": "מענק חד-פעמי", "סכום (₪)": FAMILY_GRANT_COMBATANT})
-    elif unit != "לוחם/ת" and days >= 30:
-         direct.append({"רכיב": "מענק משפחה מוגדל", "פירוט": "עבור שירות של 30+ יום", "סכום (₪)": FAMILY_GRANT_COMBATANT})
-    for threshold, amount in ANNUAL_GRANT_THRESHOLDS.items():
-        if days >= threshold:
-            if threshold == 10 and unit != "לוחם/ת": continue
-            future.append({"רכיב": "מענק שנתי", "פירוט": f"עבור {days} ימי שירות, ישולם במאי", "סכום (₪)": amount})
-            break
-    if inputs["therapy_cost"] > 0:
-        potential.append({"זכאות": "החזר טיפול רגשי/נפשי", "פירוט": "מותנה בקבלות", "שווי פוטנציאלי (₪)": min(inputs["therapy_cost"], EXPENSE_CEILINGS["therapy"])})
-    if inputs["pet_boarding_cost"] > 0 and days >= 8:
-        potential.append({"זכאות": "החזר פנסיון לבע\"ח", "פירוט": "מותנה בקבלות", "שווי פוטנציאלי (₪)": min(inputs["pet_boarding_cost"], EXPENSE_CEILINGS["pet_boarding"])})
-    if inputs["babysitter_cost"] > 0:
-        if (unit == "לוחם/ת" and days >= 10) or (unit != "לוחם/ת" and days >= 35):
-            ceiling = EXPENSE_CEILINGS["babysitter_combatant"] if unit == "לוחם/ת" else EXPENSE_CEILINGS["babysitter_other"]
-            potential.append({"זכאות": "החזר בייביסיטר/עזרה בבית", "פירוט": "מותנה בקבלות", "שווי פוטנציאלי (₪)": min(inputs["babysitter_cost"], ceiling)})
-    if inputs["camps_cost"] > 0 and inputs["served_during_holidays"]:
-         potential.append({"זכאות": "החזר קייטנות/צהרונים", "פירוט": f"עד {EXPENSE_CEILINGS['camps_per_child']:,.0f} ₪ לילד", "שווי פוטנציאלי (₪)": min(inputs["camps_cost"], EXPENSE_CEILINGS["camps_per_child"] * children)})
-    if inputs["vacation_cancel_cost"] > 0 and inputs["is_tzav_8"]:
-        max_refund = EXPENSE_CEILINGS["vacation_cancel_family"] + (children * EXPENSE_CEILINGS["vacation_cancel_per_child"])
-        potential.append({"זכאות": "החזר ביטול חופשה/טיסה", "פירוט": "עקב גיוס בצו 8", "שווי פוטנציאלי (₪)": min(inputs["vacation_cancel_cost"], max_refund)})
-    if inputs["is_student"]:
-        for d, credits in ACADEMIC_CREDITS_THRESHOLDS.items():
-            if days >= d:
-                potential.append({"זכאות": "נקודות זכות אקדמיות", "פירוט": "מועבר אוטומטית למוסדות", "שווי פוטנציאלי (₪)": credits})
-                break
-        if inputs["tuition_cost"] > 0 and days >= 28:
-            ceiling = EXPENSE_CEILINGS["tuition_combatant"] if unit == "לוחם/ת" else EXPENSE_CEILINGS["tuition_other"]
-            potential.append({"זכאות": "סיוע בשכר לימוד", "פירוט": "דורש הגשת בקשה", "שווי פוטנציאלי (₪)": min(inputs["tuition_cost"], ceiling)})
-    if days >= 20:
-        potential.append({"זכאות": "הנחה בארנונה", "פירוט": "5-25%, יש לפנות לרשות המקומית", "שווי פוטנציאלי (₪)": "משתנה"})
-    unit_vouchers = VACATION_VOUCHER_THRESHOLDS.get(unit)
-    if unit_vouchers and days >= unit_vouchers["days"]:
-        potential.append({"זכאות": "שובר חופשה", "פירוט": "נשלח אוטומטית לזכאים", "שווי פוטנציאלי (₪)": unit_vouchers["value"]})
-    if days >= 45 and inputs["is_tzav_8"]:
-         potential.append({"זכאות": "שובר הכשרה מקצועית", "פירוט": "דרך משרד העבודה", "שווי פוטנציאלי (₪)": PROFESSIONAL_TRAINING_VOUCHER_VALUE})
-         if inputs["is_married"]:
-             potential.append({"זכאות": "סיוע לזוגות", "פירוט": "מענק חד פעמי", "שווי פוטנציאלי (₪)": COUPLES_ASSISTANCE_GRANT})
-    if inputs["is_self_employed"] and days >= 8 and inputs["is_tzav_8"]:
-        potential.append({"זכאות": "קרן סיוע לעצמאיים", "פירוט": "פיצוי על אובדן הכנסות דרך רשות המיסים", "שווי פוטנציאלי (₪)": "תלוי מחזור"})
-
-    return pd.DataFrame(direct), pd.DataFrame(future), pd.DataFrame(potential)
-
-# ==============================================================================
-# 4. הגדרת תצוגות העמודים
+# 2. הגדרת תצוגות העמודים
 # ==============================================================================
 def show_landing_page():
-    st.image("https://upload.wikimedia.org/wikipedia/he/thumb/c/c8/IDF_Reserve_Component_Insignia.svg/1200px-IDF_Reserve_Component_Insignia.svg.png", width=120)
+    # הסמל אינו מצורף למאגר (ראו assets.py): בלי הקובץ מוצגת הכתובת המקורית
+    st.image(image_source("insignia", width=INSIGNIA_WIDTH), width=INSIGNIA_WIDTH)
     st.title("מחשבון זכויות והטבות למשרתי המילואים")
     st.header("כלי עזר להערכת שווי יום מילואים והטבות נלוות (מעודכן \"חרבות ברזל\")")
     st.markdown("---")
@@ -146,13 +53,15 @@ def show_landing_page():
 
 def show_calculator_page():
     st.header("מחשבון הטבות מילואים")
+    # התקרות לפי התעריפים הנוכחיים (rates.json)
+    ceilings = get_ruleset("app_g").constants.EXPENSE_CEILINGS
     with st.form(key="input_form"):
         st.subheader("פרטים אישיים ונתוני שירות")
         c1, c2 = st.columns(2)
         with c1:
             gross_salary = st.number_input("שכר חודשי (ברוטו)", help="החישוב מתבצע לפי הברוטו.", min_value=0, value=15000, step=500)
             reserve_days = st.number_input("סה\"כ ימי מילואים ששירתו", min_value=0, value=30, step=1)
-            unit_type = st.selectbox("סוג יחידה", ["לוחם/ת", "תומכ/ת לחימה", "עורפי/ת"])
+            unit_type = st.selectbox("סוג יחידה", UNIT_TYPES)
         with c2:
             num_children = st.number_input("מספר ילדים (עד גיל 18)", min_value=0, step=1)
             is_married = st.checkbox("נשוי/אה?", value=True)
@@ -166,66 +75,167 @@ def show_calculator_page():
         st.markdown("---")
         st.subheader("הוצאות נלוות (אופציונלי, למילוי רק אם היו הוצאות)")
         with st.expander("👨‍👩‍👧‍👦 הוצאות משפחה וטיפול"):
-            babysitter_cost = render_expense_input('babysitter_cost', 'בייביסיטר/עזרה בבית', EXPENSE_CEILINGS["babysitter_combatant"] if unit_type == "לוחם/ת" else EXPENSE_CEILINGS["babysitter_other"])
-            therapy_cost = render_expense_input('therapy_cost', 'טיפול רגשי/נפשי', EXPENSE_CEILINGS["therapy"])
-            pet_boarding_cost = render_expense_input('pet_boarding_cost', 'פנסיון לבע\"ח', EXPENSE_CEILINGS["pet_boarding"])
+            babysitter_cost = render_expense_input('babysitter_cost', 'בייביסיטר/עזרה בבית', ceilings["babysitter_combatant"] if unit_type == "לוחם/ת" else ceilings["babysitter_other"])
+            therapy_cost = render_expense_input('therapy_cost', 'טיפול רגשי/נפשי', ceilings["therapy"])
+            pet_boarding_cost = render_expense_input('pet_boarding_cost', 'פנסיון לבע\"ח', ceilings["pet_boarding"])
         
         with st.expander("✈️ חופשות, קייטנות ולימודים"):
-            vacation_cancel_cost = render_expense_input('vacation_cancel_cost', 'ביטול חופשה/טיסה', EXPENSE_CEILINGS["vacation_cancel_family"] + (num_children * EXPENSE_CEILINGS["vacation_cancel_per_child"]))
+            vacation_cancel_cost = render_expense_input('vacation_cancel_cost', 'ביטול חופשה/טיסה', ceilings["vacation_cancel_family"] + (num_children * ceilings["vacation_cancel_per_child"]))
             served_during_holidays = st.checkbox("האם השירות כלל את תקופת החופשות (קיץ/חגים)?")
-            camps_cost = render_expense_input('camps_cost', 'קייטנות/צהרונים', EXPENSE_CEILINGS["camps_per_child"] * num_children if num_children > 0 else 0)
-            tuition_cost = render_expense_input('tuition_cost', 'שכר לימוד (לסטודנטים)', EXPENSE_CEILINGS["tuition_combatant"] if unit_type == "לוחם/ת" else EXPENSE_CEILINGS["tuition_other"])
+            camps_cost = render_expense_input('camps_cost', 'קייטנות/צהרונים', ceilings["camps_per_child"] * num_children if num_children > 0 else 0)
+            tuition_cost = render_expense_input('tuition_cost', 'שכר לימוד (לסטודנטים)', ceilings["tuition_combatant"] if unit_type == "לוחם/ת" else ceilings["tuition_other"])
 
         submitted = st.form_submit_button("חשב זכויות", use_container_width=True, type="primary")
         if submitted:
-            st.session_state.inputs = locals()
-            df1, df2, df3 = calculate_all_benefits(st.session_state.inputs)
-            st.session_state.results = {"direct": df1, "future": df2, "potential": df3}
+            # רשומה קפואה עם שדות החישוב בלבד, במקום locals() (שכלל גם את רכיבי הטופס)
+            st.session_state.inputs = ProfileInputs(
+                reserve_days=reserve_days, unit_type=unit_type, gross_salary=gross_salary,
+                num_children=num_children, is_tzav_8=is_tzav_8, is_married=is_married,
+                is_student=is_student, is_self_employed=is_self_employed, served_during_holidays=served_during_holidays,
+                therapy_cost=therapy_cost, pet_boarding_cost=pet_boarding_cost, babysitter_cost=babysitter_cost,
+                camps_cost=camps_cost, vacation_cancel_cost=vacation_cancel_cost, tuition_cost=tuition_cost,
+            )
+            # BenefitResults מהמטמון המשותף: אותו אובייקט לכל הסשנים עם אותו קלט
+            st.session_state.rates = current_rates()  # תמונת המצב של הריצה, נשמרת יחד עם התוצאות
+            st.session_state.results = calculate_all_benefits_cached(st.session_state.inputs)
             change_app_state('results')
 
     add_footer()
 
-# [נוסף] פונקציה להזרקת CSS ליישור האפליקציה לימין (RTL)
+# [נוסף] CSS ליישור האפליקציה לימין (RTL) - נבנה פעם אחת בטעינת המודול
+RTL_STYLE = """
+    <style>
+        /* General body and main container */
+        body, .main, div[data-testid="stAppViewContainer"] {
+            direction: rtl;
+        }
+        
+        /* Align all text elements to the right */
+        h1, h2, h3, h4, h5, h6, p, label, li, .st-emotion-cache-1629p8f e1nzilvr5 {
+            text-align: right !important;
+        }
+
+        /* Ensure input/widget labels are aligned correctly */
+        .stTextInput label, .stNumberInput label, .stSelectbox label, .stCheckbox label {
+             text-align: right !important;
+             width: 100%;
+        }
+
+        /* Align expander headers */
+        .st-emotion-cache-1h9usn1 span {
+            text-align: right !important;
+        }
+
+        /* Align dataframe headers and content */
+        .stDataFrame th, .stDataFrame td {
+            text-align: right !important;
+            direction: rtl;
+        }
+        
+        /* Align metric labels */
+        div[data-testid="stMetricLabel"] {
+            text-align: right !important;
+        }
+    </style>
+"""
+
 def apply_rtl_style():
     """
     Applies custom CSS to the Streamlit app to enforce RTL layout.
+
+    Called once per full script run; fragment reruns (what-if slider,
+    charts, tables) do not re-inject it.
     """
-    rtl_style = """
-        <style>
-            /* General body and main container */
-            body, .main, div[data-testid="stAppViewContainer"] {
-                direction: rtl;
-            }
-            
-            /* Align all text elements to the right */
-            h1, h2, h3, h4, h5, h6, p, label, li, .st-emotion-cache-1629p8f e1nzilvr5 {
-                text-align: right !important;
-            }
+    st.markdown(RTL_STYLE, unsafe_allow_html=True)
 
-            /* Ensure input/widget labels are aligned correctly */
-            .stTextInput label, .stNumberInput label, .stSelectbox label, .stCheckbox label {
-                 text-align: right !important;
-                 width: 100%;
-            }
+# כל מקטע בעמוד התוצאות הוא fragment: הזזת הסליידר מריצה מחדש רק את מקטע "מה אם?"
+@st.fragment
+@session_rates
+def daily_value_metrics(total_direct, total_all_in, days):
+    st.subheader("שווי יום מילואים")
+    col1, col2 = st.columns(2)
+    col1.metric("שווי יום (תשלום ישיר)", f"{total_direct / days:,.2f} ₪")
+    col2.metric("שווי יום (פוטנציאל מלא)", f"{total_all_in / days:,.2f} ₪", help="כולל תשלומים ישירים, עתידיים ומימוש כל ההטבות הפוטנציאליות")
 
-            /* Align expander headers */
-            .st-emotion-cache-1h9usn1 span {
-                text-align: right !important;
-            }
+@st.fragment
+@session_rates
+def what_if_section(inputs, total_all_in):
+    # [חדש] "מה אם?" - העקומה מחושבת פעם אחת לכל פרופיל, הסליידר רק קורא ממנה
+    st.subheader("מה אם? שווי יום לפי מספר ימי המילואים")
+    curve = calculate_benefit_curve_cached(inputs)
+    breakpoints = curve_breakpoints(curve)
+    what_if_days = st.slider("ימי מילואים", min_value=0, max_value=MAX_RESERVE_DAYS, value=min(int(inputs.reserve_days), MAX_RESERVE_DAYS), key="what_if_days")
+    point = curve.loc[what_if_days]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("שווי יום (תשלום ישיר)", f"{point['daily_direct']:,.2f} ₪")
+    col2.metric("שווי יום (פוטנציאל מלא)", f"{point['daily_all_in']:,.2f} ₪")
+    col3.metric("שווי כולל", f"{point['total']:,.0f} ₪", delta=f"{point['total'] - total_all_in:,.0f} ₪")
+    curve_fig = px.line(
+        curve.reset_index(),
+        x="reserve_days",
+        y=["daily_all_in", "daily_direct"],
+        labels={"reserve_days": "ימי מילואים", "value": "שווי יום (₪)", "variable": ""},
+    )
+    for day in breakpoints:
+        curve_fig.add_vline(x=day, line_dash="dot", line_color="gray")
+    curve_fig.add_vline(x=what_if_days, line_color="red")
+    st.plotly_chart(curve_fig, use_container_width=True)
+    if breakpoints:
+        st.caption("נקודות מדרגה: " + " | ".join(f"{day} ימים ({jump:+,.0f} ₪)" for day, jump in breakpoints.items()))
 
-            /* Align dataframe headers and content */
-            .stDataFrame th, .stDataFrame td {
-                text-align: right !important;
-                direction: rtl;
-            }
-            
-            /* Align metric labels */
-            div[data-testid="stMetricLabel"] {
-                text-align: right !important;
-            }
-        </style>
-    """
-    st.markdown(rtl_style, unsafe_allow_html=True)
+@st.fragment
+@session_rates
+def composition_chart(total_direct, total_future, total_potential):
+    # [חדש] גרף פאי המציג את הרכב השווי הכולל (נבנה פעם אחת לכל צירוף סכומים, ראו charts.py)
+    st.subheader("הרכב שווי ההטבות הכולל")
+    chart = pie_chart("app_g", [
+        (COMPOSITION_LABELS["direct"], total_direct),
+        (COMPOSITION_LABELS["future"], total_future),
+        (COMPOSITION_LABELS["potential"], total_potential),
+    ]) # הצג רק קטגוריות רלוונטיות
+
+    if chart:
+        st.plotly_chart(chart.figure, use_container_width=True)
+    else:
+        st.info("אין נתונים כספיים להצגה בגרף.")
+
+@st.fragment
+@session_rates
+def value_heatmap(inputs):
+    # [חדש] מפת חום: שווי יום לפי שכר × ימי מילואים, לכל סוג יחידה ושילוב דגלים (חישוב אחד לכל הרשת)
+    st.subheader("שווי יום לפי שכר וימי מילואים")
+    sweep = calculate_sweep_cached(inputs)
+    c1, c2, c3 = st.columns(3)
+    unit_type = c1.selectbox("סוג יחידה", UNIT_TYPES, index=UNIT_TYPES.index(inputs.unit_type), key="heatmap_unit")
+    is_married = c2.checkbox("נשוי/אה", value=inputs.is_married, key="heatmap_married")
+    is_tzav_8 = c3.checkbox("צו 8", value=inputs.is_tzav_8, key="heatmap_tzav_8")
+    daily = sweep.select(sweep.daily_value(), unit_type=unit_type, is_married=is_married, is_tzav_8=is_tzav_8)
+    fig = px.imshow(
+        daily.astype("float32"),
+        x=sweep.axes["reserve_days"],
+        y=sweep.axes["gross_salary"],
+        origin="lower",
+        aspect="auto",
+        color_continuous_scale="Viridis",
+        labels={"x": "ימי מילואים", "y": "שכר ברוטו (₪)", "color": "שווי יום (₪)"},
+    )
+    fig.add_scatter(x=[inputs.reserve_days], y=[inputs.gross_salary], mode="markers", showlegend=False,
+                    marker=dict(color="red", size=10, symbol="x"), hoverinfo="skip")
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+@session_rates
+def results_tables(results):
+    # הצגת הטבלאות המפורטות
+    if results.direct:
+        st.subheader("פירוט תשלומים ישירים ומענקים")
+        st.dataframe(results_frame(results, "direct"), use_container_width=True)
+    if results.future:
+        st.subheader("פירוט תשלומים עתידיים")
+        st.dataframe(results_frame(results, "future"), use_container_width=True)
+    if results.potential:
+        st.subheader("פירוט החזרי הוצאות וזכאויות למימוש יזום")
+        st.dataframe(results_frame(results, "potential"), use_container_width=True)
 
 def show_results_page():
     st.header("📊 סיכום הטבות וזכאויות")
@@ -234,67 +244,38 @@ def show_results_page():
     
     st.subheader("פרופיל החייל שהוזן:")
     st.markdown(f"""
-    - **ימי מילואים:** `{inputs['reserve_days']}` | **סוג יחידה:** `{inputs['unit_type']}` | **צו 8:** `{'כן' if inputs['is_tzav_8'] else 'לא'}`
-    - **שכר ברוטו:** `{inputs['gross_salary']:,.0f} ₪` | **מצב משפחתי:** `{'נשוי/אה' if inputs['is_married'] else 'רווק/ה'}`, `{inputs['num_children']} ילדים`
-    - **סטטוסים:** `{'סטודנט/ת' if inputs['is_student'] else ''}`, `{'עצמאי/ת' if inputs['is_self_employed'] else ''}`
+    - **ימי מילואים:** `{inputs.reserve_days}` | **סוג יחידה:** `{inputs.unit_type}` | **צו 8:** `{'כן' if inputs.is_tzav_8 else 'לא'}`
+    - **שכר ברוטו:** `{inputs.gross_salary:,.0f} ₪` | **מצב משפחתי:** `{'נשוי/אה' if inputs.is_married else 'רווק/ה'}`, `{inputs.num_children} ילדים`
+    - **סטטוסים:** `{'סטודנט/ת' if inputs.is_student else ''}`, `{'עצמאי/ת' if inputs.is_self_employed else ''}`
     """)
     st.markdown("---")
     
     # [חדש] חישוב סכומים כוללים ושוויי יומי
-    total_direct = results["direct"]["סכום (₪)"].sum()
-    total_future = results["future"]["סכום (₪)"].sum()
+    total_direct = results.total("direct")
+    total_future = results.total("future")
     # שווי פוטנציאלי הוא רק מספרים, נתעלם מטקסט
-    total_potential = pd.to_numeric(results["potential"]["שווי פוטנציאלי (₪)"], errors='coerce').sum()
-    total_all_in = total_direct + total_future + total_potential
-    days = inputs['reserve_days'] if inputs['reserve_days'] > 0 else 1 # למנוע חלוקה באפס
+    total_potential = results.total("potential")
+    total_all_in = sum_shekels((total_direct, total_future, total_potential))
+    days = inputs.reserve_days if inputs.reserve_days > 0 else 1 # למנוע חלוקה באפס
     
-    st.subheader("שווי יום מילואים")
-    col1, col2 = st.columns(2)
-    col1.metric("שווי יום (תשלום ישיר)", f"{total_direct / days:,.2f} ₪")
-    col2.metric("שווי יום (פוטנציאל מלא)", f"{total_all_in / days:,.2f} ₪", help="כולל תשלומים ישירים, עתידיים ומימוש כל ההטבות הפוטנציאליות")
-
+    daily_value_metrics(total_direct, total_all_in, days)
     st.markdown("---")
-
-    # [חדש] גרף פאי המציג את הרכב השווי הכולל
-    st.subheader("הרכב שווי ההטבות הכולל")
-    chart_data = pd.DataFrame({
-        'קטגוריה': ['תשלומים ישירים', 'תשלומים עתידיים', 'פוטנציאל מימוש'],
-        'סכום': [total_direct, total_future, total_potential]
-    })
-    chart_data = chart_data[chart_data['סכום'] > 0] # הצג רק קטגוריות רלוונטיות
-    
-    if not chart_data.empty:
-        fig = px.pie(
-            chart_data, 
-            names='קטגוריה', 
-            values='סכום',
-            color_discrete_sequence=px.colors.qualitative.Pastel,
-        )
-        fig.update_traces(textposition='inside', textinfo='percent+label', insidetextfont=dict(size=14, color='black'))
-        fig.update_layout(showlegend=True, title_text='חלוקת שווי ההטבות', title_x=0.5)
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("אין נתונים כספיים להצגה בגרף.")
-
+    what_if_section(inputs, total_all_in)
     st.markdown("---")
-
-    # הצגת הטבלאות המפורטות
-    if not results["direct"].empty:
-        st.subheader("פירוט תשלומים ישירים ומענקים")
-        st.dataframe(results["direct"], use_container_width=True)
-    if not results["future"].empty:
-        st.subheader("פירוט תשלומים עתידיים")
-        st.dataframe(results["future"], use_container_width=True)
-    if not results["potential"].empty:
-        st.subheader("פירוט החזרי הוצאות וזכאויות למימוש יזום")
-        st.dataframe(results["potential"], use_container_width=True)
+    col_pie, col_heatmap = st.columns(2)
+    with col_pie:
+        composition_chart(total_direct, total_future, total_potential)
+    with col_heatmap:
+        value_heatmap(inputs)
+    st.markdown("---")
+    results_tables(results)
 
     st.markdown("---")
     st.button("⬅️ בצע חישוב חדש", on_click=change_app_state, args=('calculator',), use_container_width=True)
     add_footer()
 
 # ==============================================================================
-# 5. הפונקציה הראשית (Main)
+# 3. הפונקציה הראשית (Main)
 # ==============================================================================
 def run_app():
     st.set_page_config(layout="centered", page_title="מחשבון זכויות מילואים")
@@ -305,9 +286,11 @@ def run_app():
     if 'app_state' not in st.session_state:
         st.session_state.app_state = 'landing'
 
-    if st.session_state.app_state == 'landing': show_landing_page()
-    elif st.session_state.app_state == 'calculator': show_calculator_page()
-    elif st.session_state.app_state == 'results': show_results_page()
+    # כל ריצה של הסקריפט מחושבת עם תמונת מצב אחת של התעריפים
+    with pinned_rates():
+        if st.session_state.app_state == 'landing': show_landing_page()
+        elif st.session_state.app_state == 'calculator': show_calculator_page()
+        elif st.session_state.app_state == 'results': show_results_page()
 
 if __name__ == '__main__':
     run_app()
@@ -1,356 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px # Import plotly for the pie chart
-# from datetime import date # No longer used for direct date inputs
-
-# הגדרת קבועים עבור סכומי ההטבות (יש לוודא ולעדכן מספרים אלה על פי הנתונים הרשמיים העדכניים)
-# Constants for benefit amounts (these should be verified and updated with official, current figures)
-# הערה: נתונים אלו הם הערכה בלבד ויש לוודא אותם מול מקורות רשמיים.
-# Note: These figures are estimates only and should be verified against official sources.
-ANNUAL_GRANT_PER_DAY_THRESHOLD = 32  # סף ימים למענק שנתי
-ANNUAL_GRANT_AMOUNT_THRESHOLD_1 = 1200 # סכום מענק ראשון
-ANNUAL_GRANT_AMOUNT_THRESHOLD_2 = 2500 # סכום מענק שני
-ANNUAL_GRANT_AMOUNT_THRESHOLD_3 = 4000 # סכום מענק שלישי
-
-FAMILY_GRANT_PER_10_DAYS = 1000  # מענק משפחה מוגדלת לכל 10 ימים
-PERSONAL_EXPENSES_GRANT_PER_10_DAYS = 466  # מענק הוצאות אישיות מוגדל לכל 10 ימים
-ROAD_6_MAX_REFUND = 300  # החזר כביש 6 מקסימלי לחודש קלנדרי
-
-BABYSITTER_MAX_COMBATANT = 3500  # מקסימום בייביסיטר ללוחם
-BABYSITTER_MAX_REAR = 2000  # מקסימום בייביסיטר לעורף
-
-DOG_BOARDING_MAX = 500  # מקסימום פנסיון כלבים
-
-# עבור טיפולים פסיכולוגיים - יש לוודא תנאים וסכומים מדויקים
-# For psychological treatments - precise conditions and amounts need verification
-THERAPY_MAX_LOW_DAYS = 1500  # מקסימום טיפול רגשי - סכום נמוך יותר (הערכה)
-THERAPY_MAX_HIGH_DAYS = 2500  # מקסימום טיפול רגשי - סכום גבוה יותר (הערכה, לרוב ללוחמים ו/או מעל ימי שירות מסוימים)
-THERAPY_DAYS_THRESHOLD = 20 # ימי שירות לטיפול רגשי בסכום גבוה (הערכה)
-
-TUITION_PERCENT_COMBATANT = 1.0  # 100% החזר שכר לימוד ללוחמים
-TUITION_DAYS_THRESHOLD = 20 # ימי שירות להחזר שכר לימוד
-
-CAMPS_MAX_COMBATANT_FAMILY = 2000  # מקסימום קייטנות למשפחה לוחם
-SPOUSE_ONE_TIME_GRANT = 4500  # מענק חד פעמי לבן זוג לא עובד
-
-TZAV_8_DAYS_FOR_TRAINING = 45 # ימי שירות בצו 8 להכשרה מקצועית
-
-# פונקציה לחישוב זכאויות והטבות כספיות
-def calculate_benefits(
-    avg_salary, reserve_days, unit_type, num_children, is_married,
-    has_non_working_spouse, is_student, tuition_cost, used_road_6, road_6_cost,
-    babysitter_cost, dog_boarding_cost, vacation_cancel_cost, therapy_cost,
-    camps_cost, is_tzav_8, mortgage_rent_cost_input, needs_dedicated_medical_assistance, needs_preferred_loans,
-    is_holiday_period_str # New input parameter
-):
-    entitlements = []
-    total_monetary_benefits_immediate = 0
-    total_monetary_benefits_future = 0
-    monetary_breakdown_for_chart = []
-
-    # Convert string boolean to actual boolean
-    is_holiday_period = (is_holiday_period_str == "כן")
-
-    # 1. תגמול ביטוח לאומי (Payment for reserve days based on average salary)
-    # הערה: יש לוודא אם החישוב הוא לפי ברוטו או נטו, ולעדכן את ההנחיה למשתמש בהתאם.
-    # עבור עצמאים, חישוב התגמול שונה (לרוב מבוסס על הכנסה חייבת). נדרש מחקר נוסף.
-    # Note: It needs to be verified if the calculation is based on gross or net, and update user instructions accordingly.
-    # For self-employed, compensation calculation is different (usually based on taxable income). Further research required.
-    daily_salary_compensation = 0
-    if avg_salary > 0 and reserve_days > 0:
-        daily_salary_compensation = (avg_salary / 30) * reserve_days # assuming avg_salary is monthly
-        entitlements.append({
-            "קטגוריה": "תשלום שכר",
-            "הטבה / תגמול": "תגמול ביטוח לאומי",
-            "פירוט והערות": f"תשלום עבור {reserve_days} ימי מילואים לפי ממוצע שכר חודשי ({avg_salary:,.0f} ש\"ח). יש לוודא אם הקלט הוא ברוטו/נטו ורלוונטיות לעצמאים.",
-            "סכום משוער (ש״ח)": daily_salary_compensation,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += daily_salary_compensation
-
-    # 2. מענק שנתי (Annual Grant) - Future payment
-    # הערה: יש לוודא סכומים וספי ימים מדויקים למענק שנתי.
-    # Note: Precise amounts and day thresholds for the annual grant need verification.
-    annual_grant = 0
-    if reserve_days >= ANNUAL_GRANT_PER_DAY_THRESHOLD:
-        if reserve_days >= 200:
-            annual_grant = ANNUAL_GRANT_AMOUNT_THRESHOLD_3
-        elif reserve_days >= 60:
-            annual_grant = ANNUAL_GRANT_AMOUNT_THRESHOLD_2
-        elif reserve_days >= ANNUAL_GRANT_PER_DAY_THRESHOLD:
-            annual_grant = ANNUAL_GRANT_AMOUNT_THRESHOLD_1
-
-    if annual_grant > 0:
-        entitlements.append({
-            "קטגוריה": "מענקים שנתיים",
-            "הטבה / תגמול": "מענק שנתי",
-            "פירוט והערות": f"מענק שנתי המשולם ב-1 במאי לשנה העוקבת עבור {reserve_days} ימי שירות. יש לוודא תנאים וסכומים מדויקים.",
-            "סכום משוער (ש״ח)": annual_grant,
-            "סוג תשלום": "עתידי (מאי)"
-        })
-        total_monetary_benefits_future += annual_grant
-        monetary_breakdown_for_chart.append({"name": "מענק שנתי", "value": annual_grant})
-
-    # 3. מענק משפחה מוגדלת (Increased Family Grant)
-    family_grant = 0
-    if is_married and reserve_days > 30 and num_children > 0:
-        additional_days = reserve_days - 30
-        family_grant = (additional_days // 10) * FAMILY_GRANT_PER_10_DAYS
-        if family_grant > 0:
-            entitlements.append({
-                "קטגוריה": "מענקים מיוחדים",
-                "הטבה / תגמול": "מענק משפחה מוגדלת",
-                "פירוט והערות": f"תשלום נוסף למשפחות עבור כל 10 ימי שירות לאחר 30 יום שירות רצופים.",
-                "סכום משוער (ש״ח)": family_grant,
-                "סוג תשלום": "מיידי"
-            })
-            total_monetary_benefits_immediate += family_grant
-            monetary_breakdown_for_chart.append({"name": "מענק משפחה מוגדלת", "value": family_grant})
-
-    # 4. מענק הוצאות אישיות מוגדל (Increased Personal Expenses Grant)
-    personal_expenses_grant = 0
-    if reserve_days > 0:
-        personal_expenses_grant = (reserve_days // 10) * PERSONAL_EXPENSES_GRANT_PER_10_DAYS
-        if personal_expenses_grant > 0:
-            entitlements.append({
-                "קטגוריה": "מענקים מיוחדים",
-                "הטבה / תגמול": "מענק הוצאות אישיות מוגדל",
-                "פירוט והערות": f"מענק מוגדל בהתאם לימי השירות ({PERSONAL_EXPENSES_GRANT_PER_10_DAYS} ש\"ח לכל 10 ימים).",
-                "סכום משוער (ש״ח)": personal_expenses_grant,
-                "סוג תשלום": "מיידי"
-            })
-            total_monetary_benefits_immediate += personal_expenses_grant
-            monetary_breakdown_for_chart.append({"name": "מענק הוצאות אישיות מוגדל", "value": personal_expenses_grant})
-
-    # 5. החזר כביש 6 (Road 6 Refund)
-    road_6_refund = 0
-    if used_road_6 and road_6_cost > 0:
-        road_6_refund = min(road_6_cost, ROAD_6_MAX_REFUND)
-        entitlements.append({
-            "קטגוריה": "מענקי הוצאות",
-            "הטבה / תגמול": "החזר כביש 6",
-            "פירוט והערות": f"החזר עד {ROAD_6_MAX_REFUND} ש\"ח לחודש קלנדרי.",
-            "סכום משוער (ש״ח)": road_6_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += road_6_refund
-        monetary_breakdown_for_chart.append({"name": "החזר כביש 6", "value": road_6_refund})
-
-    # 6. בייביסיטר (Babysitter)
-    babysitter_refund = 0
-    if num_children > 0 and babysitter_cost > 0:
-        max_babysitter_refund = BABYSITTER_MAX_COMBATANT if unit_type == "לוחם" else BABYSITTER_MAX_REAR
-        babysitter_refund = min(babysitter_cost, max_babysitter_refund)
-        entitlements.append({
-            "קטגוריה": "החזרי הוצאות אישיות",
-            "הטבה / תגמול": "בייביסיטר",
-            "פירוט והערות": f"החזר עד {max_babysitter_refund} ש\"ח לחודש (ללוחמים/עורף).",
-            "סכום משוער (ש״ח)": babysitter_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += babysitter_refund
-        monetary_breakdown_for_chart.append({"name": "בייביסיטר", "value": babysitter_refund})
-
-    # 7. פנסיון כלבים (Dog Boarding)
-    dog_boarding_refund = 0
-    if dog_boarding_cost > 0:
-        dog_boarding_refund = min(dog_boarding_cost, DOG_BOARDING_MAX)
-        entitlements.append({
-            "קטגוריה": "החזרי הוצאות אישיות",
-            "הטבה / תגמול": "פנסיון כלבים",
-            "פירוט והערות": f"החזר עד {DOG_BOARDING_MAX} ש\"ח.",
-            "סכום משוער (ש״ח)": dog_boarding_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += dog_boarding_refund
-        monetary_breakdown_for_chart.append({"name": "פנסיון כלבים", "value": dog_boarding_refund})
-
-    # 8. ביטול חופשה וטיסה (Cancellation of Vacation/Flight)
-    vacation_cancel_refund = 0
-    if vacation_cancel_cost > 0:
-        vacation_cancel_refund = vacation_cancel_cost
-        entitlements.append({
-            "קטגוריה": "החזרי הוצאות",
-            "הטבה / תגמול": "ביטול חופשה וטיסה",
-            "פירוט והערות": "פיצוי מלא או חלקי בהתאם לתנאים.",
-            "סכום משוער (ש״ח)": vacation_cancel_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += vacation_cancel_refund
-        monetary_breakdown_for_chart.append({"name": "ביטול חופשה וטיסה", "value": vacation_cancel_refund})
-
-    # 9. טיפול רגשי ונפשי (Emotional and Psychological Treatment)
-    # הערה: יש לוודא תנאים וסכומים מדויקים לטיפולים שונים (אישי, זוגי).
-    # Note: Precise conditions and amounts for various treatments (individual, couple) need verification.
-    therapy_refund = 0
-    if therapy_cost > 0:
-        max_therapy_refund = THERAPY_MAX_HIGH_DAYS if (unit_type == "לוחם" and reserve_days >= THERAPY_DAYS_THRESHOLD) else THERAPY_MAX_LOW_DAYS
-        therapy_refund = min(therapy_cost, max_therapy_refund)
-        entitlements.append({
-            "קטגוריה": "טיפול רגשי ונפשי",
-            "הטבה / תגמול": "טיפול אישי וזוגי",
-            "פירוט והערות": f"החזר עד {max_therapy_refund} ש\"ח, תלוי בימי השירות ובסוג היחידה. יש לוודא ספציפית לטיפול אישי/זוגי.",
-            "סכום משוער (ש״ח)": therapy_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += therapy_refund
-        monetary_breakdown_for_chart.append({"name": "טיפול רגשי ונפשי", "value": therapy_refund})
-
-    # 10. החזר שכר לימוד לסטודנטים (Tuition Fee Refund for Students)
-    tuition_refund = 0
-    if is_student and tuition_cost > 0 and unit_type == "לוחם" and reserve_days >= TUITION_DAYS_THRESHOLD:
-        tuition_refund = tuition_cost * TUITION_PERCENT_COMBATANT
-        entitlements.append({
-            "קטגוריה": "זכאות מיוחדת לסטודנטים",
-            "הטבה / תגמול": "החזר שכר לימוד",
-            "פירוט והערות": f"עד 100% ללוחמים (תלוי במספר ימי שירות).",
-            "סכום משוער (ש״ח)": tuition_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += tuition_refund
-        monetary_breakdown_for_chart.append({"name": "החזר שכר לימוד", "value": tuition_refund})
-
-    # 11. השתתפות בקייטנות (Participation in Summer Camps)
-    # הערה: נתון 'is_holiday_period' אינו משפיע ישירות על סכום הקייטנות, אלא על זכאות כללית.
-    # יש לוודא אם קיימת הטבה כספית ישירה על סמך תקופת חג/קיץ ללא קשר להוצאה ספציפית.
-    # Note: 'is_holiday_period' does not directly affect camp refund amount, only general eligibility.
-    # Verify if a direct monetary benefit exists based on holiday/summer period regardless of specific expense.
-    camps_refund = 0
-    if num_children > 0 and camps_cost > 0 and unit_type == "לוחם":
-        camps_refund = min(camps_cost, CAMPS_MAX_COMBATANT_FAMILY)
-        entitlements.append({
-            "קטגוריה": "הטבות משפחתיות",
-            "הטבה / תגמול": "השתתפות בקייטנות",
-            "פירוט והערות": f"עד {CAMPS_MAX_COMBATANT_FAMILY} ש\"ח בשנה למשפחה (לוחמים).",
-            "סכום משוער (ש״ח)": camps_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += camps_refund
-        monetary_breakdown_for_chart.append({"name": "השתתפות בקייטנות", "value": camps_refund})
-
-    if has_non_working_spouse and is_married:
-        entitlements.append({
-            "קטגוריה": "מענקים מיוחדים",
-            "הטבה / תגמול": "מענק חד פעמי לבן זוג לא עובד",
-            "פירוט והערות": f"{SPOUSE_ONE_TIME_GRANT} ש\"ח חד פעמי.",
-            "סכום משוער (ש״ח)": SPOUSE_ONE_TIME_GRANT,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += SPOUSE_ONE_TIME_GRANT
-        monetary_breakdown_for_chart.append({"name": "מענק חד פעמי לבן זוג לא עובד", "value": SPOUSE_ONE_TIME_GRANT})
-
-    if is_tzav_8 and reserve_days >= TZAV_8_DAYS_FOR_TRAINING:
-        entitlements.append({
-            "קטגוריה": "הטבות תעסוקתיות",
-            "הטבה / תגמול": "שוברים להכשרה מקצועית",
-            "פירוט והערות": f"למשרתים {TZAV_8_DAYS_FOR_TRAINING} ימים ומעלה בצו 8. (הטבה שאינה כספית ישירה)",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "שובר"
-        })
-
-    if reserve_days >= 20:
-        entitlements.append({
-            "קטגוריה": "הטבות נוספות",
-            "הטבה / תגמול": "שוברי חופשה",
-            "פירוט והערות": "שוברים לחופשה/נופש. (הטבה שאינה כספית ישירה)",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "שובר"
-        })
-
-    mortgage_rent_refund = 0
-    if mortgage_rent_cost_input > 0:
-        mortgage_rent_refund = mortgage_rent_cost_input
-        entitlements.append({
-            "קטגוריה": "הטבות מגורים",
-            "הטבה / תגמול": "סיוע בשכר דירה/משכנתא",
-            "פירוט והערות": f"סיוע עד {mortgage_rent_cost_input} ש״ח.",
-            "סכום משוער (ש״ח)": mortgage_rent_refund,
-            "סוג תשלום": "מיידי"
-        })
-        total_monetary_benefits_immediate += mortgage_rent_refund
-        monetary_breakdown_for_chart.append({"name": "סיוע שכר דירה/משכנתא", "value": mortgage_rent_refund})
-
-
-    if reserve_days >= 10:
-        # Corrected syntax for general benefits
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הנחות באגרות רישוי",
-            "פירוט והערות": "הנחות אפשריות באגרות רישוי רכב.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הטבות בתחבורה ציבורית",
-            "פירוט והערות": "הטבות בשימוש בתחבורה ציבורית.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הטבות בביטוחי בריאות משלימים",
-            "פירוט והערות": "הנחות או הטבות בהצטרפות לביטוחי בריאות משלימים.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הטבות בארנונה / מים (רשות מקומית)",
-            "פירוט והערות": "הנחות אפשריות בתשלומי ארנונה או מים.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הטבות במוסדות תרבות ופנאי",
-            "פירוט והערות": "הנחות או כניסה חינם למוזיאונים, תיאטראות וכדומה.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-        entitlements.append({
-            "קטגוריה": "הטבות כלליות",
-            "הטבה / תגמול": "הטבות בנופש ואירוח",
-            "פירוט והערות": "הנחות בבתי מלון, צימרים או אתרי נופש.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-
-    if needs_dedicated_medical_assistance:
-        entitlements.append({
-            "קטגוריה": "בריאות",
-            "הטבה / תגמול": "סיוע רפואי ייעודי",
-            "פירוט והערות": "סיוע רפואי ייעודי דרך אגף שיקום במשרד הביטחון במידה של פציעה/מחלה הקשורה לשירות.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-
-    if needs_preferred_loans:
-        entitlements.append({
-            "קטגוריה": "הטבות כלכליות",
-            "הטבה / תגמול": "הלוואות בתנאים מועדפים",
-            "פירוט והערות": "הלוואות בתנאים מועדפים דרך בנקים או קרנות מסוימות.",
-            "סכום משוער (ש״ח)": "לא כספי",
-            "סוג תשלום": "הטבה"
-        })
-
-    # הטבת נקודות מס 2026 - יש לוודא תנאים וסכומים מדויקים
-    # Tax point benefit 2026 - precise conditions and amounts need verification
-    # if reserve_days >= SOME_THRESHOLD_FOR_TAX_POINTS:
-    #     tax_point_value = CALCULATE_TAX_POINT_VALUE() # Needs implementation
-    #     entitlements.append({
-    #         "קטגוריה": "הטבות מס",
-    #         "הטבה / תגמול": "נקודות מס 2026",
-    #         "פירוט והערות": "הטבת נקודות מס החל מ-2026. יש לוודא זכאות ושווי.",
-    #         "סכום משוער (ש״ח)": "לא כספי", # Assuming non-monetary or needs specific calc
-    #         "סוג תשלום": "עתידי"
-    #     })
-    #     # total_monetary_benefits_future += tax_point_value # Uncomment if monetary
-    #     # monetary_breakdown_for_chart.append({"name": "נקודות מס 2026", "value": tax_point_value}) # Uncomment if monetary
-
-
-    return entitlements, daily_salary_compensation, total_monetary_benefits_immediate, total_monetary_benefits_future, monetary_breakdown_for_chart
+from datetime import date, timedelta
+
+from assets import image_source
+from benefit_records import sum_shekels
+from benefits_g1 import HOLIDAY_PERIODS, INPUT_FIELD_TYPES, BenefitSummary, summarize_benefits_cached
+from charts import pie_chart
+from rates import current_rates, pinned_rates, pinned_to
+from rule_engine import IncrementalEvaluation, get_ruleset
+from service_periods import holiday_calendar, service_fields
+
+LOGO_WIDTH = 180
+MAX_SERVICE_PERIODS = 20
+HOLIDAYS = holiday_calendar(HOLIDAY_PERIODS)
+
+# fragments ו-callbacks רצים מחוץ ל-pinned_rates של הריצה המלאה: הם מצמידים את התעריפים שבהם חושב הסיכום
+session_rates = pinned_to(lambda: st.session_state.get("rates"))
 
 # ==================== FOOTER ====================
 def add_footer():
@@ -358,10 +24,8 @@ def add_footer():
     st.markdown("**@2025 Drishti Consulting | Designed by Dr. Luvchik**", unsafe_allow_html=True)
     st.markdown("All right reserved", unsafe_allow_html=True)
 
-# Set application title and page configuration
-st.set_page_config(layout="wide", page_title="מחשבון הטבות ושווי יום מילואים")
-
-st.markdown("""
+# ==================== STYLE ====================
+APP_STYLE = """
     <style>
         /* General styling for the page */
         html, body, [data-testid="stAppViewContainer"] {
@@ -552,41 +216,269 @@ st.markdown("""
             direction: ltr; /* Ensure footer text is LTR if containing English */
         }
     </style>
-""", unsafe_allow_html=True)
-
-
-# Initialize all session state variables at the very top for robustness
-if 'app_mode' not in st.session_state:
-    st.session_state.app_mode = 'landing_page'
-if 'results_calculated' not in st.session_state:
-    st.session_state.results_calculated = False
-if 'selected_tab_index' not in st.session_state:
-    st.session_state.selected_tab_index = 0 # Default to the first tab (Input Data)
-
-# Initialize variables used in display that are set after calculation
-# These need to be present even if no calculation has happened yet, so they don't throw AttributeError.
-if 'daily_salary_compensation_val' not in st.session_state:
-    st.session_state.daily_salary_compensation_val = 0.0
-if 'total_monetary_benefits_immediate' not in st.session_state:
-    st.session_state.total_monetary_benefits_immediate = 0.0
-if 'total_monetary_benefits_future' not in st.session_state:
-    st.session_state.total_monetary_benefits_future = 0.0
-if 'monetary_breakdown_for_chart' not in st.session_state:
-    st.session_state.monetary_breakdown_for_chart = []
-if 'avg_salary_display' not in st.session_state:
-    st.session_state.avg_salary_display = 0
-if 'reserve_days_display' not in st.session_state:
-    st.session_state.reserve_days_display = 0
-if 'entitlements' not in st.session_state:
-    st.session_state.entitlements = []
-
-
-# Conditional rendering based on app_mode
-if st.session_state.app_mode == 'landing_page':
+"""
+
+def apply_app_style():
+    st.markdown(APP_STYLE, unsafe_allow_html=True)
+
+# ==================== SESSION STATE ====================
+def init_session_state():
+    # Initialize all session state variables at the very top for robustness
+    if 'app_mode' not in st.session_state:
+        st.session_state.app_mode = 'landing_page'
+    if 'selected_tab_index' not in st.session_state:
+        st.session_state.selected_tab_index = 0 # Default to the first tab (Input Data)
+
+    # The last calculation, as one immutable BenefitSummary shared (via the result cache)
+    # by every session with the same inputs; None until "חשב הטבות" is clicked.
+    if 'summary' not in st.session_state:
+        st.session_state.summary = None
+    # עדכון חי (ללא כפתור החישוב): הערכה מצטברת של הפרופיל הנוכחי, נוצרת עם הפעלת המתג
+    if 'live' not in st.session_state:
+        st.session_state.live = None
+    # תמונת המצב של התעריפים שבה חושב הסיכום (None - העדכנית)
+    if 'rates' not in st.session_state:
+        st.session_state.rates = None
+
+# ==================== INPUT SECTIONS ====================
+# כל מקטע קלט הוא fragment: שינוי שאלה מריץ מחדש רק את המקטע שלה ולא את כל האפליקציה
+# (כולל ה-CSS, שתי הלשוניות והגרף). הערכים נקראים מ-session_state לפי מפתח הווידג'ט.
+YES_NO = ["לא", "כן"]
+
+# (כותרת, שאלת כן/לא, מפתח השאלה, תווית הסכום, מפתח הסכום, צעד)
+EXPENSE_SECTIONS = (
+    ("הוצאות כביש 6", "האם השתמשו בכביש 6?", "road_6_enabled_select",
+     "עלות שימוש בכביש 6 לחודש (בשקלים):", "road_6_cost_input", 10),
+    ("הוצאות בייביסיטר", "האם שילמו על בייביסיטר?", "babysitter_enabled_select",
+     "עלות בייביסיטר לחודש (בשקלים):", "babysitter_cost_input", 50),
+    ("הוצאות פנסיון כלבים", "האם שילמו על פנסיון כלבים?", "dog_boarding_enabled_select",
+     "עלות פנסיון כלבים (בשקלים):", "dog_boarding_cost_input", 50),
+    ("הוצאות ביטול חופשה/טיסה", "האם נאלצו לבטל חופשה/טיסה עקב שירות מילואים?", "vacation_cancel_enabled_select",
+     "עלות ביטול חופשה/טיסה (בשקלים, סכום הפיצוי המגיע):", "vacation_cancel_cost_input", 100),
+    ("הוצאות טיפול רגשי/נפשי", "האם שילמו על טיפול רגשי/נפשי?", "therapy_enabled_select",
+     "עלות טיפול רגשי/נפשי (בשקלים):", "therapy_cost_input", 50),
+    ("הוצאות קייטנות", "האם שילמו על קייטנות לילדים?", "camps_enabled_select",
+     "עלות קייטנות (בשקלים, לשנה):", "camps_cost_input", 50),
+    ("הוצאות שכר לימוד", "האם שילמו על שכר לימוד (לסטודנטים)?", "tuition_enabled_select",
+     "עלות שכר לימוד שנתית (בשקלים):", "tuition_cost_input", 100),
+    ("סיוע שכר דירה/משכנתא", "האם זקוקים/קיבלו סיוע בשכר דירה/משכנתא?", "mortgage_rent_checkbox_input",
+     "סכום סיוע בשכר דירה/משכנתא (בשקלים):", "mortgage_rent_input_field", 50),
+)
+
+def section_header(title):
+    st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
+    st.markdown(f"<h3>{title}</h3>", unsafe_allow_html=True)
+
+def section_footer():
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@session_rates
+def service_section():
+    # Section 1: Salary and Service Data
+    section_header("נתוני שכר ושירות")
+    st.number_input("שכר ממוצע ב-3 חודשים אחרונים (נטו, בשקלים):", min_value=0, value=10000, step=100, key="avg_salary_input", on_change=live_update)
+    st.number_input("מספר ימי מילואים ששירתו השנה:", min_value=0, value=30, step=1, key="reserve_days_input", on_change=live_update)
+    st.selectbox("סוג יחידה:", ["לוחם", "עורף"], key="unit_type_select", on_change=live_update)
+    section_footer()
+    live_rerun()
+
+@st.fragment
+@session_rates
+def family_section():
+    # Section 2: Family and Status Details
+    section_header("פרטים משפחתיים וסטטוס")
+    st.selectbox("האם נשואים?", YES_NO, key="is_married_select", on_change=live_update)
+    st.number_input("מספר ילדים (מתחת לגיל 18):", min_value=0, value=0, step=1, key="num_children_input", on_change=live_update)
+    st.selectbox("האם בן/בת הזוג לא עובד/ת?", YES_NO, key="has_non_working_spouse_select", on_change=live_update)
+    st.selectbox("האם סטודנט/ית?", YES_NO, key="is_student_select", on_change=live_update)
+    st.selectbox("האם שירתו בצו 8 השנה?", YES_NO, key="is_tzav_8_select", on_change=live_update)
+    section_footer()
+    live_rerun()
+
+@st.fragment
+@session_rates
+def holiday_section():
+    # Section 3: Reserve Period & Holiday Period
+    # תאריכי השירות (אם הוזנו) קובעים את מספר הימים, החודשים הקלנדריים והחפיפה לתקופות החגים
+    section_header("תקופת שירות מילואים")
+    count = st.number_input("מספר תקופות שירות לפי תאריכים (0 = לפי מספר הימים שהוזן):", min_value=0,
+                            max_value=MAX_SERVICE_PERIODS, value=0, step=1, key="num_periods_input", on_change=live_update)
+    today = date.today()
+    for i in range(count):
+        st.date_input(f"תקופה {i + 1} (מתאריך - עד תאריך):", value=(today - timedelta(days=9), today), format="DD/MM/YYYY",
+                      key=f"period_{i}_input", on_change=live_update)
+    fields = service_period_fields()
+    if fields:
+        st.caption(f"{fields['reserve_days']} ימי שירות (במקום מספר הימים שהוזן) ב-{fields['service_months']} חודשים קלנדריים "
+                   f"(כ-{fields['service_month_share']:.3g} חודשים מלאים), מהם {fields['holiday_days']} ימים בתקופות קייטנות/חגים.")
+    else:
+        st.selectbox("האם המילואים היו בתקופה של קייטנות קיץ/פסח/חגי תשרי?", YES_NO, key="is_holiday_period_select", on_change=live_update)
+    # on_change של מספר התקופות רץ לפני שווידג'טי התאריכים החדשים קיימים; עכשיו הם קיימים,
+    # ולכן עדכון נוסף באותה ריצה (ללא שינוי בקלטים הוא אינו מעריך דבר)
+    live_update()
+    section_footer()
+    live_rerun()
+
+@st.fragment
+@session_rates
+def expense_section(title, question, select_key, cost_label, cost_key, step):
+    # Sections 4-11: שאלת כן/לא, ושדה הסכום מוצג רק אם התשובה "כן"
+    section_header(title)
+    if st.selectbox(question, YES_NO, key=select_key, on_change=live_update) == "כן":
+        st.number_input(cost_label, min_value=0, value=0, step=step, key=cost_key, on_change=live_update)
+    section_footer()
+    live_rerun()
+
+@st.fragment
+@session_rates
+def assistance_section():
+    # Section 12: Medical Assistance & Preferred Loans
+    section_header("סיוע רפואי והלוואות")
+    st.selectbox("האם יש צורך בסיוע רפואי ייעודי עקב פציעה/מחלה הקשורה לשירות?", YES_NO, key="dedicated_medical_select", on_change=live_update)
+    st.selectbox("האם מעוניינים לבדוק זכאות להלוואות בתנאים מועדפים?", YES_NO, key="preferred_loans_select", on_change=live_update)
+    section_footer()
+    live_rerun()
+
+def _yes(key):
+    return st.session_state.get(key) == "כן"
+
+def _expense(select_key, cost_key):
+    return st.session_state.get(cost_key, 0) if _yes(select_key) else 0
+
+def service_period_fields():
+    # reserve_days / service_months / service_month_share / holiday_days מתאריכי השירות, או None כשלא הוזנו תאריכים
+    s = st.session_state
+    periods = [s.get(f"period_{i}_input") for i in range(s.get("num_periods_input", 0))]
+    periods = [period for period in periods if period is not None and len(period) == 2]  # טווח שבחירתו הושלמה
+    return service_fields(periods, HOLIDAYS) if periods else None
+
+def input_args():
+    # הקלטים לפי סדר הפרמטרים של calculate_benefits, מתוך מצב הווידג'טים
+    s = st.session_state
+    fields = service_period_fields()
+    holiday_period = "לא" if fields else s.get("is_holiday_period_select", "לא")  # עם תאריכים: לפי החפיפה לחגים
+    fields = fields or {"reserve_days": s.reserve_days_input, "service_months": 1, "holiday_days": 0, "service_month_share": 0.0}
+    return (
+        s.avg_salary_input, fields["reserve_days"], s.unit_type_select, s.num_children_input, _yes("is_married_select"),
+        _yes("has_non_working_spouse_select"), _yes("is_student_select"),
+        _expense("tuition_enabled_select", "tuition_cost_input"),
+        _yes("road_6_enabled_select"), _expense("road_6_enabled_select", "road_6_cost_input"),
+        _yes("babysitter_enabled_select"),
+        _expense("dog_boarding_enabled_select", "dog_boarding_cost_input"),
+        _expense("vacation_cancel_enabled_select", "vacation_cancel_cost_input"),
+        _expense("therapy_enabled_select", "therapy_cost_input"),
+        _expense("camps_enabled_select", "camps_cost_input"),
+        _yes("is_tzav_8_select"),
+        _expense("mortgage_rent_checkbox_input", "mortgage_rent_input_field"),
+        _yes("dedicated_medical_select"), _yes("preferred_loans_select"),
+        holiday_period, fields["service_months"], fields["holiday_days"], fields["service_month_share"],
+    )
+
+def calculate_from_inputs():
+    # נקרא כ-on_click של כפתור החישוב, לפני הריצה מחדש - כך שאין צורך ב-st.rerun נוסף
+    # חישוב חדש: בתעריפים העדכניים, ותמונת המצב נשמרת יחד עם הסיכום
+    with pinned_rates() as snapshot:
+        st.session_state.summary = summarize_benefits_cached(*input_args())
+        st.session_state.rates = snapshot
+
+def _evaluate_live():
+    s = st.session_state
+    if not s.get("live_toggle"):
+        return
+    inputs = dict(zip(INPUT_FIELD_TYPES, input_args()))
+    ruleset = get_ruleset("app_g1")
+    if s.live is None or s.live.ruleset is not ruleset:  # גם כשהתעריפים התעדכנו
+        s.live = IncrementalEvaluation(ruleset, inputs)
+        changed = True
+    else:
+        changed = s.live.update(inputs)
+    if changed:
+        s.summary = BenefitSummary.from_hits(inputs, s.live.iter_hits())
+        s.rates = current_rates()
+        s.live_changed = True
+
+@session_rates
+def live_update():
+    # on_change של כל שדה קלט: מעריך מחדש רק את הכללים שתלויים בשדות שהשתנו, בתעריפים של הסיכום הנוכחי
+    _evaluate_live()
+
+def toggle_live():
+    # הפעלת המתג מתחילה הערכה חדשה, בתעריפים העדכניים
+    st.session_state.live = None
+    with pinned_rates():
+        _evaluate_live()
+
+def live_rerun():
+    # בסוף כל מקטע קלט: ריצה מחדש של האפליקציה (הסיכום) רק אם תוצאה של כלל כלשהו השתנתה
+    if st.session_state.pop("live_changed", False):
+        st.rerun()
+
+# ==================== SUMMARY SECTIONS ====================
+@st.fragment
+@session_rates
+def summary_metrics():
+    summary = st.session_state.summary
+    daily_salary_value = 0
+    if summary.avg_salary > 0:
+        daily_salary_value = summary.avg_salary / 30
+
+    total_monetary_all_benefits = sum_shekels((summary.daily_salary_compensation, summary.total("immediate"), summary.total("future")))
+    daily_value_with_benefits = 0
+    if summary.reserve_days > 0:
+        daily_value_with_benefits = total_monetary_all_benefits / summary.reserve_days
+
+    col3, col4 = st.columns(2)
+
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>שווי יום מילואים (משכר בלבד)</h3>
+            <p>{daily_salary_value:,.2f} ש"ח</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>שווי יום מילואים (כולל כל ההטבות, מיידיות ועתידיות)</h3>
+            <p>{daily_value_with_benefits:,.2f} ש"ח</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment
+@session_rates
+def summary_chart():
+    # The figure is built once per combination of (rounded) amounts and cached, see charts.py
+    chart = pie_chart("app_g1", st.session_state.summary.chart_slices())
+
+    if chart:
+        st.markdown('<h3 style="text-align: center; color: #333;">הרכב התוספות הכספיות (למעט תגמול שכר)</h3>', unsafe_allow_html=True) # Color changed to black
+        st.plotly_chart(chart.figure, use_container_width=True)
+    else:
+        st.info("אין תוספות כספיות נוספות (מלבד תגמול שכר) לחישוב תרשים פאי, או שלא הוזנו נתונים רלוונטיים.")
+
+@st.fragment
+@session_rates
+def entitlements_table():
+    if st.session_state.summary.records:
+        df_entitlements = pd.DataFrame(st.session_state.summary.entitlements())
+        # Ensure numbers in the table are right-aligned
+        df_entitlements['סכום משוער (ש״ח)'] = df_entitlements['סכום משוער (ש״ח)'].apply(
+            lambda x: f"{x:,.2f}" if isinstance(x, (int, float)) else x
+        )
+        df_entitlements = df_entitlements[['קטגוריה', 'הטבה / תגמול', 'פירוט והערות', 'סוג תשלום', 'סכום משוער (ש״ח)']]
+        st.write("### הטבות והטבות כספיות משוערות שאתם זכאים להן:")
+        st.dataframe(df_entitlements, use_container_width=True)
+    else:
+        st.info("נראה שכרגע אין הטבות כספיות משוערות על בסיס הנתונים שהוזנו. ייתכן שאתם עדיין זכאים להטבות לא כספיות או שהנתונים דורשים בירור נוסף.")
+
+# ==================== PAGES ====================
+def show_landing_page():
     # Logo container for landing page
     st.markdown('<div class="logo-container">', unsafe_allow_html=True)
-    # Using the correct raw GitHub URL for the logo
-    st.image("https://raw.githubusercontent.com/luvchikavi/Hatavot/main/D_logo.png", width=180, caption="Drishti Consulting Logo", use_column_width=False)
+    # The bundled logo, pre-sized and served from memory (no external fetch while the file is present)
+    st.image(image_source("logo", width=LOGO_WIDTH), width=LOGO_WIDTH, caption="Drishti Consulting Logo", use_column_width=False)
     st.markdown('</div>', unsafe_allow_html=True)
 
     st.markdown('<h1 class="main-header" style="margin-top: 100px;">ברוכים הבאים למחשבון הטבות המילואים!</h1>', unsafe_allow_html=True)
@@ -616,7 +508,7 @@ if st.session_state.app_mode == 'landing_page':
     
     add_footer() # Footer for landing page
 
-elif st.session_state.app_mode == 'main_app':
+def show_main_app():
     # Main app content (tabs etc.)
     # Main header styling (repeated for consistency, consider a function if complex)
     st.markdown('<h1 class="main-header">מחשבון הטבות ושווי יום מילואים</h1>', unsafe_allow_html=True)
@@ -633,226 +525,32 @@ elif st.session_state.app_mode == 'main_app':
 
     with tab1:
         st.markdown('<h2 class="subheader">פרטים אישיים ונתוני שירות</h2>', unsafe_allow_html=True)
-
-        # Section 1: Salary and Service Data
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>נתוני שכר ושירות</h3>", unsafe_allow_html=True)
-            avg_salary = st.number_input("שכר ממוצע ב-3 חודשים אחרונים (נטו, בשקלים):", min_value=0, value=10000, step=100, key="avg_salary_input")
-            reserve_days = st.number_input("מספר ימי מילואים ששירתו השנה:", min_value=0, value=30, step=1, key="reserve_days_input")
-            unit_type = st.selectbox("סוג יחידה:", ["לוחם", "עורף"], key="unit_type_select")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 2: Family and Status Details
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>פרטים משפחתיים וסטטוס</h3>", unsafe_allow_html=True)
-            is_married_str = st.selectbox("האם נשואים?", ["לא", "כן"], key="is_married_select")
-            is_married = (is_married_str == "כן")
-            num_children = st.number_input("מספר ילדים (מתחת לגיל 18):", min_value=0, value=0, step=1, key="num_children_input")
-            has_non_working_spouse_str = st.selectbox("האם בן/בת הזוג לא עובד/ת?", ["לא", "כן"], key="has_non_working_spouse_select")
-            has_non_working_spouse = (has_non_working_spouse_str == "כן")
-            is_student_str = st.selectbox("האם סטודנט/ית?", ["לא", "כן"], key="is_student_select")
-            is_student = (is_student_str == "כן")
-            is_tzav_8_str = st.selectbox("האם שירתו בצו 8 השנה?", ["לא", "כן"], key="is_tzav_8_select")
-            is_tzav_8 = (is_tzav_8_str == "כן")
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Section 3: Reserve Period & Holiday Period
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>תקופת שירות מילואים</h3>", unsafe_allow_html=True)
-            is_holiday_period_str = st.selectbox(
-                "האם המילואים היו בתקופה של קייטנות קיץ/פסח/חגי תשרי?",
-                ["לא", "כן"],
-                key="is_holiday_period_select"
-            )
-            st.markdown('</div>', unsafe_allow_html=True)
+        st.session_state.pop("live_changed", None)  # ריצה מלאה כבר מציגה את הסיכום המעודכן
+        service_section()
+        family_section()
+        holiday_section()
 
         st.markdown('<h2 class="subheader">הוצאות נלוות</h2>', unsafe_allow_html=True)
+        for section in EXPENSE_SECTIONS:
+            expense_section(*section)
+        assistance_section()
 
-        # Section 4: Road 6 Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות כביש 6</h3>", unsafe_allow_html=True)
-            road_6_cost_enabled_str = st.selectbox("האם השתמשו בכביש 6?", ["לא", "כן"], key="road_6_enabled_select")
-            road_6_cost_enabled = (road_6_cost_enabled_str == "כן")
-            road_6_cost = 0
-            if road_6_cost_enabled:
-                road_6_cost = st.number_input("עלות שימוש בכביש 6 לחודש (בשקלים):", min_value=0, value=0, step=10, key="road_6_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 5: Babysitter Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות בייביסיטר</h3>", unsafe_allow_html=True)
-            babysitter_cost_enabled_str = st.selectbox("האם שילמו על בייביסיטר?", ["לא", "כן"], key="babysitter_enabled_select")
-            babysitter_cost_enabled = (babysitter_cost_enabled_str == "כן")
-            babysitter_cost = 0
-            if babysitter_cost_enabled:
-                babysitter_cost = st.number_input("עלות בייביסיטר לחודש (בשקלים):", min_value=0, value=0, step=50, key="babysitter_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 6: Dog Boarding Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות פנסיון כלבים</h3>", unsafe_allow_html=True)
-            dog_boarding_cost_enabled_str = st.selectbox("האם שילמו על פנסיון כלבים?", ["לא", "כן"], key="dog_boarding_enabled_select")
-            dog_boarding_cost_enabled = (dog_boarding_cost_enabled_str == "כן")
-            dog_boarding_cost = 0
-            if dog_boarding_cost_enabled:
-                dog_boarding_cost = st.number_input("עלות פנסיון כלבים (בשקלים):", min_value=0, value=0, step=50, key="dog_boarding_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 7: Vacation Cancellation Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות ביטול חופשה/טיסה</h3>", unsafe_allow_html=True)
-            vacation_cancel_cost_enabled_str = st.selectbox("האם נאלצו לבטל חופשה/טיסה עקב שירות מילואים?", ["לא", "כן"], key="vacation_cancel_enabled_select")
-            vacation_cancel_cost_enabled = (vacation_cancel_cost_enabled_str == "כן")
-            vacation_cancel_cost = 0
-            if vacation_cancel_cost_enabled:
-                vacation_cancel_cost = st.number_input("עלות ביטול חופשה/טיסה (בשקלים, סכום הפיצוי המגיע):", min_value=0, value=0, step=100, key="vacation_cancel_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 8: Therapy Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות טיפול רגשי/נפשי</h3>", unsafe_allow_html=True)
-            therapy_cost_enabled_str = st.selectbox("האם שילמו על טיפול רגשי/נפשי?", ["לא", "כן"], key="therapy_enabled_select")
-            therapy_cost_enabled = (therapy_cost_enabled_str == "כן")
-            therapy_cost = 0
-            if therapy_cost_enabled:
-                therapy_cost = st.number_input("עלות טיפול רגשי/נפשי (בשקלים):", min_value=0, value=0, step=50, key="therapy_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 9: Camps Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות קייטנות</h3>", unsafe_allow_html=True)
-            camps_cost_enabled_str = st.selectbox("האם שילמו על קייטנות לילדים?", ["לא", "כן"], key="camps_enabled_select")
-            camps_cost_enabled = (camps_cost_enabled_str == "כן")
-            camps_cost = 0
-            if camps_cost_enabled:
-                camps_cost = st.number_input("עלות קייטנות (בשקלים, לשנה):", min_value=0, value=0, step=50, key="camps_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 10: Tuition Cost
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>הוצאות שכר לימוד</h3>", unsafe_allow_html=True)
-            tuition_cost_enabled_str = st.selectbox("האם שילמו על שכר לימוד (לסטודנטים)?", ["לא", "כן"], key="tuition_enabled_select")
-            tuition_cost_enabled = (tuition_cost_enabled_str == "כן")
-            tuition_cost = 0
-            if tuition_cost_enabled:
-                tuition_cost = st.number_input("עלות שכר לימוד שנתית (בשקלים):", min_value=0, value=0, step=100, key="tuition_cost_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 11: Mortgage/Rent Assistance
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>סיוע שכר דירה/משכנתא</h3>", unsafe_allow_html=True)
-            mortgage_rent_cost_enabled_str = st.selectbox("האם זקוקים/קיבלו סיוע בשכר דירה/משכנתא?", ["לא", "כן"], key='mortgage_rent_checkbox_input')
-            mortgage_rent_cost_enabled = (mortgage_rent_cost_enabled_str == "כן")
-            mortgage_rent_cost_input = 0
-            if mortgage_rent_cost_enabled:
-                mortgage_rent_cost_input = st.number_input("סכום סיוע בשכר דירה/משכנתא (בשקלים):", min_value=0, value=0, step=50, key='mortgage_rent_input_field')
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        # Section 12: Medical Assistance & Preferred Loans
-        with st.container():
-            st.markdown('<div class="input-section-container">', unsafe_allow_html=True)
-            st.markdown("<h3>סיוע רפואי והלוואות</h3>", unsafe_allow_html=True)
-            needs_dedicated_medical_assistance_str = st.selectbox("האם יש צורך בסיוע רפואי ייעודי עקב פציעה/מחלה הקשורה לשירות?", ["לא", "כן"], key="dedicated_medical_select")
-            needs_dedicated_medical_assistance = (needs_dedicated_medical_assistance_str == "כן")
-            needs_preferred_loans_str = st.selectbox("האם מעוניינים לבדוק זכאות להלוואות בתנאים מועדפים?", ["לא", "כן"], key="preferred_loans_select")
-            needs_preferred_loans = (needs_preferred_loans_str == "כן")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-        if st.button("חשב הטבות", key="calculate_button"):
-            st.session_state.entitlements, \
-            st.session_state.daily_salary_compensation_val, \
-            st.session_state.total_monetary_benefits_immediate, \
-            st.session_state.total_monetary_benefits_future, \
-            st.session_state.monetary_breakdown_for_chart = calculate_benefits(
-                avg_salary, reserve_days, unit_type, num_children, is_married,
-                has_non_working_spouse, is_student, tuition_cost, road_6_cost_enabled, road_6_cost,
-                babysitter_cost_enabled, dog_boarding_cost, vacation_cancel_cost, therapy_cost,
-                camps_cost, is_tzav_8, mortgage_rent_cost_input, needs_dedicated_medical_assistance, needs_preferred_loans,
-                is_holiday_period_str # Pass the new input
-            )
-            st.session_state.results_calculated = True
-            st.session_state.avg_salary_display = avg_salary
-            st.session_state.reserve_days_display = reserve_days
-            # Removed automatic tab switch due to potential TypeError on older Streamlit versions.
-            # User will need to manually click "Summary" tab.
-            st.rerun() # Trigger a rerun to update the displayed content
+        # Removed automatic tab switch due to potential TypeError on older Streamlit versions.
+        # User will need to manually click "Summary" tab.
+        st.toggle("עדכון חי של הסיכום (ללא לחיצה על חישוב)", key="live_toggle", on_change=toggle_live)
+        st.button("חשב הטבות", key="calculate_button", on_click=calculate_from_inputs)
 
         add_footer() # Add footer to Input Data tab as well
 
     with tab2:
-        # This block will be displayed if the results_calculated is True, regardless of how the tab was selected.
-        if st.session_state.results_calculated:
+        # This block will be displayed once a summary was calculated, regardless of how the tab was selected.
+        if st.session_state.summary is not None:
             st.markdown('<h2 class="subheader">סיכום הטבות וחישובים</h2>', unsafe_allow_html=True)
-
-            daily_salary_value = 0
-            if st.session_state.avg_salary_display > 0: # This is now safely initialized
-                daily_salary_value = st.session_state.avg_salary_display / 30
-
-            total_monetary_all_benefits = st.session_state.daily_salary_compensation_val + st.session_state.total_monetary_benefits_immediate + st.session_state.total_monetary_benefits_future
-            daily_value_with_benefits = 0
-            if st.session_state.reserve_days_display > 0: # This is now safely initialized
-                daily_value_with_benefits = total_monetary_all_benefits / st.session_state.reserve_days_display
-
-            col3, col4 = st.columns(2)
-
-            with col3:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>שווי יום מילואים (משכר בלבד)</h3>
-                    <p>{daily_salary_value:,.2f} ש"ח</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-            with col4:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>שווי יום מילואים (כולל כל ההטבות, מיידיות ועתידיות)</h3>
-                    <p>{daily_value_with_benefits:,.2f} ש"ח</p>
-                </div>
-                """, unsafe_allow_html=True)
-
+            summary_metrics()
             st.markdown('---')
-
-            chart_data = [item for item in st.session_state.monetary_breakdown_for_chart if item["value"] > 0]
-            
-            if chart_data:
-                df_chart = pd.DataFrame(chart_data)
-                st.markdown('<h3 style="text-align: center; color: #333;">הרכב התוספות הכספיות (למעט תגמול שכר)</h3>', unsafe_allow_html=True) # Color changed to black
-                fig = px.pie(df_chart, values='value', names='name',
-                             title='פירוט התוספות הכספיות באחוזים',
-                             hole=0.4,
-                             color_discrete_sequence=px.colors.qualitative.Pastel)
-                fig.update_traces(textinfo='percent+label', pull=[0.05]*len(df_chart))
-                fig.update_layout(showlegend=True, title_x=0.5)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("אין תוספות כספיות נוספות (מלבד תגמול שכר) לחישוב תרשים פאי, או שלא הוזנו נתונים רלוונטיים.")
-            
+            summary_chart()
             st.markdown('---')
-
-            if st.session_state.entitlements:
-                df_entitlements = pd.DataFrame(st.session_state.entitlements)
-                # Ensure numbers in the table are right-aligned
-                df_entitlements['סכום משוער (ש״ח)'] = df_entitlements['סכום משוער (ש״ח)'].apply(
-                    lambda x: f"{x:,.2f}" if isinstance(x, (int, float)) else x
-                )
-                df_entitlements = df_entitlements[['קטגוריה', 'הטבה / תגמול', 'פירוט והערות', 'סוג תשלום', 'סכום משוער (ש״ח)']]
-                st.write("### הטבות והטבות כספיות משוערות שאתם זכאים להן:")
-                st.dataframe(df_entitlements, use_container_width=True)
-            else:
-                st.info("נראה שכרגע אין הטבות כספיות משוערות על בסיס הנתונים שהוזנו. ייתכן שאתם עדיין זכאים להטבות לא כספיות או שהנתונים דורשים בירור נוסף.")
-
+            entitlements_table()
         else:
             st.info("אנא מלאו את הפרטים בטאב 'Input Data' ולחצו על 'חשב הטבות' כדי לראות את התוצאות.")
 
@@ -865,3 +563,20 @@ elif st.session_state.app_mode == 'main_app':
             """)
         
         add_footer()
+
+# ==================== MAIN ====================
+def run_app():
+    # Set application title and page configuration
+    st.set_page_config(layout="wide", page_title="מחשבון הטבות ושווי יום מילואים")
+    apply_app_style()
+    init_session_state()
+
+    # Conditional rendering based on app_mode, with one snapshot of the rate tables per run
+    with pinned_rates():
+        if st.session_state.app_mode == 'landing_page':
+            show_landing_page()
+        elif st.session_state.app_mode == 'main_app':
+            show_main_app()
+
+if __name__ == '__main__':
+    run_app()
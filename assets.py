@@ -0,0 +1,101 @@
+"""
+תמונות סטטיות (לוגו, סמל המילואים) המוגשות מהזיכרון.
+
+The landing pages used to point the browser at Wikimedia / raw GitHub URLs,
+which costs an external fetch per session and breaks offline deployments.
+Bundled images are instead read from disk once per process, optionally
+scaled down to the width they are displayed at (Pillow, if installed), and
+kept in memory together with a content hash.
+
+Streamlit pages pass `asset.data` to st.image, which serves it under a
+content-addressed media URL. Other servers (benefits_service.py) can send
+`asset.data` with `asset.headers()` - a long-lived Cache-Control and an ETag.
+
+Only the widths the pages display (ASSET_WIDTHS) or the original size are
+produced, so the cache holds at most a few copies of each image. A missing
+file is logged once and the pages fall back to the remote URL they used
+before (ASSET_URLS, see image_source), so nothing disappears from them.
+"""
+import functools
+import hashlib
+import io
+import logging
+import mimetypes
+from pathlib import Path
+from typing import NamedTuple
+
+ASSET_DIR = Path(__file__).resolve().parent
+ASSET_FILES = {
+    "logo": "D_logo.png",
+    # לא מצורף למאגר (זכויות יוצרים) - להעתיק לכאן את הקובץ לפריסה ללא אינטרנט
+    "insignia": "IDF_Reserve_Insignia.png",
+}
+# הכתובות שהעמודים הציגו לפני הצירוף למאגר - גיבוי כשהקובץ חסר
+ASSET_URLS = {
+    "logo": "https://raw.githubusercontent.com/luvchikavi/Hatavot/main/D_logo.png",
+    "insignia": "https://upload.wikimedia.org/wikipedia/he/thumb/c/c8/IDF_Reserve_Component_Insignia.svg/"
+                "1200px-IDF_Reserve_Component_Insignia.svg.png",
+}
+ASSET_WIDTHS = (120, 180)  # סמל המילואים ב-app_g, הלוגו ב-app_g1
+ASSET_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class Asset(NamedTuple):
+    """An image held in memory, ready to be served."""
+
+    name: str
+    data: bytes
+    content_type: str
+    etag: str
+
+    def headers(self):
+        return {
+            "Content-Type": self.content_type,
+            "Cache-Control": f"public, max-age={ASSET_MAX_AGE_SECONDS}, immutable",
+            "ETag": self.etag,
+        }
+
+
+def _resized(data, width):
+    """PNG bytes scaled down to `width` px, or the original bytes (no Pillow / already narrower)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= width:
+            return data
+        height = max(1, round(image.height * width / image.width))
+        out = io.BytesIO()
+        image.resize((width, height), Image.LANCZOS).save(out, format="PNG", optimize=True)
+    return out.getvalue() if out.tell() < len(data) else data
+
+
+@functools.lru_cache(maxsize=len(ASSET_FILES) * (len(ASSET_WIDTHS) + 1))
+def load_asset(name, width=None):
+    """
+    The bundled image registered as `name`, scaled to `width` px if given.
+
+    `width` must be one of ASSET_WIDTHS (ValueError otherwise). Returns None,
+    with a logged warning, when the file is not present; results (including
+    misses) are kept for the life of the process.
+    """
+    if width is not None and width not in ASSET_WIDTHS:
+        raise ValueError(f"unsupported asset width {width} (supported: {', '.join(map(str, ASSET_WIDTHS))})")
+    path = ASSET_DIR / ASSET_FILES[name]
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        logger.warning("asset %r is missing (%s); pages show %s instead", name, path, ASSET_URLS[name])
+        return None
+    if width:
+        data = _resized(data, width)
+    content_type = "image/png" if data[:8] == b"\x89PNG\r\n\x1a\n" else mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return Asset(name, data, content_type, '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"')
+
+def image_source(name, width=None):
+    """What a page passes to st.image: the bundled image's bytes, or its remote URL when the file is missing."""
+    asset = load_asset(name, width)
+    return asset.data if asset else ASSET_URLS[name]
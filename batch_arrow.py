@@ -0,0 +1,262 @@
+"""
+פלט עמודתי (Arrow / Parquet) לתוצאות Batch, עבור מערכות הכספים.
+
+The results of a roster chunk form one long table holding the rows of every
+result table of the rule-set:
+
+    row           int64                      roster row number
+    payment_type  dictionary<int8, string>   the table's label (מיידי / עתידי / ...)
+    rule          dictionary<int16, string>  rule name
+    detail        string
+    amount        float64                    null where the rule has no amount
+    kind          dictionary<int8, string>   value kind (₪, נ"ז, ...)
+
+The dictionaries hold the rule-set's full lists, not only the values seen in
+a chunk, so every part file has the same schema and a code means the same
+thing in all of them. Rows are ordered by table, then roster row, then rule
+order, like the CSV tables written one after the other. The batches are
+built straight from the rule hits: rule names and kinds are codes from the
+start and never become per-row strings.
+
+Arrow IPC files ("arrow") are written uncompressed, so read_results()
+memory-maps them and the columns are used in place, without copying;
+Parquet ("parquet") is smaller and is read by most finance tools.
+
+Coded results (result_codes.py) have a table of their own, one row per hit
+with the rule as a code and the detail as its template values:
+
+    row           int64
+    rule          dictionary<int16, string>  rule id; the code is the rule's position in the rule-set
+    amount        float64
+    p0, f0, t0..  int64 / float64 / dictionary<int32, string>, null where the rule has no such value
+
+The label table (names, tables, kinds, detail templates with the rates
+they show already filled in) and the display columns of each result table
+are kept once, in the schema metadata; read_coded() turns such a file back
+into CodedResults from that alone, whatever the rates file says by then.
+batch_cli --format coded writes its part files this way (as Parquet).
+"""
+import importlib
+import json
+import os
+
+import numpy as np
+
+from benefit_records import VALUE_KINDS
+from result_codes import CodedResults, RuleLabel, calculate_coded, param_columns
+from rule_engine import RULESET_MODULES, evaluate_columns
+
+COLUMNAR_FORMATS = ("parquet", "arrow", "coded")  # coded: coded_table() parts, written as Parquet
+RESULTS_DIR = "results"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Arrow / Parquet output requires pyarrow (pip install pyarrow).") from None
+    return pa
+
+def check_columnar_format(fmt):
+    """Raises ValueError for an unknown format and RuntimeError when pyarrow is missing."""
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"unknown columnar format {fmt!r} (known: {', '.join(COLUMNAR_FORMATS)})")
+    _pyarrow()
+
+def payment_labels(ruleset):
+    """The label of each table of the rule-set (the rule-set module's PAYMENT_TYPES), in table order."""
+    labels = importlib.import_module(RULESET_MODULES[ruleset.name]).PAYMENT_TYPES
+    return [labels[table] for table in ruleset.tables]
+
+def result_schema(ruleset):
+    """The Arrow schema of the results of `ruleset`, tagged with its name and rates version."""
+    pa = _pyarrow()
+    return pa.schema([
+        ("row", pa.int64()),
+        ("payment_type", pa.dictionary(pa.int8(), pa.string())),
+        ("rule", pa.dictionary(pa.int16(), pa.string())),
+        ("detail", pa.string()),
+        ("amount", pa.float64()),
+        ("kind", pa.dictionary(pa.int8(), pa.string())),
+    ], metadata={"ruleset": ruleset.name, "rates": ruleset.version})
+
+def result_batches(ruleset, roster, row_offset=0, dedup=True, report=None):
+    """
+    One RecordBatch (result_schema rows) per table of the rule-set, in `ruleset.tables` order.
+
+    Row numbers are the DataFrame index of `roster` (or positions, for a
+    dict of columns) plus `row_offset`. `dedup` and `report` are passed to
+    evaluate_columns.
+    """
+    pa = _pyarrow()
+    schema = result_schema(ruleset)
+    names = list(dict.fromkeys(rule.name for rule in ruleset.rules))
+    dictionaries = pa.array(payment_labels(ruleset)), pa.array(names), pa.array(VALUE_KINDS)
+    parts = {table: [] for table in ruleset.tables}
+    for hits in evaluate_columns(ruleset, roster, dedup=dedup, report=report):
+        parts[hits.rule.table].append(hits)
+    if hasattr(roster, "index"):
+        index = np.asarray(roster.index, dtype=np.int64) + row_offset
+    else:
+        index = None
+    batches = []
+    for code, table in enumerate(ruleset.tables):
+        hits_list = parts[table]
+        sizes = [hits.rows.size for hits in hits_list]
+        rows = np.concatenate([hits.rows for hits in hits_list] or [np.empty(0, dtype=np.int64)])
+        order = np.repeat(np.arange(len(hits_list)), sizes)
+        # מיון לפי שורה ואז לפי סדר הכללים, כמו בטבלאות ה-CSV
+        sort = np.lexsort((order, rows))
+        rows, order = rows[sort], order[sort]
+        rule_codes = np.array([names.index(hits.rule.name) for hits in hits_list], dtype=np.int16)
+        kind_codes = np.array([VALUE_KINDS.index(hits.rule.kind) for hits in hits_list], dtype=np.int8)
+        details = np.concatenate([np.full(hits.rows.size, hits.notes, dtype=object) if isinstance(hits.notes, str)
+                                  else np.asarray(hits.notes, dtype=object) for hits in hits_list]
+                                 or [np.empty(0, dtype=object)])[sort]
+        amounts = np.concatenate([hits.amounts for hits in hits_list] or [np.empty(0)])[sort]
+        batches.append(pa.RecordBatch.from_arrays([
+            pa.array(index[rows] if index is not None else rows + row_offset, pa.int64()),
+            pa.DictionaryArray.from_arrays(pa.array(np.full(rows.size, code, dtype=np.int8)), dictionaries[0]),
+            pa.DictionaryArray.from_arrays(pa.array(rule_codes[order]), dictionaries[1]),
+            pa.array(details, pa.string()),
+            pa.array(amounts, pa.float64(), from_pandas=True),
+            pa.DictionaryArray.from_arrays(pa.array(kind_codes[order]), dictionaries[2]),
+        ], schema=schema))
+    return batches
+
+# ==============================================================================
+# קבצי חלקים (קובץ לכל מקטע)
+# ==============================================================================
+def part_path(out_dir, chunk, fmt):
+    """Path of the part file holding the results of chunk number `chunk`."""
+    return os.path.join(out_dir, RESULTS_DIR, f"part-{chunk:06d}.{'parquet' if fmt == 'coded' else fmt}")
+
+def write_part(path, ruleset, batches, fmt):
+    """
+    Writes `batches` as one Parquet or Arrow IPC file (atomically, through a
+    temporary file). For "coded" they are coded_table() Tables instead.
+    """
+    pa = _pyarrow()
+    if fmt == "coded":
+        _write_table(path, pa.concat_tables(batches), "parquet")
+    else:
+        _write_table(path, pa.Table.from_batches(batches, schema=result_schema(ruleset)), fmt)
+
+def _write_table(path, table, fmt):
+    pa = _pyarrow()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp)
+    elif fmt == "arrow":
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        check_columnar_format(fmt)
+    os.replace(tmp, path)
+
+def remove_parts(out_dir, keep):
+    """Deletes the part files of chunks numbered `keep` and above (left over by an interrupted run)."""
+    directory = os.path.join(out_dir, RESULTS_DIR)
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        stem = name.split(".", 1)[0]
+        if stem.startswith("part-") and (name.endswith(".tmp") or int(stem[5:]) >= keep):
+            os.remove(os.path.join(directory, name))
+
+def read_results(path):
+    """
+    pyarrow Table of a part file, or of every part file of a results directory in order.
+
+    Arrow IPC parts are memory-mapped: the table's columns point into the
+    mapped files instead of copies of them.
+    """
+    pa = _pyarrow()
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.startswith("part-") and not name.endswith(".tmp"))
+        return pa.concat_tables([read_results(os.path.join(path, name)) for name in names])
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+# ==============================================================================
+# תוצאות מקודדות (result_codes.py)
+# ==============================================================================
+def coded_schema(coded):
+    """The Arrow schema of CodedResults, with its label table and result tables in the metadata."""
+    pa = _pyarrow()
+    types = {"p": pa.int64(), "f": pa.float64(), "t": pa.dictionary(pa.int32(), pa.string())}
+    rules = json.dumps([label._asdict() for label in coded.labels], ensure_ascii=False)
+    tables = json.dumps(coded.tables, ensure_ascii=False)
+    return pa.schema([
+        ("row", pa.int64()),
+        ("rule", pa.dictionary(pa.int16(), pa.string())),
+        ("amount", pa.float64()),
+    ] + [(column, types[column[0]]) for column in param_columns(coded.labels)],
+        metadata={"ruleset": coded.name, "rates": coded.version, "rules": rules, "tables": tables})
+
+def coded_table(coded):
+    """CodedResults as a pyarrow Table (coded_schema rows, in hit order)."""
+    pa = _pyarrow()
+    schema = coded_schema(coded)
+    arrays = [
+        pa.array(coded.hit_rows(), pa.int64()),
+        pa.DictionaryArray.from_arrays(pa.array(coded.rule), pa.array([label.rule_id for label in coded.labels])),
+        pa.array(coded.amount, pa.float64(), from_pandas=True),
+    ]
+    for column in param_columns(coded.labels):
+        used = coded.uses(column)
+        values = np.zeros(len(coded), dtype=coded.params[column].dtype)
+        values[used] = coded.params[column]
+        if column[0] == "t":
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(values, mask=~used), pa.array(coded.texts, pa.string())))
+        else:
+            arrays.append(pa.array(values, mask=~used))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def coded_tables(ruleset, roster, row_offset=0, dedup=True, report=None):
+    """The coded results of a roster chunk as a one-table list (batch_cli --format coded)."""
+    return [coded_table(calculate_coded(ruleset, roster, row_offset, dedup, report))]
+
+def write_coded(path, coded, fmt="parquet"):
+    """Writes CodedResults as one Parquet or Arrow IPC file (atomically, through a temporary file)."""
+    _write_table(path, coded_table(coded), fmt)
+
+def read_coded(path):
+    """
+    CodedResults of a coded table, a file written by write_coded() or a
+    directory of such files (in name order).
+
+    The labels come from the file's metadata, so files written under older
+    rates read (and render their details) the same as on the day they were
+    written.
+    """
+    table = path if not isinstance(path, str) else read_results(path)
+    metadata = table.schema.metadata
+    labels = tuple(RuleLabel(**{name: tuple(value) if isinstance(value, list) else value for name, value in label.items()})
+                   for label in json.loads(metadata[b"rules"]))
+    tables = {name: tuple(columns) for name, columns in json.loads(metadata[b"tables"]).items()}
+    table = table.unify_dictionaries()
+    rules = table.column("rule").combine_chunks()
+    codes = {label.rule_id: code for code, label in enumerate(labels)}
+    rule = np.array([codes[rule_id] for rule_id in rules.dictionary.to_pylist()], dtype=np.int16)
+    rule = rule[rules.indices.to_numpy(zero_copy_only=False)] if len(rules) else np.empty(0, dtype=np.int16)
+    row = table.column("row").to_numpy()
+    first = np.flatnonzero(np.concatenate(([True], row[1:] != row[:-1]))) if row.size else np.empty(0, dtype=np.int64)
+    params, texts = {}, []
+    for column in param_columns(labels):
+        array = table.column(column).combine_chunks()
+        valid = array.is_valid().to_numpy(zero_copy_only=False)
+        if column[0] == "t":
+            # מילון לכל עמודת t בקובץ; בזיכרון - טבלת טקסטים אחת
+            values = array.indices.fill_null(0).to_numpy()[valid].astype(np.int32) + len(texts)
+            texts.extend(array.dictionary.to_pylist())
+        else:
+            values = array.fill_null(0).to_numpy()[valid]
+        params[column] = values
+    return CodedResults(metadata[b"ruleset"].decode(), metadata[b"rates"].decode(), tables, labels, row[first],
+                        np.append(first, row.size).astype(np.int64), rule, table.column("amount").to_numpy(),
+                        params, tuple(texts))
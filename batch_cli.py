@@ -0,0 +1,304 @@
+"""
+שורת פקודה לחישוב הטבות עבור קובץ משרתים שלם (CSV / Parquet), ללא Streamlit.
+
+Streams a roster file through the vectorized rule engine in fixed-size
+chunks and appends one CSV per result table (direct/future/potential for the
+default "app_g" rule-set) to an output directory. With --format parquet or
+--format arrow, each chunk is instead written as one columnar part file in
+out_dir/results/ (schema in batch_arrow.py; read the directory with
+batch_arrow.read_results or any Parquet / Arrow reader). --format coded
+writes Parquet parts of coded results instead (result_codes.py: a rule code
+and the detail's values per hit, the labels once in the file's metadata;
+read them back with batch_arrow.read_coded). A small checkpoint
+file records the last completed chunk so an interrupted run can be resumed
+with --resume.
+
+Usage:
+    python batch_cli.py roster.csv out_dir --chunk-size 50000
+    python batch_cli.py roster.parquet out_dir --resume
+    python batch_cli.py roster_g1.csv out_dir --ruleset app_g1
+    python batch_cli.py roster.csv out_dir --charts png
+    python batch_cli.py roster.csv out_dir --workers 8
+    python batch_cli.py roster.csv out_dir --format parquet
+    python batch_cli.py roster.csv out_dir --format coded
+    python batch_cli.py roster_g1.csv out_dir --ruleset app_g1 --periods call_ups.csv
+
+The whole run uses one snapshot of the rate tables (rates.py); its version
+is kept in the checkpoint, and --resume refuses to mix rates versions.
+
+With --charts, every distinct (rounded) combination of chart totals is
+rendered once, in parallel, into out_dir/charts/, and chart_index.csv maps
+each roster row to its image.
+
+With --workers N, every chunk is split into shards evaluated by N processes
+(batch_executor.py) while the next chunk is being read; the output files are
+byte-identical to a single-process run. Progress lines report rows done,
+throughput and the estimated time left.
+
+Rows that share the inputs a rule reads are evaluated once for that rule
+and the results are copied back to every such row (rule_engine dedup); the
+progress lines show the reduction in rule evaluations it achieved. Pass
+--no-dedup to evaluate every row separately. The output is the same with or
+without it.
+
+--periods FILE gives the actual call-ups: one (row, start, end) line per
+call-up, with the roster row number and ISO dates (both days included), any
+number per soldier, overlapping or not. For the soldiers listed there, the
+days of service, calendar months served (also as the share of each month's
+days served) and holiday overlap (service_periods.py) replace the roster's
+reserve_days, service_months, service_month_share and holiday_days columns.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_arrow import COLUMNAR_FORMATS, check_columnar_format, part_path, remove_parts, write_part
+from batch_executor import ShardedExecutor, encode_header, evaluate_chunks
+from charts import CHART_ROUNDING, IMAGE_FORMATS, check_image_format, image_name, render_images, slice_matrix, unique_keys
+from benefits_g1 import HOLIDAY_PERIODS
+from rule_engine import RULESET_MODULES, DedupReport, get_ruleset
+from service_periods import ServicePeriods, holiday_calendar
+
+DEFAULT_RULESET = "app_g"
+CHECKPOINT_FILE = "_checkpoint.json"
+DEFAULT_CHUNK_SIZE = 50_000
+CHART_INDEX = "chart_index"
+CHART_DIR = "charts"
+
+# ==============================================================================
+# קריאת הקלט במקטעים
+# ==============================================================================
+def iter_roster_chunks(path, chunk_size, skip_rows=0):
+    """Yields roster DataFrames of at most `chunk_size` rows, skipping `skip_rows` first."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Reading Parquet input requires pyarrow (pip install pyarrow).")
+        seen = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if seen + batch.num_rows <= skip_rows:
+                seen += batch.num_rows
+                continue
+            chunk = batch.to_pandas()
+            if seen < skip_rows:
+                chunk = chunk.iloc[skip_rows - seen:]
+            seen += batch.num_rows
+            yield chunk
+    else:
+        # דילוג על שורות שכבר חושבו בלי לפרסר אותן לטבלה
+        skip = range(1, skip_rows + 1) if skip_rows else None
+        yield from pd.read_csv(path, chunksize=chunk_size, skiprows=skip)
+
+def load_service_periods(path):
+    """(row, start, end) columns of a call-ups file, sorted by roster row."""
+    periods = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    missing = sorted({"row", "start", "end"} - set(periods.columns))
+    if missing:
+        sys.exit(f"{path}: missing column(s) {', '.join(missing)} (expected row, start, end)")
+    periods = periods.sort_values("row", kind="stable")
+    return (periods["row"].to_numpy(np.int64), pd.to_datetime(periods["start"]).to_numpy(),
+            pd.to_datetime(periods["end"]).to_numpy())
+
+def with_service_periods(rules, chunk, periods, holidays):
+    """The chunk with the fields derived from the call-ups of its soldiers (those that have any)."""
+    rows, starts, ends = periods
+    first = chunk.index[0] if len(chunk) else 0
+    lo, hi = np.searchsorted(rows, [first, first + len(chunk)])
+    index = ServicePeriods.from_intervals(rows[lo:hi] - first, starts[lo:hi], ends[lo:hi], n=len(chunk))
+    listed = np.diff(index.offsets) > 0
+    if listed.any():
+        for name, column in index.fields(holidays).items():
+            if name in rules.fields:
+                current = chunk[name].to_numpy() if name in chunk else np.full(len(chunk), rules.defaults[name])
+                chunk[name] = np.where(listed, column, current)
+    return chunk
+
+def count_rows(path):
+    """Number of roster rows in the file (a quick pass over the lines of a CSV), for progress reporting."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        return pq.ParquetFile(path).metadata.num_rows
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines - 1 + (last != b"\n")  # בלי שורת הכותרת; שורה אחרונה בלי ירידת שורה
+
+def format_progress(done, total, rows_this_run, elapsed):
+    rate = rows_this_run / elapsed if elapsed > 0 else 0.0
+    if not total:
+        return f"{done:,} rows, {rate:,.0f} rows/s"
+    eta = (total - done) / rate if rate > 0 else float("nan")
+    return f"{done:,}/{total:,} rows ({100 * done / total:.1f}%), {rate:,.0f} rows/s, ETA {eta:,.0f}s"
+
+# ==============================================================================
+# נקודת ביקורת (Checkpoint) להמשך ריצה שנקטעה
+# ==============================================================================
+def load_checkpoint(out_dir):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(out_dir, state):
+    # כתיבה לקובץ זמני והחלפה אטומית, כדי שקטיעה באמצע לא תשאיר קובץ פגום
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def output_path(out_dir, table):
+    return os.path.join(out_dir, f"{table}.csv")
+
+# ==============================================================================
+# הרצה
+# ==============================================================================
+def write_chart_index(rules, chunk, out_dir, fmt, workers, rounding, header):
+    """Renders the chunk's new chart images and appends its rows to chart_index.csv."""
+    keys, inverse = unique_keys(*slice_matrix(rules, chunk), rounding=rounding)
+    render_images(rules.name, keys, os.path.join(out_dir, CHART_DIR), fmt, workers)
+    names = [image_name(rules.name, key, fmt) if key else "" for key in keys]
+    index = pd.DataFrame({"row": chunk.index, "image": [names[i] for i in inverse.tolist()]})
+    index.to_csv(output_path(out_dir, CHART_INDEX), mode="a", header=header, index=False, encoding="utf-8")
+
+def numbered_chunks(input_path, chunk_size, first_row, rules=None, periods=None):
+    """Roster chunks whose index is their row number in the input file (with their call-ups applied)."""
+    holidays = holiday_calendar(HOLIDAY_PERIODS) if periods is not None else None
+    for chunk in iter_roster_chunks(input_path, chunk_size, skip_rows=first_row):
+        chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        if periods is not None:
+            chunk = with_service_periods(rules, chunk, periods, holidays)
+        yield chunk
+
+def write_chunk(rules, chunk, encoded, out_dir, state, fmt, charts, chart_workers, chart_rounding):
+    """Appends an evaluated chunk to the output files and records it in the checkpoint."""
+    if fmt != "csv":
+        write_part(part_path(out_dir, state["chunks_done"], fmt), rules, [batch for table in encoded for batch in table], fmt)
+    else:
+        for table, data in zip(rules.tables, encoded):
+            path = output_path(out_dir, table)
+            with open(path, "ab") as f:
+                if state["offsets"][table] == 0:
+                    f.write(encode_header(rules, table))
+                f.write(data)
+            state["offsets"][table] = os.path.getsize(path)
+    if charts:
+        write_chart_index(rules, chunk, out_dir, charts, chart_workers, chart_rounding, header=state["offsets"][CHART_INDEX] == 0)
+        state["offsets"][CHART_INDEX] = os.path.getsize(output_path(out_dir, CHART_INDEX))
+    state["chunks_done"] += 1
+    state["rows_done"] += len(chunk)
+    save_checkpoint(out_dir, state)
+
+def run_batch(input_path, out_dir, chunk_size=DEFAULT_CHUNK_SIZE, resume=False, log=sys.stderr, ruleset=DEFAULT_RULESET,
+              charts=None, chart_workers=None, chart_rounding=CHART_ROUNDING, workers=1, fmt="csv", periods_path=None,
+              dedup=True):
+    os.makedirs(out_dir, exist_ok=True)
+    rules = get_ruleset(ruleset)  # תמונת מצב אחת של התעריפים לכל הריצה
+    outputs = (rules.tables if fmt == "csv" else ()) + ((CHART_INDEX,) if charts else ())
+    try:
+        if charts:
+            check_image_format(charts)
+        if fmt != "csv":
+            check_columnar_format(fmt)
+    except (ValueError, RuntimeError) as exc:
+        sys.exit(str(exc))
+    state = load_checkpoint(out_dir) if resume else None
+    if state is None:
+        state = {"input": os.path.abspath(input_path), "ruleset": ruleset, "rates": rules.version, "format": fmt, "periods": periods_path and os.path.abspath(periods_path), "charts": charts, "chart_rounding": chart_rounding, "chunks_done": 0, "rows_done": 0,
+                 "offsets": {name: 0 for name in outputs}}
+    elif state["input"] != os.path.abspath(input_path):
+        sys.exit(f"Checkpoint in {out_dir} belongs to {state['input']}, not {input_path}.")
+    elif state.get("ruleset", DEFAULT_RULESET) != ruleset:
+        sys.exit(f"Checkpoint in {out_dir} was computed with rule-set {state.get('ruleset', DEFAULT_RULESET)}, not {ruleset}.")
+    elif state.get("rates", rules.version) != rules.version:
+        sys.exit(f"Checkpoint in {out_dir} was computed with rates {state['rates']}, not {rules.version}; "
+                 f"start a new run (without --resume) to use the current rates.")
+    elif state.get("periods") != (periods_path and os.path.abspath(periods_path)):
+        sys.exit(f"Checkpoint in {out_dir} was computed with --periods {state.get('periods')}, not {periods_path}.")
+    elif state.get("format", "csv") != fmt:
+        sys.exit(f"Checkpoint in {out_dir} was written as --format {state.get('format', 'csv')}, not --format {fmt}.")
+    elif (state.get("charts"), state.get("chart_rounding", chart_rounding)) != (charts, chart_rounding):
+        sys.exit(f"Checkpoint in {out_dir} was computed with --charts {state.get('charts')} "
+                 f"--chart-rounding {state.get('chart_rounding')}, not --charts {charts} --chart-rounding {chart_rounding}.")
+
+    # קיטום פלט חלקי שנכתב אחרי המקטע האחרון שהושלם
+    for name in outputs:
+        mode = "r+b" if os.path.exists(output_path(out_dir, name)) else "wb"
+        with open(output_path(out_dir, name), mode) as f:
+            f.truncate(state["offsets"][name])
+    if fmt != "csv":
+        remove_parts(out_dir, keep=state["chunks_done"])
+
+    total = count_rows(input_path)
+    start = time.perf_counter()
+    rows_this_run = 0
+    executor = ShardedExecutor((rules,), workers) if workers > 1 else None
+    periods = load_service_periods(periods_path) if periods_path else None
+    chunks = numbered_chunks(input_path, chunk_size, state["rows_done"], rules, periods)
+    report = DedupReport()
+    results = evaluate_chunks(rules, chunks, executor, fmt, dedup, report)
+    try:
+        for chunk, encoded in results:
+            rows_this_run += len(chunk)
+            write_chunk(rules, chunk, encoded, out_dir, state, fmt, charts, chart_workers, chart_rounding)
+            elapsed = time.perf_counter() - start
+            dedup_ratio = f", {report.ratio:.1f}x dedup" if dedup else ""
+            print(f"chunk {state['chunks_done']}: {format_progress(state['rows_done'], total, rows_this_run, elapsed)}"
+                  f"{dedup_ratio}", file=log)
+    finally:
+        results.close()  # משחרר את הבלוק המשותף של מקטע שכבר נשלח
+        if executor is not None:
+            executor.close()
+
+    elapsed = time.perf_counter() - start
+    rate = rows_this_run / elapsed if elapsed > 0 else 0.0
+    print(f"done: {rows_this_run:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=log)
+    if dedup and report.rows:
+        print(f"dedup: {report}", file=log)
+    return state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute reservist benefits for a roster file in chunks.")
+    parser.add_argument("input", help="roster file (.csv or .parquet)")
+    parser.add_argument("out_dir", help="directory for the results")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--resume", action="store_true", help="continue from the last completed chunk")
+    parser.add_argument("--format", choices=("csv",) + COLUMNAR_FORMATS, default="csv",
+                        help="per-table CSV files, or one Parquet / Arrow IPC / coded Parquet part file per chunk "
+                             "(these, and .parquet rosters, use pyarrow)")
+    parser.add_argument("--ruleset", choices=sorted(RULESET_MODULES), default=DEFAULT_RULESET,
+                        help="rule-set to evaluate (input columns must match its fields)")
+    parser.add_argument("--periods", help="call-ups file (.csv or .parquet) with row, start and end columns")
+    parser.add_argument("--charts", choices=IMAGE_FORMATS, help="also render one composition chart per distinct total combination")
+    parser.add_argument("--chart-rounding", type=int, default=CHART_ROUNDING,
+                        help="₪ granularity of chart totals; coarser rounding means fewer distinct images")
+    parser.add_argument("--chart-workers", type=int, default=None, help="processes rendering chart images (default: CPU count)")
+    parser.add_argument("--workers", type=int, default=1, help="processes evaluating each chunk (default: 1, in this process)")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="evaluate every row separately instead of once per distinct rule input combination")
+    args = parser.parse_args(argv)
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.chart_rounding <= 0:
+        parser.error("--chart-rounding must be positive")
+    if args.workers <= 0:
+        parser.error("--workers must be positive")
+    run_batch(args.input, args.out_dir, args.chunk_size, args.resume, ruleset=args.ruleset,
+              charts=args.charts, chart_workers=args.chart_workers, chart_rounding=args.chart_rounding, workers=args.workers, fmt=args.format, periods_path=args.periods,
+              dedup=args.dedup)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+הרצת Batch מקבילית: חלוקת טבלת המשרתים לרסיסים (shards) על פני מאגר תהליכים.
+
+The input columns of a roster chunk are copied once into a shared-memory
+block (text columns as category codes), so a worker receives only a small
+shard descriptor - the block's name, its column layout and a row range -
+and never pickled rows. Each worker evaluates its rows with the vectorized
+rule engine and returns its result tables already encoded - as CSV (the
+formatting is most of the work) or as Arrow record batches for the
+columnar formats (batch_arrow.py); the parent writes the shards in row order,
+so the output is identical to a single-process run whatever the number of
+workers or the order in which shards finish.
+
+ShardedExecutor.submit() returns immediately, so the caller can read the
+next chunk while the pool works on the current one (see batch_cli.py).
+"""
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from rule_engine import DedupReport, prepare_columns
+
+SHARDS_PER_WORKER = 2  # יותר רסיסים מתהליכים, כדי שתהליך מהיר לא ימתין לאיטי
+MIN_SHARD_ROWS = 2_000
+ALIGNMENT = 64
+
+
+class ColumnLayout(NamedTuple):
+    """Where one input column lives in a shared block."""
+
+    name: str
+    dtype: str
+    offset: int
+    categories: Any  # tuple of the strings behind int32 codes, or None for a numeric column
+
+
+class SharedColumns:
+    """The prepared input columns of one roster chunk, in a single shared-memory block."""
+
+    def __init__(self, ruleset, roster):
+        self.rows, columns = prepare_columns(ruleset, roster)
+        arrays, layout, offset = [], [], 0
+        for name, column in columns.items():
+            categories = None
+            if column.dtype.kind == "U":
+                # מחרוזות -> קודים; רשימת הערכים הקטנה עוברת עם תיאור הרסיס
+                values, codes = np.unique(column, return_inverse=True)
+                categories, column = tuple(values.tolist()), codes.astype(np.int32)
+            column = np.ascontiguousarray(column)
+            layout.append(ColumnLayout(name, column.dtype.str, offset, categories))
+            arrays.append(column)
+            offset += math.ceil(column.nbytes / ALIGNMENT) * ALIGNMENT
+        self.layout = tuple(layout)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for spec, column in zip(self.layout, arrays):
+            np.ndarray(column.shape, column.dtype, buffer=self._shm.buf, offset=spec.offset)[:] = column
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def close(self):
+        """Frees the block; call once every shard of the chunk is done."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ==============================================================================
+# צד התהליך העובד
+# ==============================================================================
+_ATTACHED = OrderedDict()  # שם הבלוק -> SharedMemory, בתהליך העובד
+_MAX_ATTACHED = 2  # הבלוק הנוכחי והבא (קריאה מקדימה של המקטע הבא)
+
+def _attach(name):
+    shm = _ATTACHED.get(name)
+    if shm is None:
+        shm = _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+        while len(_ATTACHED) > _MAX_ATTACHED:
+            _, old = _ATTACHED.popitem(last=False)
+            try:
+                old.close()
+            except BufferError:  # מערך שעדיין מחזיק את הזיכרון ישוחרר עם התהליך
+                pass
+    return shm
+
+def _shard_columns(block, layout, rows, start, stop):
+    """{field: column} for rows start:stop of a shared block (numeric columns are views, not copies)."""
+    shm = _attach(block)
+    columns = {}
+    for spec in layout:
+        dtype = np.dtype(spec.dtype)
+        column = np.ndarray((rows,), dtype, buffer=shm.buf, offset=spec.offset)[start:stop]
+        if spec.categories is not None:
+            column = np.asarray(spec.categories)[column]
+        columns[spec.name] = column
+    return columns
+
+def encode_frame(frame):
+    """A result table as CSV bytes without the header (what DataFrame.to_csv appends to a file)."""
+    return frame.to_csv(index=False, header=False).encode("utf-8")
+
+def encode_tables(ruleset, roster, fmt="csv", row_offset=0, dedup=True, report=None):
+    """
+    The result tables of a roster, one item per table of the rule-set.
+
+    For "csv" an item is the table's CSV bytes (without the header); for the
+    columnar formats it is a list holding the table's Arrow RecordBatch.
+    "coded" has a single item instead, the list holding the coded table of
+    every result table (batch_arrow.coded_tables).
+    Row numbers are the DataFrame index (or positions) plus `row_offset`.
+    `dedup` and `report` are passed to evaluate_columns.
+    """
+    if fmt == "coded":
+        from batch_arrow import coded_tables
+        return [coded_tables(ruleset, roster, row_offset, dedup, report)]
+    if fmt != "csv":
+        from batch_arrow import result_batches
+        return [[batch] for batch in result_batches(ruleset, roster, row_offset, dedup, report)]
+    from benefits_batch import calculate_ruleset_batch
+    encoded = []
+    for frame in calculate_ruleset_batch(ruleset, roster, dedup, report):
+        frame["row"] += row_offset
+        encoded.append(encode_frame(frame))
+    return encoded
+
+_RULESETS = {}  # (שם, גרסה) -> RuleSet, בתהליך העובד: מה שהתהליך הראשי נעל בתחילת הריצה
+
+def _init_worker(states):
+    from rates import ruleset_from_state
+    for state in states:
+        ruleset = ruleset_from_state(state)
+        _RULESETS[ruleset.name, ruleset.version] = ruleset
+
+def run_shard(job):
+    """
+    Worker: encode_tables() for rows start:stop of a chunk (row numbers offset by `first_row`).
+
+    The rule-set is the one given to the executor, never read again from
+    the rates file. Returns (rows, encoded tables, DedupReport of the shard).
+    """
+    ruleset_name, version, block, layout, rows, start, stop, first_row, fmt, dedup = job
+    ruleset = _RULESETS[ruleset_name, version]
+    report = DedupReport()
+    encoded = encode_tables(ruleset, _shard_columns(block, layout, rows, start, stop), fmt, first_row + start, dedup, report)
+    return stop - start, encoded, report
+
+# ==============================================================================
+# צד התהליך הראשי
+# ==============================================================================
+class ShardedExecutor:
+    """
+    A process pool that evaluates roster chunks shard by shard (use as a context manager).
+
+    `rulesets` are the rule-sets the pool may evaluate, pinned by the caller:
+    their compiled constants are handed to every worker when it starts, so
+    a rates file changed during the run does not reach the workers.
+    """
+
+    def __init__(self, rulesets, workers=None, shards_per_worker=SHARDS_PER_WORKER, min_shard_rows=MIN_SHARD_ROWS):
+        from rates import ruleset_state
+        self.workers = workers or os.cpu_count() or 1
+        self.shards_per_worker = shards_per_worker
+        self.min_shard_rows = min_shard_rows
+        self.rulesets = {(ruleset.name, ruleset.version) for ruleset in rulesets}
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(tuple(ruleset_state(ruleset) for ruleset in rulesets),))
+
+    def shard_bounds(self, rows):
+        """(start, stop) row ranges of the shards of a `rows`-row chunk."""
+        shards = max(1, min(self.workers * self.shards_per_worker, math.ceil(rows / self.min_shard_rows)))
+        edges = np.linspace(0, rows, shards + 1).astype(int)
+        return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    def submit(self, ruleset, columns, first_row=0, fmt="csv", dedup=True):
+        """Futures, in row order, of run_shard over every shard of a SharedColumns chunk."""
+        if (ruleset.name, ruleset.version) not in self.rulesets:
+            raise ValueError(f"rule-set {ruleset.name} with rates {ruleset.version} was not given to the executor")
+        return [self.pool.submit(run_shard, (ruleset.name, ruleset.version, columns.name, columns.layout,
+                                             columns.rows, start, stop, first_row, fmt, dedup))
+                for start, stop in self.shard_bounds(columns.rows)]
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def encode_header(ruleset, table):
+    """The CSV header line of a result table, as DataFrame.to_csv writes it."""
+    import pandas as pd
+    return pd.DataFrame(columns=("row",) + tuple(ruleset.columns[table])).to_csv(index=False).encode("utf-8")
+
+def evaluate_chunks(ruleset, chunks, executor=None, fmt="csv", dedup=True, report=None):
+    """
+    Yields (chunk, encode_tables() of the chunk) for roster chunks, in input order.
+
+    Row numbers come from each chunk's RangeIndex. Without an executor the
+    chunks are evaluated in this process; with one, every chunk is sharded
+    across the pool, and the next chunk is read and shared while the pool
+    works on the current one. A DedupReport passed as `report` is updated
+    with the counts of every chunk before it is yielded (deduplication is
+    per shard, so more workers find somewhat fewer repeats).
+    """
+    if executor is None:
+        for chunk in chunks:
+            yield chunk, encode_tables(ruleset, chunk, fmt, 0, dedup, report)
+        return
+    pending = None
+    try:
+        for chunk in chunks:
+            columns = SharedColumns(ruleset, chunk)
+            first_row = int(chunk.index[0]) if len(chunk) else 0
+            previous, pending = pending, (chunk, columns, executor.submit(ruleset, columns, first_row, fmt, dedup))
+            if previous is not None:
+                yield _collect(*previous, report)
+        if pending is not None:
+            yield _collect(*pending, report)
+            pending = None
+    finally:
+        if pending is not None:
+            pending[1].close()
+
+def _collect(chunk, columns, futures, report=None):
+    try:
+        results = [future.result() for future in futures]
+    finally:
+        columns.close()
+    parts = [encoded for _, encoded, _ in results]
+    if report is not None:
+        for _, _, shard_report in results:
+            report.add(shard_report)
+    return chunk, [_join([part[i] for part in parts]) for i in range(len(parts[0]))] if parts else []
+
+def _join(pieces):
+    # רסיסי טבלה אחת לפי הסדר: בתים של CSV, או רשימות של RecordBatch (או של טבלאות מקודדות)
+    if isinstance(pieces[0], bytes):
+        return b"".join(pieces)
+    return [batch for piece in pieces for batch in piece]
@@ -0,0 +1,294 @@
+"""
+בדיקות ביצועים למנועי החישוב.
+
+Times calculate_all_benefits (app_g), calculate_benefits (app_g1) and their
+vectorized rule-engine counterparts over seeded synthetic populations,
+records peak traced memory per benchmark, and writes a JSON report that can
+be compared against the report of another commit.
+
+Usage (from the repository root):
+    python -m benchmarks.bench                       # 1, 1k, 100k, 1M profiles
+    python -m benchmarks.bench --sizes 1 1000 --output bench.json
+    python -m benchmarks.bench --compare before.json # print speed-up per benchmark
+    python -m benchmarks.bench --sizes 1 --sessions 10000   # plus memory per session
+
+Scalar calculators are fed pre-built argument chunks, so building the input
+dicts is not part of the measured time. Memory is measured in a separate,
+tracemalloc-instrumented pass so that tracing does not distort the timings;
+--no-memory skips it.
+
+sharded_batch runs the batch_cli --workers path (shared-memory shards and
+CSV encoding) on a pool of os.cpu_count() processes; compare reports from
+machines with different cpu_count to see how it scales.
+
+days_ledger replays n single-day attendance records, spread over a roster
+of n / 20 soldiers, through DaysLedger (days_ledger.py); only the records
+that cross a day milestone evaluate the soldier's rules.
+
+The batch benchmarks evaluate each rule once per distinct combination of
+the inputs it reads (rule_engine dedup). calculate_all_benefits_batch_no_dedup
+evaluates every row, so the two together show what the deduplication saves.
+calculate_coded_batch builds the same app_g results as rule codes and detail
+template values (result_codes.py), without formatting a detail text.
+
+--sessions N also measures the memory each Streamlit session keeps in
+st.session_state after a calculation, for the former layouts (inputs dict,
+loose app_g1 keys with lists of dicts) and the current compact records, over
+N distinct synthetic profiles (so no result is shared through the cache).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.population import G1_ARGUMENTS, generate_population, generate_population_g1, iter_profiles
+
+DEFAULT_SIZES = (1, 1_000, 100_000, 1_000_000)
+SCALAR_CHUNK = 10_000
+
+# ==============================================================================
+# הבדיקות
+# ==============================================================================
+def bench_calculate_all_benefits(n, seed):
+    from benefits_g import calculate_all_benefits
+    columns = generate_population(n, seed)
+    elapsed = 0.0
+    for start in range(0, n, SCALAR_CHUNK):
+        chunk = list(iter_profiles(columns, start, start + SCALAR_CHUNK))
+        t0 = time.perf_counter()
+        for inputs in chunk:
+            calculate_all_benefits(inputs)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+def bench_calculate_benefits(n, seed):
+    from benefits_g1 import calculate_benefits
+    columns = generate_population_g1(n, seed)
+    elapsed = 0.0
+    for start in range(0, n, SCALAR_CHUNK):
+        chunk = [tuple(p[name] for name in G1_ARGUMENTS) for p in iter_profiles(columns, start, start + SCALAR_CHUNK)]
+        t0 = time.perf_counter()
+        for args in chunk:
+            calculate_benefits(*args)
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+def bench_calculate_all_benefits_batch(n, seed):
+    from benefits_batch import calculate_all_benefits_batch
+    columns = generate_population(n, seed)
+    t0 = time.perf_counter()
+    calculate_all_benefits_batch(columns)
+    return time.perf_counter() - t0
+
+def bench_calculate_all_benefits_batch_no_dedup(n, seed):
+    from benefits_batch import calculate_all_benefits_batch
+    columns = generate_population(n, seed)
+    t0 = time.perf_counter()
+    calculate_all_benefits_batch(columns, dedup=False)
+    return time.perf_counter() - t0
+
+def bench_calculate_coded_batch(n, seed):
+    from result_codes import calculate_coded
+    from rule_engine import get_ruleset
+    columns = generate_population(n, seed)
+    ruleset = get_ruleset("app_g")
+    t0 = time.perf_counter()
+    calculate_coded(ruleset, columns)
+    return time.perf_counter() - t0
+
+def bench_calculate_benefits_batch(n, seed):
+    from benefits_batch import calculate_ruleset_batch
+    from benefits_g1 import RULESET
+    columns = generate_population_g1(n, seed)
+    t0 = time.perf_counter()
+    calculate_ruleset_batch(RULESET, columns)
+    return time.perf_counter() - t0
+
+def bench_calculate_sweep(n, seed):
+    # n תאים ברשת: שכר × 365 ימים × 3 סוגי יחידה × 4 שילובי דגלים
+    from benefits_batch import SWEEP_DAYS, calculate_sweep
+    profile = next(iter_profiles(generate_population(1, seed)))
+    salaries = np.linspace(0, 40_000, max(1, n // (SWEEP_DAYS.size * 12)))
+    t0 = time.perf_counter()
+    calculate_sweep(profile, salaries=salaries)
+    return time.perf_counter() - t0
+
+def bench_sharded_batch(n, seed):
+    # אותו חישוב כמו ב-batch_cli --workers, כולל קידוד ה-CSV, על פני כל המעבדים
+    import pandas as pd
+    from batch_executor import ShardedExecutor, evaluate_chunks
+    from rule_engine import get_ruleset
+    roster = pd.DataFrame(generate_population(n, seed))
+    ruleset = get_ruleset("app_g")
+    with ShardedExecutor((ruleset,)) as executor:
+        t0 = time.perf_counter()
+        for _ in evaluate_chunks(ruleset, [roster], executor):
+            pass
+        return time.perf_counter() - t0
+
+def bench_days_ledger(n, seed):
+    from days_ledger import DaysLedger
+    from rule_engine import get_ruleset
+    soldiers = max(1, n // 20)
+    roster = generate_population(soldiers, seed)
+    del roster["reserve_days"]
+    rows = np.random.default_rng(seed).integers(0, soldiers, n).tolist()
+    t0 = time.perf_counter()
+    ledger = DaysLedger(get_ruleset("app_g"), roster)
+    for row in rows:
+        ledger.record(row)
+    return time.perf_counter() - t0
+
+BENCHMARKS = {
+    "calculate_all_benefits": bench_calculate_all_benefits,
+    "calculate_benefits": bench_calculate_benefits,
+    "calculate_all_benefits_batch": bench_calculate_all_benefits_batch,
+    "calculate_all_benefits_batch_no_dedup": bench_calculate_all_benefits_batch_no_dedup,
+    "calculate_coded_batch": bench_calculate_coded_batch,
+    "calculate_benefits_batch": bench_calculate_benefits_batch,
+    "calculate_sweep": bench_calculate_sweep,
+    "sharded_batch": bench_sharded_batch,
+    "days_ledger": bench_days_ledger,
+}
+
+# ==============================================================================
+# זיכרון לכל סשן (st.session_state אחרי חישוב)
+# ==============================================================================
+def _session_g_dict(profile):
+    # המבנה הקודם: dict של הקלט (locals() החזיק בנוסף גם את רכיבי הטופס, שאינם נמדדים כאן)
+    from benefits_g import calculate_all_benefits
+    return {"inputs": dict(profile), "results": calculate_all_benefits(profile)}
+
+def _session_g_record(profile):
+    from benefits_g import ProfileInputs, calculate_all_benefits
+    return {"inputs": ProfileInputs(**profile), "results": calculate_all_benefits(profile)}
+
+def _session_g1_lists(args):
+    # המבנה הקודם של app_g1: מפתחות נפרדים ורשימות של dict (עותק פרטי לכל סשן)
+    from benefits_g1 import calculate_benefits
+    entitlements, nii, immediate, future, chart = calculate_benefits(*args)
+    return {"entitlements": entitlements, "daily_salary_compensation_val": nii,
+            "total_monetary_benefits_immediate": immediate, "total_monetary_benefits_future": future,
+            "monetary_breakdown_for_chart": chart, "avg_salary_display": args[0], "reserve_days_display": args[1],
+            "results_calculated": True}
+
+def _session_g1_summary(args):
+    from benefits_g1 import summarize_benefits
+    return {"summary": summarize_benefits(*args)}
+
+SESSION_LAYOUTS = {
+    "app_g inputs dict": ("app_g", _session_g_dict),
+    "app_g ProfileInputs": ("app_g", _session_g_record),
+    "app_g1 loose keys": ("app_g1", _session_g1_lists),
+    "app_g1 BenefitSummary": ("app_g1", _session_g1_summary),
+}
+
+def session_footprint(n, seed):
+    """Bytes of session state retained per session, for each layout in SESSION_LAYOUTS."""
+    profiles = {
+        "app_g": list(iter_profiles(generate_population(n, seed))),
+        "app_g1": [tuple(p[name] for name in G1_ARGUMENTS) for p in iter_profiles(generate_population_g1(n, seed))],
+    }
+    results = []
+    for layout, (app, build) in SESSION_LAYOUTS.items():
+        build(profiles[app][0])  # ייבוא מודולים ובניית מטמונים פנימיים מחוץ למדידה
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            sessions = [build(profile) for profile in profiles[app]]
+            retained = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        del sessions
+        results.append({"layout": layout, "sessions": n, "bytes_per_session": retained / n})
+    return results
+
+# ==============================================================================
+# הרצה ודיווח
+# ==============================================================================
+def measure(name, n, seed, memory=True):
+    func = BENCHMARKS[name]
+    seconds = func(n, seed)
+    result = {
+        "benchmark": name,
+        "size": n,
+        "seconds": seconds,
+        "us_per_profile": seconds / n * 1e6,
+        "profiles_per_second": n / seconds if seconds > 0 else None,
+        "peak_memory_bytes": None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            func(n, seed)
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def compare(current, baseline_path, out=sys.stdout):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["benchmark"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"{'benchmark':32} {'size':>9} {'before s':>10} {'after s':>10} {'speed-up':>9}", file=out)
+    for r in current["results"]:
+        before = baseline.get((r["benchmark"], r["size"]))
+        if before is None:
+            continue
+        speedup = before["seconds"] / r["seconds"] if r["seconds"] > 0 else float("inf")
+        print(f"{r['benchmark']:32} {r['size']:>9,} {before['seconds']:>10.4f} {r['seconds']:>10.4f} {speedup:>8.2f}x", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the benefit calculators.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--output", default="bench_results.json", help="JSON report path")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="print speed-ups against an earlier report")
+    parser.add_argument("--sessions", type=int, default=0, metavar="N",
+                        help="also measure session-state memory over N distinct profiles")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "seed": args.seed, "results": []}
+    for name in args.only or BENCHMARKS:
+        for n in args.sizes:
+            result = measure(name, n, args.seed, memory=not args.no_memory)
+            report["results"].append(result)
+            peak = result["peak_memory_bytes"]
+            print(f"{name:32} {n:>9,}  {result['seconds']:9.4f}s  {result['us_per_profile']:9.2f} us/profile"
+                  + (f"  peak {peak / 2**20:8.1f} MiB" if peak is not None else ""), file=sys.stderr)
+
+    if args.sessions > 0:
+        report["session_memory"] = session_footprint(args.sessions, args.seed)
+        for result in report["session_memory"]:
+            print(f"{result['layout']:32} {result['sessions']:>9,}  {result['bytes_per_session']:9,.0f} bytes/session", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
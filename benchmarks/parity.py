@@ -0,0 +1,180 @@
+"""
+בדיקת פערים (differential parity) בין סטי הכללים ובין מסלולי ההערכה.
+
+Two checks over seeded synthetic populations:
+
+  apps   Evaluates the "app_g" and "app_g1" rule-sets, vectorized, over the
+         same population (app_g profiles mapped onto app_g1's inputs) and
+         reports, per shared rule id, where eligibility or amounts diverge,
+         plus how often the monetary totals differ.
+  paths  Evaluates each rule-set both vectorized (evaluate_columns) and per
+         profile (iter_hits) on a sample and reports every row where the two
+         engines disagree on rules, amounts or notes. Any mismatch is a bug
+         in a rule spec or the engine, and makes the exit status non-zero.
+
+Usage (from the repository root):
+    python -m benchmarks.parity                          # 1M profiles, both checks
+    python -m benchmarks.parity --size 5000000 --only apps --output divergences.csv
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from benefit_records import VALUE_KIND_ILS
+from benchmarks.population import generate_population, generate_population_g1, iter_profiles
+from rule_engine import evaluate_columns, get_ruleset, iter_hits
+
+DEFAULT_SIZE = 1_000_000
+DEFAULT_SAMPLE = 20_000
+AMOUNT_TOLERANCE = 0.005  # חצי אגורה
+
+# ==============================================================================
+# 1. אוכלוסייה משותפת
+# ==============================================================================
+def g1_columns_from_g(columns):
+    """app_g1 inputs for an app_g population; fields app_g has no counterpart for are off / zero."""
+    n = len(columns["reserve_days"])
+    off = np.zeros(n, dtype=bool)
+    zero = np.zeros(n, dtype=np.int64)
+    return {
+        "avg_salary": columns["gross_salary"],
+        "reserve_days": columns["reserve_days"],
+        "unit_type": np.where(columns["unit_type"] == "לוחם/ת", "לוחם", "עורף"),
+        "num_children": columns["num_children"],
+        "is_married": columns["is_married"],
+        "has_non_working_spouse": off,
+        "is_student": columns["is_student"],
+        "tuition_cost": columns["tuition_cost"],
+        "used_road_6": off,
+        "road_6_cost": zero,
+        "babysitter_cost": columns["babysitter_cost"],
+        "dog_boarding_cost": columns["pet_boarding_cost"],
+        "vacation_cancel_cost": columns["vacation_cancel_cost"],
+        "therapy_cost": columns["therapy_cost"],
+        "camps_cost": columns["camps_cost"],
+        "is_tzav_8": columns["is_tzav_8"],
+        "mortgage_rent_cost_input": zero,
+        "needs_dedicated_medical_assistance": off,
+        "needs_preferred_loans": off,
+        "is_holiday_period_str": np.where(columns["served_during_holidays"], "כן", "לא"),
+    }
+
+def dense_hits(ruleset, columns, n):
+    """{rule_id: (eligible bool array, amount float array)} plus the per-row monetary total."""
+    dense = {}
+    total = np.zeros(n)
+    for hits in evaluate_columns(ruleset, columns, notes=False):
+        eligible = np.zeros(n, dtype=bool)
+        amount = np.full(n, np.nan)
+        eligible[hits.rows] = True
+        amount[hits.rows] = hits.amounts
+        dense[hits.rule.rule_id] = (eligible, amount)
+        if hits.rule.kind == VALUE_KIND_ILS:
+            total[hits.rows] += hits.amounts
+    return dense, total
+
+# ==============================================================================
+# 2. השוואה בין האפליקציות
+# ==============================================================================
+def compare_apps(n, seed, output=None, out=sys.stdout):
+    g, g1 = get_ruleset("app_g"), get_ruleset("app_g1")
+    columns = generate_population(n, seed)
+    t0 = time.perf_counter()
+    hits_g, total_g = dense_hits(g, columns, n)
+    hits_g1, total_g1 = dense_hits(g1, g1_columns_from_g(columns), n)
+    elapsed = time.perf_counter() - t0
+
+    shared = [rule.rule_id for rule in g.rules if rule.rule_id in {r.rule_id for r in g1.rules}]
+    never = (np.zeros(n, dtype=bool), np.full(n, np.nan))
+    divergent = []
+    print(f"{'rule':18} {'app_g':>9} {'app_g1':>9} {'g only':>9} {'g1 only':>9} {'amount≠':>9} {'max |Δ| ₪':>11}  example row", file=out)
+    for rule_id in shared:
+        eligible_g, amount_g = hits_g.get(rule_id, never)
+        eligible_g1, amount_g1 = hits_g1.get(rule_id, never)
+        both = eligible_g & eligible_g1
+        # NaN (לא כספי) מול סכום נחשב פער בסכום
+        delta = np.abs(np.nan_to_num(amount_g, nan=0.0) - np.nan_to_num(amount_g1, nan=0.0))
+        amount_differs = both & ((delta > AMOUNT_TOLERANCE) | (np.isnan(amount_g) != np.isnan(amount_g1)))
+        rows = np.flatnonzero((eligible_g != eligible_g1) | amount_differs)
+        max_delta = delta[amount_differs].max() if amount_differs.any() else 0.0
+        example = int(rows[0]) if rows.size else "-"
+        print(f"{rule_id:18} {eligible_g.sum():>9,} {eligible_g1.sum():>9,} {(eligible_g & ~eligible_g1).sum():>9,} "
+              f"{(eligible_g1 & ~eligible_g).sum():>9,} {amount_differs.sum():>9,} {max_delta:>11,.2f}  {example}", file=out)
+        divergent.append((rule_id, rows, amount_g[rows], amount_g1[rows]))
+
+    totals_differ = np.abs(total_g - total_g1) > AMOUNT_TOLERANCE
+    print(f"\nmonetary total differs for {totals_differ.sum():,} of {n:,} profiles "
+          f"(mean app_g {total_g.mean():,.0f} ₪, app_g1 {total_g1.mean():,.0f} ₪); "
+          f"evaluated in {elapsed:.2f}s", file=out)
+    rule_only_g = [r.rule_id for r in g.rules if r.rule_id not in shared]
+    rule_only_g1 = [r.rule_id for r in g1.rules if r.rule_id not in shared]
+    print(f"rules only in app_g: {', '.join(rule_only_g)}\nrules only in app_g1: {', '.join(rule_only_g1)}", file=out)
+
+    if output:
+        write_divergences(output, divergent)
+        print(f"wrote every divergent (row, rule) pair to {output}", file=out)
+    return divergent
+
+def write_divergences(path, divergent):
+    import pandas as pd
+    frame = pd.concat([pd.DataFrame({"row": rows, "rule_id": rule_id, "app_g": amount_g, "app_g1": amount_g1})
+                       for rule_id, rows, amount_g, amount_g1 in divergent], ignore_index=True)
+    frame["rule_id"] = frame["rule_id"].astype("category")
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, encoding="utf-8")
+
+# ==============================================================================
+# 3. השוואה בין ההערכה הווקטורית להערכה הבודדת
+# ==============================================================================
+def _same_amount(a, b):
+    # סכומים מחושבים באגורות שלמות, ולכן שני המסלולים צריכים להחזיר בדיוק אותו מספר
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == b
+
+def compare_paths(ruleset_name, n, seed, out=sys.stdout, show=5):
+    ruleset = get_ruleset(ruleset_name)
+    columns = generate_population(n, seed) if ruleset_name == "app_g" else generate_population_g1(n, seed)
+    vector = [[] for _ in range(n)]
+    for hits in evaluate_columns(ruleset, columns):
+        notes = [hits.notes] * hits.rows.size if isinstance(hits.notes, str) else hits.notes
+        for row, amount, note in zip(hits.rows.tolist(), hits.amounts.tolist(), notes):
+            vector[row].append((hits.rule.rule_id, amount, note))
+    mismatches = 0
+    for row, profile in enumerate(iter_profiles(columns)):
+        profile = dict(ruleset.defaults, **profile)
+        scalar = [(rule.rule_id, float(amount), note) for rule, amount, note in iter_hits(ruleset, profile)]
+        same = len(scalar) == len(vector[row]) and all(
+            s[0] == v[0] and s[2] == v[2] and _same_amount(s[1], v[1]) for s, v in zip(scalar, vector[row]))
+        if not same:
+            mismatches += 1
+            if mismatches <= show:
+                print(f"  {ruleset_name} row {row}: {profile}\n    scalar {scalar}\n    vector {vector[row]}", file=out)
+    print(f"{ruleset_name}: vectorized vs per-profile evaluation differs on {mismatches:,} of {n:,} profiles", file=out)
+    return mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential parity checks for the benefit rule-sets.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="profiles in the cross-app comparison")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help="profiles in the vector-vs-scalar check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", choices=("apps", "paths"), help="run only one of the checks")
+    parser.add_argument("--output", help="CSV / Parquet file for every divergent (row, rule) pair of the apps check")
+    args = parser.parse_args(argv)
+
+    mismatches = 0
+    if args.only in (None, "apps"):
+        compare_apps(args.size, args.seed, args.output)
+    if args.only in (None, "paths"):
+        print()
+        for name in ("app_g", "app_g1"):
+            mismatches += compare_paths(name, args.sample, args.seed)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
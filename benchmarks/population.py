@@ -0,0 +1,96 @@
+"""
+מחולל אוכלוסיית משרתי מילואים סינתטית (עם seed קבוע) לבדיקות ביצועים.
+
+Distributions are rough but realistic: log-normal salaries with a share of
+zero-income reservists, a gamma-shaped count of reserve days with a long
+"Swords of Iron" tail, a combat-heavy unit mix, Poisson children and
+mostly-zero expense columns. Every generator returns a dict of NumPy
+columns, which can be passed as-is to the batch engine or wrapped in a
+DataFrame.
+"""
+import numpy as np
+
+UNIT_TYPES_G = ("לוחם/ת", "תומכ/ת לחימה", "עורפי/ת")
+UNIT_SHARES_G = (0.45, 0.30, 0.25)
+UNIT_TYPES_G1 = ("לוחם", "עורף")
+UNIT_SHARES_G1 = (0.6, 0.4)
+
+MAX_RESERVE_DAYS = 365
+
+def _salaries(rng, n):
+    salary = rng.lognormal(mean=np.log(12_000), sigma=0.55, size=n)
+    salary[rng.random(n) < 0.05] = 0  # סטודנטים / ללא הכנסה
+    return np.clip(np.round(salary, -2), 0, 60_000)
+
+def _reserve_days(rng, n):
+    days = rng.gamma(shape=1.4, scale=32, size=n)
+    return np.clip(days, 0, MAX_RESERVE_DAYS).astype(np.int64)
+
+def _expense(rng, n, probability, typical):
+    # רוב המשרתים לא מדווחים על הוצאה; מי שמדווח - סכום מעוגל ל-50 ₪
+    amount = np.round(rng.lognormal(mean=np.log(typical), sigma=0.6, size=n) / 50) * 50
+    return np.where(rng.random(n) < probability, amount, 0).astype(np.int64)
+
+def generate_population(n, seed=0):
+    """Columns matching calculate_all_benefits' inputs (app_g)."""
+    rng = np.random.default_rng(seed)
+    return {
+        "gross_salary": _salaries(rng, n),
+        "reserve_days": _reserve_days(rng, n),
+        "unit_type": rng.choice(np.array(UNIT_TYPES_G), size=n, p=UNIT_SHARES_G),
+        "num_children": np.minimum(rng.poisson(1.3, size=n), 6),
+        "is_married": rng.random(n) < 0.55,
+        "is_tzav_8": rng.random(n) < 0.75,
+        "is_student": rng.random(n) < 0.18,
+        "is_self_employed": rng.random(n) < 0.12,
+        "served_during_holidays": rng.random(n) < 0.30,
+        "babysitter_cost": _expense(rng, n, 0.20, 1_800),
+        "therapy_cost": _expense(rng, n, 0.08, 1_200),
+        "pet_boarding_cost": _expense(rng, n, 0.06, 400),
+        "vacation_cancel_cost": _expense(rng, n, 0.07, 4_000),
+        "camps_cost": _expense(rng, n, 0.15, 1_500),
+        "tuition_cost": _expense(rng, n, 0.12, 9_000),
+    }
+
+# סדר הפרמטרים של calculate_benefits (app_g1)
+G1_ARGUMENTS = (
+    "avg_salary", "reserve_days", "unit_type", "num_children", "is_married",
+    "has_non_working_spouse", "is_student", "tuition_cost", "used_road_6", "road_6_cost",
+    "babysitter_cost", "dog_boarding_cost", "vacation_cancel_cost", "therapy_cost",
+    "camps_cost", "is_tzav_8", "mortgage_rent_cost_input", "needs_dedicated_medical_assistance",
+    "needs_preferred_loans", "is_holiday_period_str",
+)
+
+def generate_population_g1(n, seed=0):
+    """Columns matching calculate_benefits' parameters (app_g1), keyed by G1_ARGUMENTS."""
+    rng = np.random.default_rng(seed)
+    used_road_6 = rng.random(n) < 0.35
+    return {
+        "avg_salary": _salaries(rng, n),
+        "reserve_days": _reserve_days(rng, n),
+        "unit_type": rng.choice(np.array(UNIT_TYPES_G1), size=n, p=UNIT_SHARES_G1),
+        "num_children": np.minimum(rng.poisson(1.3, size=n), 6),
+        "is_married": rng.random(n) < 0.55,
+        "has_non_working_spouse": rng.random(n) < 0.10,
+        "is_student": rng.random(n) < 0.18,
+        "tuition_cost": _expense(rng, n, 0.12, 9_000),
+        "used_road_6": used_road_6,
+        "road_6_cost": np.where(used_road_6, _expense(rng, n, 1.0, 250), 0),
+        "babysitter_cost": _expense(rng, n, 0.20, 1_800),
+        "dog_boarding_cost": _expense(rng, n, 0.06, 400),
+        "vacation_cancel_cost": _expense(rng, n, 0.07, 4_000),
+        "therapy_cost": _expense(rng, n, 0.08, 1_200),
+        "camps_cost": _expense(rng, n, 0.15, 1_500),
+        "is_tzav_8": rng.random(n) < 0.75,
+        "mortgage_rent_cost_input": _expense(rng, n, 0.05, 2_000),
+        "needs_dedicated_medical_assistance": rng.random(n) < 0.03,
+        "needs_preferred_loans": rng.random(n) < 0.10,
+        "is_holiday_period_str": np.where(rng.random(n) < 0.30, "כן", "לא"),
+    }
+
+def iter_profiles(columns, start=0, stop=None):
+    """Yields plain-Python dicts (one per profile) for scalar calculators."""
+    lists = {name: values[start:stop].tolist() for name, values in columns.items()}
+    names = list(lists)
+    for row in zip(*lists.values()):
+        yield dict(zip(names, row))
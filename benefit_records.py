@@ -0,0 +1,74 @@
+"""
+רשומות תוצאה קלות משקל למנוע ההטבות.
+
+The calculators return immutable BenefitRecord tuples grouped in a
+BenefitResults triple (direct / future / potential). Totals are summed
+straight from the records, in whole agorot (sum_shekels); a pandas DataFrame is only built, via
+records_to_frame, when a table is actually rendered.
+
+Amounts are always floats: NaN when the entitlement is not a sum of money.
+What the value means is carried by a separate `kind` (shekels, academic
+credits, percentage discount, variable amount, benefit in kind), which becomes a
+categorical column in DataFrames.
+"""
+import math
+from typing import NamedTuple
+
+# --- סוגי ערך (עמודה קטגוריאלית בטבלאות) ---
+VALUE_KIND_ILS = "₪"
+VALUE_KIND_CREDITS = "נ\"ז"
+VALUE_KIND_PERCENT = "% הנחה"
+VALUE_KIND_VARIABLE = "משתנה"
+VALUE_KIND_IN_KIND = "לא כספי"
+VALUE_KINDS = (VALUE_KIND_ILS, VALUE_KIND_CREDITS, VALUE_KIND_PERCENT, VALUE_KIND_VARIABLE, VALUE_KIND_IN_KIND)
+NOT_MONETARY = math.nan
+
+
+class BenefitRecord(NamedTuple):
+    """One entitlement row: rule id, display name, note, amount (NaN if not monetary) and value kind."""
+
+    rule_id: str
+    name: str
+    note: str
+    amount: float
+    kind: str = VALUE_KIND_ILS
+
+
+class BenefitResults(NamedTuple):
+    """Direct, future and potential entitlements of one profile."""
+
+    direct: tuple = ()
+    future: tuple = ()
+    potential: tuple = ()
+
+    def total(self, table):
+        """Sum of the monetary amounts in `table` ("direct", "future" or "potential")."""
+        return sum_shekels(r.amount for r in getattr(self, table) if r.kind == VALUE_KIND_ILS)
+
+
+def sum_shekels(amounts):
+    """
+    Sum of amounts in shekels, added up as whole agorot and converted once:
+    136283.56, not the 136283.56000000003 of adding the floats.
+    """
+    from rule_engine import AGOROT, to_agorot
+    return sum(to_agorot(amount) for amount in amounts) / AGOROT
+
+
+def records_to_frame(records, columns):
+    """
+    DataFrame for display; pandas is imported on demand.
+
+    `columns` names the (name, note, amount) columns, optionally followed by
+    a fourth name for the categorical value-kind column.
+    """
+    import pandas as pd
+    name_col, note_col, amount_col = columns[:3]
+    frame = pd.DataFrame({
+        name_col: [r.name for r in records],
+        note_col: [r.note for r in records],
+        amount_col: [r.amount for r in records],
+    }).astype({amount_col: "float64"})
+    if len(columns) > 3:
+        frame[columns[3]] = pd.Categorical([r.kind for r in records], categories=VALUE_KINDS)
+    return frame
@@ -0,0 +1,235 @@
+"""
+חישוב וקטורי של כללי app_g עבור טבלת משרתים שלמה (NumPy / pandas).
+
+Also home to the what-if curve (one profile over 0..365 reserve days) and
+the scenario sweep (salary × days × unit × flags, one grid evaluation).
+
+Kept apart from benefits_g so that importing the rule core stays free of
+NumPy and pandas; only batch callers (CLI, what-if curve) pay that import.
+"""
+import numpy as np
+import pandas as pd
+
+from benefit_records import VALUE_KINDS
+from benefits_g import (
+    BENEFIT_INPUT_FIELDS, INPUT_DEFAULTS, REQUIRED_INPUT_FIELDS, RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS,
+    UNIT_TYPES, as_inputs_dict,
+)
+from result_cache import canonical_key, shared_cache
+from rule_engine import evaluate_columns, evaluate_grid, get_ruleset
+
+# --- טווח ימי המילואים בעקומת "מה אם" ---
+MAX_RESERVE_DAYS = 365
+
+# ==============================================================================
+# 1. חישוב וקטורי לטבלת משרתים שלמה (Batch)
+# ==============================================================================
+# עמודות החובה בטבלת הקלט; לשאר העמודות ערכי ברירת מחדל כמו בקלט הבודד
+BATCH_COLUMN_DEFAULTS = INPUT_DEFAULTS
+BATCH_REQUIRED_COLUMNS = REQUIRED_INPUT_FIELDS
+
+class _BatchTable:
+    """Collects rule hits as parallel arrays and assembles a long-format table."""
+
+    def __init__(self, columns):
+        self.keys = ("row",) + tuple(columns)
+        self.parts = []
+
+    def add(self, hits):
+        rows = hits.rows
+        if isinstance(hits.notes, str):
+            detail = np.full(rows.size, hits.notes, dtype=object)
+        else:
+            detail = np.asarray(hits.notes, dtype=object)
+        self.parts.append((rows, len(self.parts), hits.rule.name, detail, hits.amounts, VALUE_KINDS.index(hits.rule.kind)))
+
+    def to_frame(self, index):
+        rows = np.concatenate([p[0] for p in self.parts] or [np.empty(0, dtype=np.int64)])
+        order = np.concatenate([np.full(p[0].size, p[1]) for p in self.parts] or [np.empty(0, dtype=np.int64)])
+        names = np.concatenate([np.full(p[0].size, p[2], dtype=object) for p in self.parts] or [np.empty(0, dtype=object)])
+        details = np.concatenate([p[3] for p in self.parts] or [np.empty(0, dtype=object)])
+        amounts = np.concatenate([p[4] for p in self.parts] or [np.empty(0)])
+        kinds = np.concatenate([np.full(p[0].size, p[5], dtype=np.int8) for p in self.parts] or [np.empty(0, dtype=np.int8)])
+        # מיון לפי שורה ואז לפי סדר הכללים - זהה לסדר בחישוב הבודד
+        sort = np.lexsort((order, rows))
+        frame = pd.DataFrame({
+            self.keys[0]: np.asarray(index)[rows[sort]],
+            self.keys[1]: names[sort],
+            self.keys[2]: details[sort],
+            self.keys[3]: amounts[sort],
+        })
+        if len(self.keys) > 4:
+            frame[self.keys[4]] = pd.Categorical.from_codes(kinds[sort], categories=VALUE_KINDS)
+        return frame
+
+def calculate_ruleset_batch(ruleset, roster, dedup=True, report=None):
+    """
+    Vectorized evaluation of `ruleset` for a whole roster.
+
+    Returns one long-format DataFrame per table of the rule-set, in
+    `ruleset.tables` order, using the rule-set's display columns. Rows
+    sharing the inputs a rule reads are evaluated once (evaluate_columns
+    dedup); a DedupReport passed as `report` receives the counts.
+    """
+    tables = {table: _BatchTable(ruleset.columns[table]) for table in ruleset.tables}
+    for hits in evaluate_columns(ruleset, roster, dedup=dedup, report=report):
+        tables[hits.rule.table].add(hits)
+    if isinstance(roster, pd.DataFrame):
+        index = roster.index
+    else:
+        index = np.arange(len(roster[next(name for name in ruleset.fields if name in roster)]))
+    return tuple(tables[table].to_frame(index) for table in ruleset.tables)
+
+def update_ruleset_batch(ruleset, roster, frames, rule_ids, dedup=True):
+    """
+    calculate_ruleset_batch frames with only `rule_ids` re-evaluated.
+
+    Used after a rate change: with ruleset = old.with_constants(...) and
+    rule_ids = old.affected_rules(constants=...), the rows of the other rules
+    are kept as they are. Rows are matched by rule name, which therefore has
+    to be unique within each table.
+    """
+    rule_ids = set(rule_ids)
+    if isinstance(roster, pd.DataFrame):
+        index = roster.index
+    else:
+        index = np.arange(len(roster[next(name for name in ruleset.fields if name in roster)]))
+    updated = {table: _BatchTable(ruleset.columns[table]) for table in ruleset.tables}
+    for hits in evaluate_columns(ruleset, roster, rule_ids=rule_ids, dedup=dedup):
+        updated[hits.rule.table].add(hits)
+    result = []
+    for table, frame in zip(ruleset.tables, frames):
+        rules = [rule for rule in ruleset.rules if rule.table == table]
+        order = {rule.name: position for position, rule in enumerate(rules)}
+        if len(order) < len(rules):
+            raise ValueError(f"{ruleset.name}: rule names in table {table!r} are not unique")
+        name_column = ruleset.columns[table][0]
+        stale = frame[name_column].isin([rule.name for rule in rules if rule.rule_id in rule_ids])
+        merged = pd.concat([frame[~stale], updated[table].to_frame(index)], ignore_index=True)
+        # אותו סדר כמו בחישוב המלא: לפי מיקום השורה בטבלה ואז לפי סדר הכללים
+        position = pd.Index(index).get_indexer(merged["row"]) if isinstance(roster, pd.DataFrame) else merged["row"].to_numpy()
+        sort = np.lexsort((merged[name_column].map(order).to_numpy(), position))
+        result.append(merged.iloc[sort].reset_index(drop=True).astype(frame.dtypes.to_dict()))
+    return tuple(result)
+
+def calculate_all_benefits_batch(roster, dedup=True, report=None):
+    """
+    Vectorized counterpart of calculate_all_benefits for a whole roster.
+
+    `roster` is a DataFrame (or dict of equal-length columns) with the same
+    fields as the scalar `inputs` dict; optional columns fall back to
+    BATCH_COLUMN_DEFAULTS. Returns long-format direct/future/potential
+    DataFrames whose `row` column holds the roster index, so filtering on a
+    single row reproduces the scalar result for that soldier.
+    """
+    return calculate_ruleset_batch(get_ruleset("app_g"), roster, dedup, report)
+
+# ==============================================================================
+# 2. עקומת שווי לפי מספר ימי מילואים (לסליידר "מה אם")
+# ==============================================================================
+def calculate_benefit_curve(inputs, max_days=MAX_RESERVE_DAYS, ruleset=None):
+    """
+    Totals and per-day value of one profile for every reserve-day count 0..max_days.
+
+    The profile is replicated once per day count and evaluated in a single
+    vectorized pass; the result is indexed by reserve_days.
+    """
+    days = np.arange(max_days + 1)
+    roster = {name: np.full(days.size, inputs[name]) for name in BENEFIT_INPUT_FIELDS}
+    roster["reserve_days"] = days
+    direct, future, potential = calculate_ruleset_batch(ruleset or get_ruleset("app_g"), roster)
+
+    def totals(frame, column):
+        # ערכים שאינם כספיים (NaN) אינם נספרים, כמו בעמוד התוצאות
+        amounts = np.nan_to_num(frame[column].to_numpy(dtype=np.float64))
+        return np.bincount(frame["row"].to_numpy(dtype=np.int64), weights=amounts, minlength=days.size)
+
+    curve = pd.DataFrame({
+        "direct": totals(direct, "סכום (₪)"),
+        "future": totals(future, "סכום (₪)"),
+        "potential": totals(potential, "שווי פוטנציאלי (₪)"),
+    }, index=pd.Index(days, name="reserve_days"))
+    curve["total"] = curve["direct"] + curve["future"] + curve["potential"]
+    per_day = np.maximum(days, 1)  # למנוע חלוקה באפס
+    curve["daily_direct"] = curve["direct"] / per_day
+    curve["daily_all_in"] = curve["total"] / per_day
+    return curve
+
+def calculate_benefit_curve_cached(inputs):
+    # העקומה אינה תלויה בימי המילואים שהוזנו, ולכן הם אינם חלק מהמפתח
+    cache = shared_cache("app_g.calculate_benefit_curve", RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS)
+    inputs = as_inputs_dict(inputs)
+    profile = {name: inputs[name] for name in BENEFIT_INPUT_FIELDS if name != "reserve_days"}
+    ruleset = get_ruleset("app_g")
+    return cache.get_or_compute((ruleset.version, canonical_key(profile)),
+                                lambda: calculate_benefit_curve(dict(profile, reserve_days=0), ruleset=ruleset))
+
+def curve_breakpoints(curve):
+    """Day counts where the total jumps beyond the regular per-day increment, with the jump size."""
+    steps = np.diff(curve["total"].to_numpy()).round(6)
+    if steps.size == 0:
+        return {}
+    values, counts = np.unique(steps, return_counts=True)
+    per_day_step = values[np.argmax(counts)]
+    jumps = np.flatnonzero(steps != per_day_step)
+    return {int(curve.index[i + 1]): float(steps[i] - per_day_step) for i in jumps}
+
+
+# ==============================================================================
+# 3. סריקת תרחישים: שכר × ימים × סוג יחידה × דגלים (מפת חום)
+# ==============================================================================
+SWEEP_SALARIES = np.arange(0, 40_000, 200)  # 200 נקודות שכר
+SWEEP_DAYS = np.arange(1, MAX_RESERVE_DAYS + 1)
+SWEEP_FLAGS = ("is_married", "is_tzav_8")
+# סריקה ברירת מחדל מחזיקה שלוש טבלאות float64 של 200×365×3×2×2 (~21MB), ולכן מטמון קטן משלה
+SWEEP_CACHE_SIZE = 8
+
+class Sweep:
+    """Totals of one base profile over a salary × days × unit × flags grid (read-only arrays)."""
+
+    __slots__ = ("axes", "totals")
+
+    def __init__(self, axes, totals):
+        self.axes = axes  # שדה -> ערכי הציר, לפי סדר הממדים
+        self.totals = totals  # טבלה -> מערך בצורת הרשת
+        for array in totals.values():
+            array.flags.writeable = False
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+
+    def daily_value(self, tables=("direct", "future", "potential")):
+        """Per-reserve-day value of `tables` over the whole grid."""
+        total = sum(self.totals[table] for table in tables)
+        days = np.asarray(self.axes["reserve_days"]).reshape([-1 if name == "reserve_days" else 1 for name in self.axes])
+        return total / np.maximum(days, 1)
+
+    def select(self, values, **fixed):
+        """`values` (an array over the grid) with the given axes fixed, e.g. select(v, unit_type="עורפי/ת", is_married=True)."""
+        index = []
+        for name, axis in self.axes.items():
+            index.append(list(axis).index(fixed[name]) if name in fixed else slice(None))
+        return values[tuple(index)]
+
+def calculate_sweep(inputs, salaries=SWEEP_SALARIES, days=SWEEP_DAYS, unit_types=UNIT_TYPES, flags=SWEEP_FLAGS, ruleset=None):
+    """
+    Benefit totals of `inputs` for every combination of salary, reserve days,
+    unit type and true/false value of each field in `flags`.
+
+    The whole grid (200 × 365 × 3 × 4 cells by default) is evaluated at once
+    with evaluate_grid; other fields keep their values from `inputs`.
+    """
+    axes = {"gross_salary": salaries, "reserve_days": days, "unit_type": tuple(unit_types)}
+    axes.update({flag: (False, True) for flag in flags})
+    return Sweep(axes, evaluate_grid(ruleset or get_ruleset("app_g"), axes, as_inputs_dict(inputs)))
+
+def calculate_sweep_cached(inputs):
+    # הסריקה אינה תלויה בשדות שעל צירי הרשת, ולכן הם אינם חלק מהמפתח
+    swept = {"gross_salary", "reserve_days", "unit_type", *SWEEP_FLAGS}
+    # Sweep אינו ניתן לשינוי (המערכים נעולים לכתיבה), ולכן לא מועתק
+    cache = shared_cache("app_g.calculate_sweep", SWEEP_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, copy_value=lambda sweep: sweep)
+    inputs = as_inputs_dict(inputs)
+    profile = {name: inputs[name] for name in BENEFIT_INPUT_FIELDS if name not in swept}
+    ruleset = get_ruleset("app_g")
+    return cache.get_or_compute((ruleset.version, canonical_key(profile)), lambda: calculate_sweep(dict(inputs), ruleset=ruleset))
@@ -0,0 +1,285 @@
+"""
+כללי הזכאות של מחשבון ההטבות (app_g) - ללא Streamlit, pandas או plotly.
+
+Pure rule core behind app_g.py: constants, compiled tier tables and the
+"app_g" rule-set of the shared rule engine (rule_engine), evaluated by
+calculate_all_benefits. Importing it pulls in no heavy dependency, so batch
+workers and one-shot processes can compute a profile right after start-up;
+pandas is only imported when a display table is built (results_frame).
+"""
+from collections import namedtuple
+
+from benefit_records import (
+    NOT_MONETARY, VALUE_KIND_CREDITS, VALUE_KIND_PERCENT, VALUE_KIND_VARIABLE,
+    BenefitResults, records_to_frame,
+)
+from result_cache import canonical_key, shared_cache
+from rule_engine import Rule, RuleSet, evaluate, get_ruleset
+from rule_engine import normalize_inputs as normalize_ruleset_inputs
+from tiers import TierTable
+
+# ==============================================================================
+# 1. הגדרות וקבועים גלובליים (מבוסס על הטבלה המלאה שאושרה)
+# ==============================================================================
+# --- תעריפים ---
+DAILY_ADDITIONAL_GRANT_RATE = 144.43
+MINIMUM_NII_DAILY_RATE = 310.5
+
+# --- מענקים ---
+FAMILY_GRANT_CHILDREN = 2500
+FAMILY_GRANT_COMBATANT = 2000
+COUPLES_ASSISTANCE_GRANT = 2500
+SPOUSE_GRANT_MAX = 4000
+
+# --- מענק שנתי ---
+ANNUAL_GRANT_THRESHOLDS = {
+    37: 5400,
+    20: 4050,
+    15: 2700,
+    10: 1350
+}
+
+# --- שוברים ---
+VACATION_VOUCHER_THRESHOLDS = {
+    "לוחם/ת": {"days": 45, "value": 4500},
+    "תומכ/ת לחימה": {"days": 45, "value": 3000},
+    "עורפי/ת": {"days": 45, "value": 1500}
+}
+PROFESSIONAL_TRAINING_VOUCHER_VALUE = 7500
+
+# --- תקרות להחזרים ---
+EXPENSE_CEILINGS = {
+    "therapy": 1500,
+    "babysitter_combatant": 2500,
+    "babysitter_other": 1500,
+    "camps_per_child": 2000,
+    "vacation_cancel_family": 5000,
+    "vacation_cancel_per_child": 2500,
+    "pet_boarding": 500,
+    "tuition_combatant": 12000,
+    "tuition_other": 5000
+}
+
+# --- הטבות אקדמיות ---
+ACADEMIC_CREDITS_THRESHOLDS = {28: "4 נ\"ז", 14: "2 נ\"ז"}
+
+# --- מטמון תוצאות חישוב (משותף לכל הסשנים בשרת) ---
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_TTL_SECONDS = 3600
+
+# --- התעריפים שניתן לעדכן מקובץ התעריפים (rates.json, ראו rates.py) ---
+RATES = {
+    "DAILY_ADDITIONAL_GRANT_RATE": DAILY_ADDITIONAL_GRANT_RATE,
+    "MINIMUM_NII_DAILY_RATE": MINIMUM_NII_DAILY_RATE,
+    "FAMILY_GRANT_CHILDREN": FAMILY_GRANT_CHILDREN,
+    "FAMILY_GRANT_COMBATANT": FAMILY_GRANT_COMBATANT,
+    "COUPLES_ASSISTANCE_GRANT": COUPLES_ASSISTANCE_GRANT,
+    "PROFESSIONAL_TRAINING_VOUCHER_VALUE": PROFESSIONAL_TRAINING_VOUCHER_VALUE,
+    "ANNUAL_GRANT_THRESHOLDS": ANNUAL_GRANT_THRESHOLDS,
+    "VACATION_VOUCHER_THRESHOLDS": VACATION_VOUCHER_THRESHOLDS,
+    "EXPENSE_CEILINGS": EXPENSE_CEILINGS,
+    "ACADEMIC_CREDITS_THRESHOLDS": ACADEMIC_CREDITS_THRESHOLDS,
+}
+
+# ==============================================================================
+# 2. כללי הזכאות (סט הכללים "app_g" של מנוע הכללים)
+# ==============================================================================
+COMBATANT_UNIT = "לוחם/ת"
+UNIT_TYPES = (COMBATANT_UNIT, "תומכ/ת לחימה", "עורפי/ת")
+
+# שדות הקלט שהחישוב קורא (כל שאר המפתחות ב-inputs אינם חלק מהמפתח במטמון)
+REQUIRED_INPUT_FIELDS = ("reserve_days", "unit_type", "gross_salary")
+INPUT_DEFAULTS = {
+    "num_children": 0,
+    "is_tzav_8": False,
+    "is_married": False,
+    "is_student": False,
+    "is_self_employed": False,
+    "served_during_holidays": False,
+    "therapy_cost": 0,
+    "pet_boarding_cost": 0,
+    "babysitter_cost": 0,
+    "camps_cost": 0,
+    "vacation_cancel_cost": 0,
+    "tuition_cost": 0,
+}
+BENEFIT_INPUT_FIELDS = REQUIRED_INPUT_FIELDS + tuple(INPUT_DEFAULTS)
+INPUT_FIELD_TYPES = {
+    "reserve_days": int, "unit_type": str, "gross_salary": float, "num_children": int,
+    "is_tzav_8": bool, "is_married": bool, "is_student": bool, "is_self_employed": bool,
+    "served_during_holidays": bool, "therapy_cost": float, "pet_boarding_cost": float,
+    "babysitter_cost": float, "camps_cost": float, "vacation_cancel_cost": float, "tuition_cost": float,
+}
+
+class ProfileInputs(namedtuple("ProfileInputs", BENEFIT_INPUT_FIELDS, defaults=tuple(INPUT_DEFAULTS.values()))):
+    """Frozen inputs of one profile: what a session keeps instead of a dict (or locals())."""
+
+    __slots__ = ()
+
+def as_inputs_dict(inputs):
+    """Plain inputs dict from a ProfileInputs record (dicts are returned as they are)."""
+    return inputs._asdict() if isinstance(inputs, ProfileInputs) else inputs
+
+# טבלאות התוצאה לפי סוג התשלום, והתווית של כל אחת בפלט העמודתי (batch_arrow.py)
+PAYMENT_TYPES = {
+    "direct": "מיידי",
+    "future": "עתידי",
+    "potential": "פוטנציאלי",
+}
+
+# עמודות טבלאות התצוגה (רכיב/זכאות, פירוט, סכום [, סוג ערך])
+RESULT_COLUMNS = {
+    "direct": ("רכיב", "פירוט", "סכום (₪)"),
+    "future": ("רכיב", "פירוט", "סכום (₪)"),
+    "potential": ("זכאות", "פירוט", "שווי פוטנציאלי (₪)", "סוג ערך"),
+}
+
+# ערכים נגזרים, לפי הסדר (ערך יכול להשתמש בקודמיו)
+DERIVED = {
+    "combatant": lambda v, c, op: v.unit_type == c.COMBATANT_UNIT,
+    "rear": lambda v, c, op: op.not_(v.combatant),
+    # התעריף היומי מעוגל לאגורה, ורק אז מוכפל בימים
+    "daily_nii": lambda v, c, op: op.maximum(op.divide(v.gross_salary, 30), c.MINIMUM_NII_DAILY_RATE),
+    # מדרגת 10 הימים במענק השנתי חלה על לוחמים בלבד
+    "annual_grant": lambda v, c, op: op.where(v.combatant, c.ANNUAL_GRANT_TIERS.lookup(v.reserve_days),
+                                             c.ANNUAL_GRANT_TIERS_NON_COMBATANT.lookup(v.reserve_days)),
+    "credits": lambda v, c, op: c.ACADEMIC_CREDITS_TIERS.lookup(v.reserve_days),
+    "voucher": lambda v, c, op: op.tier_by(c.VACATION_VOUCHER_TIERS, v.unit_type, v.reserve_days),
+}
+
+# סכומי כסף (בשקלים): קלטים, ערכים נגזרים ותעריפים - המנוע מחשב אותם באגורות שלמות
+MONEY = (
+    "gross_salary", "therapy_cost", "pet_boarding_cost", "babysitter_cost", "camps_cost", "vacation_cancel_cost",
+    "tuition_cost",
+    "daily_nii", "annual_grant", "voucher",
+    "DAILY_ADDITIONAL_GRANT_RATE", "MINIMUM_NII_DAILY_RATE", "FAMILY_GRANT_CHILDREN", "FAMILY_GRANT_COMBATANT",
+    "COUPLES_ASSISTANCE_GRANT", "PROFESSIONAL_TRAINING_VOUCHER_VALUE", "EXPENSE_CEILINGS",
+    "ANNUAL_GRANT_TIERS", "ANNUAL_GRANT_TIERS_NON_COMBATANT", "VACATION_VOUCHER_TIERS",
+)
+
+RULES = (
+    # --- תשלומים ישירים ---
+    Rule("nii", "direct", "תגמול מביטוח לאומי",
+         when=lambda v, c, op: True,
+         amount=lambda v, c, op: v.daily_nii * v.reserve_days,
+         note="({v.daily_nii:,.2f} ₪ ליום)"),
+    Rule("tzav8_additional", "direct", "תגמול נוסף (חרבות ברזל)",
+         when=lambda v, c, op: v.is_tzav_8,
+         amount=lambda v, c, op: c.DAILY_ADDITIONAL_GRANT_RATE * v.reserve_days,
+         note="({c.DAILY_ADDITIONAL_GRANT_RATE} ₪ ליום)"),
+    Rule("family_children", "direct", "מענק משפחה (ילדים עד גיל 14)",
+         when=lambda v, c, op: (v.num_children > 0) & (v.reserve_days >= 8) & v.is_tzav_8,
+         amount=lambda v, c, op: c.FAMILY_GRANT_CHILDREN, note="מענק חד-פעמי"),
+    Rule("family_combatant", "direct", "מענק משפחה מוגדל (לוחמים)",
+         when=lambda v, c, op: v.combatant & (v.reserve_days >= 10),
+         amount=lambda v, c, op: c.FAMILY_GRANT_COMBATANT, note="מענק חד-פעמי"),
+    Rule("family_extended", "direct", "מענק משפחה מוגדל",
+         when=lambda v, c, op: v.rear & (v.reserve_days >= 30),
+         amount=lambda v, c, op: c.FAMILY_GRANT_COMBATANT, note="עבור שירות של 30+ יום"),
+    # --- תשלומים עתידיים ---
+    Rule("annual_grant", "future", "מענק שנתי",
+         when=lambda v, c, op: v.annual_grant > 0,
+         amount=lambda v, c, op: v.annual_grant,
+         note="עבור {v.reserve_days} ימי שירות, ישולם במאי"),
+    # --- זכאויות פוטנציאליות ---
+    Rule("therapy", "potential", "החזר טיפול רגשי/נפשי",
+         when=lambda v, c, op: v.therapy_cost > 0,
+         amount=lambda v, c, op: op.minimum(v.therapy_cost, c.EXPENSE_CEILINGS["therapy"]),
+         note="מותנה בקבלות"),
+    Rule("pet_boarding", "potential", "החזר פנסיון לבע\"ח",
+         when=lambda v, c, op: (v.pet_boarding_cost > 0) & (v.reserve_days >= 8),
+         amount=lambda v, c, op: op.minimum(v.pet_boarding_cost, c.EXPENSE_CEILINGS["pet_boarding"]),
+         note="מותנה בקבלות"),
+    Rule("babysitter", "potential", "החזר בייביסיטר/עזרה בבית",
+         when=lambda v, c, op: (v.babysitter_cost > 0) & ((v.combatant & (v.reserve_days >= 10)) | (v.rear & (v.reserve_days >= 35))),
+         amount=lambda v, c, op: op.minimum(v.babysitter_cost, op.where(v.combatant, c.EXPENSE_CEILINGS["babysitter_combatant"], c.EXPENSE_CEILINGS["babysitter_other"])),
+         note="מותנה בקבלות"),
+    Rule("camps", "potential", "החזר קייטנות/צהרונים",
+         when=lambda v, c, op: (v.camps_cost > 0) & v.served_during_holidays,
+         amount=lambda v, c, op: op.minimum(v.camps_cost, c.EXPENSE_CEILINGS["camps_per_child"] * v.num_children),
+         note="עד {c.EXPENSE_CEILINGS[camps_per_child]:,.0f} ₪ לילד"),
+    Rule("vacation_cancel", "potential", "החזר ביטול חופשה/טיסה",
+         when=lambda v, c, op: (v.vacation_cancel_cost > 0) & v.is_tzav_8,
+         amount=lambda v, c, op: op.minimum(v.vacation_cancel_cost, c.EXPENSE_CEILINGS["vacation_cancel_family"] + v.num_children * c.EXPENSE_CEILINGS["vacation_cancel_per_child"]),
+         note="עקב גיוס בצו 8"),
+    Rule("academic_credits", "potential", "נקודות זכות אקדמיות",
+         when=lambda v, c, op: v.is_student & (v.credits != ""),
+         amount=NOT_MONETARY, note="{v.credits} - מועבר אוטומטית למוסדות", kind=VALUE_KIND_CREDITS),
+    Rule("tuition", "potential", "סיוע בשכר לימוד",
+         when=lambda v, c, op: v.is_student & (v.tuition_cost > 0) & (v.reserve_days >= 28),
+         amount=lambda v, c, op: op.minimum(v.tuition_cost, op.where(v.combatant, c.EXPENSE_CEILINGS["tuition_combatant"], c.EXPENSE_CEILINGS["tuition_other"])),
+         note="דורש הגשת בקשה"),
+    Rule("arnona", "potential", "הנחה בארנונה",
+         when=lambda v, c, op: v.reserve_days >= 20,
+         amount=NOT_MONETARY, note="5-25%, יש לפנות לרשות המקומית", kind=VALUE_KIND_PERCENT),
+    Rule("vacation_voucher", "potential", "שובר חופשה",
+         when=lambda v, c, op: v.voucher > 0,
+         amount=lambda v, c, op: v.voucher,
+         note="נשלח אוטומטית לזכאים"),
+    Rule("training_voucher", "potential", "שובר הכשרה מקצועית",
+         when=lambda v, c, op: (v.reserve_days >= 45) & v.is_tzav_8,
+         amount=lambda v, c, op: c.PROFESSIONAL_TRAINING_VOUCHER_VALUE, note="דרך משרד העבודה"),
+    Rule("couples_assistance", "potential", "סיוע לזוגות",
+         when=lambda v, c, op: (v.reserve_days >= 45) & v.is_tzav_8 & v.is_married,
+         amount=lambda v, c, op: c.COUPLES_ASSISTANCE_GRANT, note="מענק חד פעמי"),
+    Rule("self_employed_fund", "potential", "קרן סיוע לעצמאיים",
+         when=lambda v, c, op: v.is_self_employed & (v.reserve_days >= 8) & v.is_tzav_8,
+         amount=NOT_MONETARY, note="פיצוי על אובדן הכנסות דרך רשות המיסים (תלוי מחזור)", kind=VALUE_KIND_VARIABLE),
+)
+
+def compile_rates(rates):
+    """RuleSet constants for a full RATES dict; tier tables are compiled here (binary search, order-independent)."""
+    thresholds = rates["ANNUAL_GRANT_THRESHOLDS"]
+    return {
+        "COMBATANT_UNIT": COMBATANT_UNIT,
+        "DAILY_ADDITIONAL_GRANT_RATE": rates["DAILY_ADDITIONAL_GRANT_RATE"],
+        "MINIMUM_NII_DAILY_RATE": rates["MINIMUM_NII_DAILY_RATE"],
+        "FAMILY_GRANT_CHILDREN": rates["FAMILY_GRANT_CHILDREN"],
+        "FAMILY_GRANT_COMBATANT": rates["FAMILY_GRANT_COMBATANT"],
+        "COUPLES_ASSISTANCE_GRANT": rates["COUPLES_ASSISTANCE_GRANT"],
+        "PROFESSIONAL_TRAINING_VOUCHER_VALUE": rates["PROFESSIONAL_TRAINING_VOUCHER_VALUE"],
+        "EXPENSE_CEILINGS": rates["EXPENSE_CEILINGS"],
+        "ANNUAL_GRANT_TIERS": TierTable(thresholds),
+        # מדרגת 10 הימים במענק השנתי חלה על לוחמים בלבד
+        "ANNUAL_GRANT_TIERS_NON_COMBATANT": TierTable({d: a for d, a in thresholds.items() if d != 10}),
+        "VACATION_VOUCHER_TIERS": {unit: TierTable({v["days"]: v["value"]}) for unit, v in rates["VACATION_VOUCHER_THRESHOLDS"].items()},
+        "ACADEMIC_CREDITS_TIERS": TierTable(rates["ACADEMIC_CREDITS_THRESHOLDS"], default=""),
+    }
+
+# סט הכללים עם התעריפים שבקוד; get_ruleset("app_g") מחזיר אותו עם תעריפי rates.json
+RULESET = RuleSet(
+    "app_g", tables=tuple(PAYMENT_TYPES), fields=INPUT_FIELD_TYPES, rules=RULES,
+    defaults=INPUT_DEFAULTS, derive=DERIVED, columns=RESULT_COLUMNS, constants=compile_rates(RATES), money=MONEY,
+)
+
+# ==============================================================================
+# 3. פונקציית החישוב המרכזית
+# ==============================================================================
+def calculate_all_benefits(inputs, ruleset=None):
+    """BenefitResults of one profile, with the current rates unless a (pinned) `ruleset` is given."""
+    return BenefitResults(**evaluate(ruleset or get_ruleset("app_g"), inputs))
+
+def results_frame(results, table):
+    """Display DataFrame for one result table, built only when it is rendered."""
+    return records_to_frame(getattr(results, table), RESULT_COLUMNS[table])
+
+def normalize_inputs(inputs):
+    """
+    Full inputs dict for calculate_all_benefits from a partial one (e.g. a JSON body).
+
+    Missing optional fields get INPUT_DEFAULTS; a missing required field raises
+    KeyError and a value of the wrong type raises ValueError.
+    """
+    return normalize_ruleset_inputs(RULESET, inputs)
+
+# ==============================================================================
+# 4. חישוב דרך מטמון התוצאות
+# ==============================================================================
+def calculate_all_benefits_cached(inputs):
+    """calculate_all_benefits behind the shared LRU/TTL cache (inputs: dict or ProfileInputs)."""
+    # BenefitResults אינו ניתן לשינוי, ולכן אין צורך להעתיק אותו בכניסה וביציאה מהמטמון
+    cache = shared_cache("app_g.calculate_all_benefits", RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, copy_value=lambda results: results)
+    inputs = as_inputs_dict(inputs)
+    profile = {name: inputs[name] for name in BENEFIT_INPUT_FIELDS}
+    ruleset = get_ruleset("app_g")  # גרסת התעריפים היא חלק מהמפתח
+    return cache.get_or_compute((ruleset.version, canonical_key(profile)), lambda: calculate_all_benefits(profile, ruleset))
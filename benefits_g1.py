@@ -0,0 +1,383 @@
+"""
+כללי הזכאות של מחשבון ההטבות המורחב (app_g1) - ללא Streamlit, pandas או plotly.
+
+Pure rule core behind app_g1.py: constants, the "app_g1" rule-set of the
+shared rule engine (rule_engine) and calculate_benefits. It can be
+imported (and calculate_benefits called) from batch workers or tests without
+starting a Streamlit script.
+"""
+from typing import NamedTuple
+
+from benefit_records import NOT_MONETARY, VALUE_KIND_ILS, VALUE_KIND_IN_KIND, BenefitRecord, sum_shekels
+from result_cache import canonical_key, shared_cache
+from rule_engine import Rule, RuleSet, get_ruleset, iter_hits
+from tiers import TierTable
+
+# הגדרת קבועים עבור סכומי ההטבות (יש לוודא ולעדכן מספרים אלה על פי הנתונים הרשמיים העדכניים)
+# Constants for benefit amounts (these should be verified and updated with official, current figures)
+# הערה: נתונים אלו הם הערכה בלבד ויש לוודא אותם מול מקורות רשמיים.
+# Note: These figures are estimates only and should be verified against official sources.
+ANNUAL_GRANT_PER_DAY_THRESHOLD = 32  # סף ימים למענק שנתי
+ANNUAL_GRANT_AMOUNT_THRESHOLD_1 = 1200 # סכום מענק ראשון
+ANNUAL_GRANT_AMOUNT_THRESHOLD_2 = 2500 # סכום מענק שני
+ANNUAL_GRANT_AMOUNT_THRESHOLD_3 = 4000 # סכום מענק שלישי
+# מדרגות המענק השנתי לפי ימי שירות (32 / 60 / 200)
+ANNUAL_GRANT_THRESHOLDS = {
+    ANNUAL_GRANT_PER_DAY_THRESHOLD: ANNUAL_GRANT_AMOUNT_THRESHOLD_1,
+    60: ANNUAL_GRANT_AMOUNT_THRESHOLD_2,
+    200: ANNUAL_GRANT_AMOUNT_THRESHOLD_3,
+}
+
+FAMILY_GRANT_PER_10_DAYS = 1000  # מענק משפחה מוגדלת לכל 10 ימים
+PERSONAL_EXPENSES_GRANT_PER_10_DAYS = 466  # מענק הוצאות אישיות מוגדל לכל 10 ימים
+ROAD_6_MAX_REFUND = 300  # החזר כביש 6 מקסימלי לחודש קלנדרי
+
+BABYSITTER_MAX_COMBATANT = 3500  # מקסימום בייביסיטר ללוחם
+BABYSITTER_MAX_REAR = 2000  # מקסימום בייביסיטר לעורף
+
+DOG_BOARDING_MAX = 500  # מקסימום פנסיון כלבים
+
+# עבור טיפולים פסיכולוגיים - יש לוודא תנאים וסכומים מדויקים
+# For psychological treatments - precise conditions and amounts need verification
+THERAPY_MAX_LOW_DAYS = 1500  # מקסימום טיפול רגשי - סכום נמוך יותר (הערכה)
+THERAPY_MAX_HIGH_DAYS = 2500  # מקסימום טיפול רגשי - סכום גבוה יותר (הערכה, לרוב ללוחמים ו/או מעל ימי שירות מסוימים)
+THERAPY_DAYS_THRESHOLD = 20 # ימי שירות לטיפול רגשי בסכום גבוה (הערכה)
+
+TUITION_PERCENT_COMBATANT = 1.0  # 100% החזר שכר לימוד ללוחמים
+TUITION_DAYS_THRESHOLD = 20 # ימי שירות להחזר שכר לימוד
+
+CAMPS_MAX_COMBATANT_FAMILY = 2000  # מקסימום קייטנות למשפחה לוחם
+SPOUSE_ONE_TIME_GRANT = 4500  # מענק חד פעמי לבן זוג לא עובד
+
+TZAV_8_DAYS_FOR_TRAINING = 45 # ימי שירות בצו 8 להכשרה מקצועית
+
+# תקופות קייטנות קיץ / פסח / חגי תשרי (כולל), לחישוב חפיפה לתאריכי השירות - יש לוודא מול לוח החופשות הרשמי
+# Summer camps / Passover / Tishrei holiday periods (inclusive) - verify against the official school calendar
+HOLIDAY_PERIODS = (
+    ("2024-04-22", "2024-04-30"), ("2024-07-01", "2024-08-31"), ("2024-10-02", "2024-10-25"),
+    ("2025-04-12", "2025-04-20"), ("2025-07-01", "2025-08-31"), ("2025-09-22", "2025-10-15"),
+    ("2026-04-01", "2026-04-09"), ("2026-07-01", "2026-08-31"), ("2026-09-11", "2026-10-04"),
+)
+
+# התעריפים שניתן לעדכן מקובץ התעריפים (rates.json, ראו rates.py)
+RATES = {
+    "ANNUAL_GRANT_THRESHOLDS": ANNUAL_GRANT_THRESHOLDS,
+    "FAMILY_GRANT_PER_10_DAYS": FAMILY_GRANT_PER_10_DAYS,
+    "PERSONAL_EXPENSES_GRANT_PER_10_DAYS": PERSONAL_EXPENSES_GRANT_PER_10_DAYS,
+    "ROAD_6_MAX_REFUND": ROAD_6_MAX_REFUND,
+    "BABYSITTER_MAX_COMBATANT": BABYSITTER_MAX_COMBATANT,
+    "BABYSITTER_MAX_REAR": BABYSITTER_MAX_REAR,
+    "DOG_BOARDING_MAX": DOG_BOARDING_MAX,
+    "THERAPY_MAX_LOW_DAYS": THERAPY_MAX_LOW_DAYS,
+    "THERAPY_MAX_HIGH_DAYS": THERAPY_MAX_HIGH_DAYS,
+    "THERAPY_DAYS_THRESHOLD": THERAPY_DAYS_THRESHOLD,
+    "TUITION_PERCENT_COMBATANT": TUITION_PERCENT_COMBATANT,
+    "TUITION_DAYS_THRESHOLD": TUITION_DAYS_THRESHOLD,
+    "CAMPS_MAX_COMBATANT_FAMILY": CAMPS_MAX_COMBATANT_FAMILY,
+    "SPOUSE_ONE_TIME_GRANT": SPOUSE_ONE_TIME_GRANT,
+    "TZAV_8_DAYS_FOR_TRAINING": TZAV_8_DAYS_FOR_TRAINING,
+}
+
+RESULT_CACHE_SIZE = 512  # מספר תוצאות חישוב שנשמרות במטמון המשותף
+RESULT_CACHE_TTL_SECONDS = 3600  # תוקף תוצאה במטמון (שניות)
+
+# ==============================================================================
+# כללי הזכאות (סט הכללים "app_g1" של מנוע הכללים)
+# ==============================================================================
+COMBATANT_UNIT = "לוחם"
+
+# סדר הפרמטרים של calculate_benefits וטיפוס כל שדה
+INPUT_FIELD_TYPES = {
+    "avg_salary": float, "reserve_days": int, "unit_type": str, "num_children": int, "is_married": bool,
+    "has_non_working_spouse": bool, "is_student": bool, "tuition_cost": float, "used_road_6": bool, "road_6_cost": float,
+    "babysitter_cost": float, "dog_boarding_cost": float, "vacation_cancel_cost": float, "therapy_cost": float,
+    "camps_cost": float, "is_tzav_8": bool, "mortgage_rent_cost_input": float, "needs_dedicated_medical_assistance": bool,
+    "needs_preferred_loans": bool, "is_holiday_period_str": str,
+    # מתאריכי השירות (service_periods.py); ברירת המחדל - חודש קלנדרי אחד וללא חפיפה לחגים
+    "service_months": int, "holiday_days": int,
+    # סכום חלקי החודשים ששירתו (10 ימים מתוך 30 = 1/3); 0 = לא ידוע, כלומר חודשים שלמים
+    "service_month_share": float,
+}
+INPUT_DEFAULTS = {"service_months": 1, "holiday_days": 0, "service_month_share": 0.0}
+
+# טבלאות התוצאה לפי סוג התשלום, והתווית של כל אחת בטבלת הזכאויות
+PAYMENT_TYPES = {
+    "immediate": "מיידי",
+    "future": "עתידי (מאי)",
+    "voucher": "שובר",
+    "benefit": "הטבה",
+}
+RESULT_COLUMNS = {table: ("הטבה / תגמול", "פירוט והערות", "סכום משוער (ש״ח)", "סוג ערך") for table in PAYMENT_TYPES}
+
+# ערכים נגזרים, לפי הסדר (ערך יכול להשתמש בקודמיו)
+DERIVED = {
+    "combatant": lambda v, c, op: v.unit_type == c.COMBATANT_UNIT,
+    # Convert string boolean to actual boolean
+    "is_holiday_period": lambda v, c, op: (v.is_holiday_period_str == "כן") | (v.holiday_days > 0),
+    # חודשי השירות לתקרות החודשיות: כל חודש לפי חלקו ששורת, או חודשים שלמים כשאין תאריכים
+    "road_6_months": lambda v, c, op: op.where(v.service_month_share > 0, v.service_month_share, v.service_months),
+    "annual_grant": lambda v, c, op: c.ANNUAL_GRANT_TIERS.lookup(v.reserve_days),
+    "family_grant": lambda v, c, op: ((v.reserve_days - 30) // 10) * c.FAMILY_GRANT_PER_10_DAYS,
+    "personal_expenses_grant": lambda v, c, op: (v.reserve_days // 10) * c.PERSONAL_EXPENSES_GRANT_PER_10_DAYS,
+    "babysitter_max": lambda v, c, op: op.where(v.combatant, c.BABYSITTER_MAX_COMBATANT, c.BABYSITTER_MAX_REAR),
+    "therapy_max": lambda v, c, op: op.where(v.combatant & (v.reserve_days >= c.THERAPY_DAYS_THRESHOLD),
+                                             c.THERAPY_MAX_HIGH_DAYS, c.THERAPY_MAX_LOW_DAYS),
+}
+
+# סכומי כסף (בשקלים): קלטים, ערכים נגזרים ותעריפים - המנוע מחשב אותם באגורות שלמות
+MONEY = (
+    "avg_salary", "tuition_cost", "road_6_cost", "babysitter_cost", "dog_boarding_cost", "vacation_cancel_cost",
+    "therapy_cost", "camps_cost", "mortgage_rent_cost_input",
+    "annual_grant", "family_grant", "personal_expenses_grant", "babysitter_max", "therapy_max",
+    "ANNUAL_GRANT_TIERS", "FAMILY_GRANT_PER_10_DAYS", "PERSONAL_EXPENSES_GRANT_PER_10_DAYS", "ROAD_6_MAX_REFUND",
+    "BABYSITTER_MAX_COMBATANT", "BABYSITTER_MAX_REAR", "DOG_BOARDING_MAX", "THERAPY_MAX_LOW_DAYS",
+    "THERAPY_MAX_HIGH_DAYS", "CAMPS_MAX_COMBATANT_FAMILY", "SPOUSE_ONE_TIME_GRANT",
+)
+
+def _general_benefit(rule_id, name, note, min_days=10):
+    """Non-monetary general benefit offered from `min_days` reserve days on."""
+    return Rule(rule_id, "benefit", name, when=lambda v, c, op: v.reserve_days >= min_days,
+                amount=NOT_MONETARY, note=note, kind=VALUE_KIND_IN_KIND, labels={"category": "הטבות כלליות"})
+
+RULES = (
+    # 1. תגמול ביטוח לאומי (Payment for reserve days based on average salary)
+    # הערה: יש לוודא אם החישוב הוא לפי ברוטו או נטו, ולעדכן את ההנחיה למשתמש בהתאם.
+    # עבור עצמאים, חישוב התגמול שונה (לרוב מבוסס על הכנסה חייבת). נדרש מחקר נוסף.
+    # Note: It needs to be verified if the calculation is based on gross or net, and update user instructions accordingly.
+    # For self-employed, compensation calculation is different (usually based on taxable income). Further research required.
+    Rule("nii", "immediate", "תגמול ביטוח לאומי",
+         when=lambda v, c, op: (v.avg_salary > 0) & (v.reserve_days > 0),
+         # assuming avg_salary is monthly; מעוגל לאגורה אחרי ההכפלה בימים
+         amount=lambda v, c, op: op.divide(v.avg_salary * v.reserve_days, 30),
+         note="תשלום עבור {v.reserve_days} ימי מילואים לפי ממוצע שכר חודשי ({v.avg_salary:,.0f} ש\"ח). יש לוודא אם הקלט הוא ברוטו/נטו ורלוונטיות לעצמאים.",
+         labels={"category": "תשלום שכר"}),
+    # 2. מענק שנתי (Annual Grant) - Future payment
+    # הערה: יש לוודא סכומים וספי ימים מדויקים למענק שנתי.
+    # Note: Precise amounts and day thresholds for the annual grant need verification.
+    Rule("annual_grant", "future", "מענק שנתי",
+         when=lambda v, c, op: v.annual_grant > 0,
+         amount=lambda v, c, op: v.annual_grant,
+         note="מענק שנתי המשולם ב-1 במאי לשנה העוקבת עבור {v.reserve_days} ימי שירות. יש לוודא תנאים וסכומים מדויקים.",
+         labels={"category": "מענקים שנתיים", "chart": "מענק שנתי"}),
+    # 3. מענק משפחה מוגדלת (Increased Family Grant)
+    Rule("family_per_10_days", "immediate", "מענק משפחה מוגדלת",
+         when=lambda v, c, op: v.is_married & (v.reserve_days > 30) & (v.num_children > 0) & (v.family_grant > 0),
+         amount=lambda v, c, op: v.family_grant,
+         note="תשלום נוסף למשפחות עבור כל 10 ימי שירות לאחר 30 יום שירות רצופים.",
+         labels={"category": "מענקים מיוחדים", "chart": "מענק משפחה מוגדלת"}),
+    # 4. מענק הוצאות אישיות מוגדל (Increased Personal Expenses Grant)
+    Rule("personal_expenses", "immediate", "מענק הוצאות אישיות מוגדל",
+         when=lambda v, c, op: (v.reserve_days > 0) & (v.personal_expenses_grant > 0),
+         amount=lambda v, c, op: v.personal_expenses_grant,
+         note="מענק מוגדל בהתאם לימי השירות ({c.PERSONAL_EXPENSES_GRANT_PER_10_DAYS} ש\"ח לכל 10 ימים).",
+         labels={"category": "מענקים מיוחדים", "chart": "מענק הוצאות אישיות מוגדל"}),
+    # 5. החזר כביש 6 (Road 6 Refund)
+    Rule("road_6", "immediate", "החזר כביש 6",
+         when=lambda v, c, op: v.used_road_6 & (v.road_6_cost > 0),
+         # העלות היא לחודש; ההחזר עד התקרה לכל חודש קלנדרי, יחסית לימי השירות באותו חודש
+         amount=lambda v, c, op: op.scale(op.minimum(v.road_6_cost, c.ROAD_6_MAX_REFUND), v.road_6_months),
+         note="החזר עד {c.ROAD_6_MAX_REFUND} ש\"ח לחודש קלנדרי, יחסית לימי השירות בו ({v.road_6_months:.3g} חודשי שירות).",
+         labels={"category": "מענקי הוצאות", "chart": "החזר כביש 6"}),
+    # 6. בייביסיטר (Babysitter)
+    Rule("babysitter", "immediate", "בייביסיטר",
+         when=lambda v, c, op: (v.num_children > 0) & (v.babysitter_cost > 0),
+         amount=lambda v, c, op: op.minimum(v.babysitter_cost, v.babysitter_max),
+         note="החזר עד {v.babysitter_max} ש\"ח לחודש (ללוחמים/עורף).",
+         labels={"category": "החזרי הוצאות אישיות", "chart": "בייביסיטר"}),
+    # 7. פנסיון כלבים (Dog Boarding)
+    Rule("pet_boarding", "immediate", "פנסיון כלבים",
+         when=lambda v, c, op: v.dog_boarding_cost > 0,
+         amount=lambda v, c, op: op.minimum(v.dog_boarding_cost, c.DOG_BOARDING_MAX),
+         note="החזר עד {c.DOG_BOARDING_MAX} ש\"ח.",
+         labels={"category": "החזרי הוצאות אישיות", "chart": "פנסיון כלבים"}),
+    # 8. ביטול חופשה וטיסה (Cancellation of Vacation/Flight)
+    Rule("vacation_cancel", "immediate", "ביטול חופשה וטיסה",
+         when=lambda v, c, op: v.vacation_cancel_cost > 0,
+         amount=lambda v, c, op: v.vacation_cancel_cost,
+         note="פיצוי מלא או חלקי בהתאם לתנאים.",
+         labels={"category": "החזרי הוצאות", "chart": "ביטול חופשה וטיסה"}),
+    # 9. טיפול רגשי ונפשי (Emotional and Psychological Treatment)
+    # הערה: יש לוודא תנאים וסכומים מדויקים לטיפולים שונים (אישי, זוגי).
+    # Note: Precise conditions and amounts for various treatments (individual, couple) need verification.
+    Rule("therapy", "immediate", "טיפול אישי וזוגי",
+         when=lambda v, c, op: v.therapy_cost > 0,
+         amount=lambda v, c, op: op.minimum(v.therapy_cost, v.therapy_max),
+         note="החזר עד {v.therapy_max} ש\"ח, תלוי בימי השירות ובסוג היחידה. יש לוודא ספציפית לטיפול אישי/זוגי.",
+         labels={"category": "טיפול רגשי ונפשי", "chart": "טיפול רגשי ונפשי"}),
+    # 10. החזר שכר לימוד לסטודנטים (Tuition Fee Refund for Students)
+    Rule("tuition", "immediate", "החזר שכר לימוד",
+         when=lambda v, c, op: v.is_student & (v.tuition_cost > 0) & v.combatant & (v.reserve_days >= c.TUITION_DAYS_THRESHOLD),
+         amount=lambda v, c, op: op.scale(v.tuition_cost, c.TUITION_PERCENT_COMBATANT),
+         note="עד 100% ללוחמים (תלוי במספר ימי שירות).",
+         labels={"category": "זכאות מיוחדת לסטודנטים", "chart": "החזר שכר לימוד"}),
+    # 11. השתתפות בקייטנות (Participation in Summer Camps)
+    # הערה: הזכאות רק לשירות בתקופת קייטנות קיץ/פסח/חגי תשרי ('is_holiday_period'); הסכום אינו תלוי בה.
+    # Note: eligibility requires service during a holiday period ('is_holiday_period'); the amount does not depend on it.
+    Rule("camps", "immediate", "השתתפות בקייטנות",
+         when=lambda v, c, op: (v.num_children > 0) & (v.camps_cost > 0) & v.combatant & v.is_holiday_period,
+         amount=lambda v, c, op: op.minimum(v.camps_cost, c.CAMPS_MAX_COMBATANT_FAMILY),
+         note="עד {c.CAMPS_MAX_COMBATANT_FAMILY} ש\"ח בשנה למשפחה (לוחמים).",
+         labels={"category": "הטבות משפחתיות", "chart": "השתתפות בקייטנות"}),
+    Rule("spouse_grant", "immediate", "מענק חד פעמי לבן זוג לא עובד",
+         when=lambda v, c, op: v.has_non_working_spouse & v.is_married,
+         amount=lambda v, c, op: c.SPOUSE_ONE_TIME_GRANT,
+         note="{c.SPOUSE_ONE_TIME_GRANT} ש\"ח חד פעמי.",
+         labels={"category": "מענקים מיוחדים", "chart": "מענק חד פעמי לבן זוג לא עובד"}),
+    Rule("training_voucher", "voucher", "שוברים להכשרה מקצועית",
+         when=lambda v, c, op: v.is_tzav_8 & (v.reserve_days >= c.TZAV_8_DAYS_FOR_TRAINING),
+         amount=NOT_MONETARY, kind=VALUE_KIND_IN_KIND,
+         note="למשרתים {c.TZAV_8_DAYS_FOR_TRAINING} ימים ומעלה בצו 8. (הטבה שאינה כספית ישירה)",
+         labels={"category": "הטבות תעסוקתיות"}),
+    Rule("vacation_voucher", "voucher", "שוברי חופשה",
+         when=lambda v, c, op: v.reserve_days >= 20,
+         amount=NOT_MONETARY, kind=VALUE_KIND_IN_KIND,
+         note="שוברים לחופשה/נופש. (הטבה שאינה כספית ישירה)",
+         labels={"category": "הטבות נוספות"}),
+    Rule("mortgage_rent", "immediate", "סיוע בשכר דירה/משכנתא",
+         when=lambda v, c, op: v.mortgage_rent_cost_input > 0,
+         amount=lambda v, c, op: v.mortgage_rent_cost_input,
+         note="סיוע עד {v.mortgage_rent_cost_input} ש״ח.",
+         labels={"category": "הטבות מגורים", "chart": "סיוע שכר דירה/משכנתא"}),
+    _general_benefit("vehicle_license", "הנחות באגרות רישוי", "הנחות אפשריות באגרות רישוי רכב."),
+    _general_benefit("public_transport", "הטבות בתחבורה ציבורית", "הטבות בשימוש בתחבורה ציבורית."),
+    _general_benefit("health_insurance", "הטבות בביטוחי בריאות משלימים", "הנחות או הטבות בהצטרפות לביטוחי בריאות משלימים."),
+    _general_benefit("arnona", "הטבות בארנונה / מים (רשות מקומית)", "הנחות אפשריות בתשלומי ארנונה או מים."),
+    _general_benefit("culture", "הטבות במוסדות תרבות ופנאי", "הנחות או כניסה חינם למוזיאונים, תיאטראות וכדומה."),
+    _general_benefit("leisure", "הטבות בנופש ואירוח", "הנחות בבתי מלון, צימרים או אתרי נופש."),
+    Rule("medical_assistance", "benefit", "סיוע רפואי ייעודי",
+         when=lambda v, c, op: v.needs_dedicated_medical_assistance,
+         amount=NOT_MONETARY, kind=VALUE_KIND_IN_KIND,
+         note="סיוע רפואי ייעודי דרך אגף שיקום במשרד הביטחון במידה של פציעה/מחלה הקשורה לשירות.",
+         labels={"category": "בריאות"}),
+    Rule("preferred_loans", "benefit", "הלוואות בתנאים מועדפים",
+         when=lambda v, c, op: v.needs_preferred_loans,
+         amount=NOT_MONETARY, kind=VALUE_KIND_IN_KIND,
+         note="הלוואות בתנאים מועדפים דרך בנקים או קרנות מסוימות.",
+         labels={"category": "הטבות כלכליות"}),
+    # הטבת נקודות מס 2026 - יש לוודא תנאים וסכומים מדויקים
+    # Tax point benefit 2026 - precise conditions and amounts need verification
+    # Rule("tax_points_2026", "future", "נקודות מס 2026", when=..., amount=..., (Needs implementation)
+    #      note="הטבת נקודות מס החל מ-2026. יש לוודא זכאות ושווי.", labels={"category": "הטבות מס"}),
+)
+
+def compile_rates(rates):
+    """RuleSet constants for a full RATES dict (the tier table is compiled here)."""
+    return {
+        "COMBATANT_UNIT": COMBATANT_UNIT,
+        "ANNUAL_GRANT_TIERS": TierTable(rates["ANNUAL_GRANT_THRESHOLDS"]),
+        "FAMILY_GRANT_PER_10_DAYS": rates["FAMILY_GRANT_PER_10_DAYS"],
+        "PERSONAL_EXPENSES_GRANT_PER_10_DAYS": rates["PERSONAL_EXPENSES_GRANT_PER_10_DAYS"],
+        "ROAD_6_MAX_REFUND": rates["ROAD_6_MAX_REFUND"],
+        "BABYSITTER_MAX_COMBATANT": rates["BABYSITTER_MAX_COMBATANT"],
+        "BABYSITTER_MAX_REAR": rates["BABYSITTER_MAX_REAR"],
+        "DOG_BOARDING_MAX": rates["DOG_BOARDING_MAX"],
+        "THERAPY_MAX_LOW_DAYS": rates["THERAPY_MAX_LOW_DAYS"],
+        "THERAPY_MAX_HIGH_DAYS": rates["THERAPY_MAX_HIGH_DAYS"],
+        "THERAPY_DAYS_THRESHOLD": rates["THERAPY_DAYS_THRESHOLD"],
+        "TUITION_PERCENT_COMBATANT": rates["TUITION_PERCENT_COMBATANT"],
+        "TUITION_DAYS_THRESHOLD": rates["TUITION_DAYS_THRESHOLD"],
+        "CAMPS_MAX_COMBATANT_FAMILY": rates["CAMPS_MAX_COMBATANT_FAMILY"],
+        "SPOUSE_ONE_TIME_GRANT": rates["SPOUSE_ONE_TIME_GRANT"],
+        "TZAV_8_DAYS_FOR_TRAINING": rates["TZAV_8_DAYS_FOR_TRAINING"],
+    }
+
+# סט הכללים עם התעריפים שבקוד; get_ruleset("app_g1") מחזיר אותו עם תעריפי rates.json
+RULESET = RuleSet(
+    "app_g1", tables=tuple(PAYMENT_TYPES), fields=INPUT_FIELD_TYPES, rules=RULES,
+    defaults=INPUT_DEFAULTS, derive=DERIVED, columns=RESULT_COLUMNS,
+    constants=compile_rates(RATES), money=MONEY,
+)
+
+def _entitlement(rule, amount, note):
+    """One row of the entitlements table (non-monetary amounts show their value kind)."""
+    return {
+        "קטגוריה": rule.labels["category"],
+        "הטבה / תגמול": rule.name,
+        "פירוט והערות": note,
+        "סכום משוער (ש״ח)": amount if rule.kind == VALUE_KIND_ILS else rule.kind,
+        "סוג תשלום": PAYMENT_TYPES[rule.table]
+    }
+
+# פונקציה לחישוב זכאויות והטבות כספיות
+def calculate_benefits(
+    avg_salary, reserve_days, unit_type, num_children, is_married,
+    has_non_working_spouse, is_student, tuition_cost, used_road_6, road_6_cost,
+    babysitter_cost, dog_boarding_cost, vacation_cancel_cost, therapy_cost,
+    camps_cost, is_tzav_8, mortgage_rent_cost_input, needs_dedicated_medical_assistance, needs_preferred_loans,
+    is_holiday_period_str, # New input parameter
+    service_months=1, holiday_days=0, service_month_share=0.0,
+):
+    inputs = dict(locals())
+    entitlements = []
+    amounts = {"immediate": [], "future": []}
+    daily_salary_compensation = 0
+    monetary_breakdown_for_chart = []
+
+    for rule, amount, note in iter_hits(get_ruleset("app_g1"), inputs):
+        entitlements.append(_entitlement(rule, amount, note))
+        if rule.rule_id == "nii":
+            daily_salary_compensation = amount
+        if rule.table in amounts:
+            amounts[rule.table].append(amount)
+        if "chart" in rule.labels:
+            monetary_breakdown_for_chart.append({"name": rule.labels["chart"], "value": amount})
+
+    return (entitlements, daily_salary_compensation, sum_shekels(amounts["immediate"]), sum_shekels(amounts["future"]),
+            monetary_breakdown_for_chart)
+
+# חישוב דרך מטמון התוצאות המשותף (מחזיר עותק פרטי של הרשימות)
+def calculate_benefits_cached(*args):
+    cache = shared_cache("app_g1.calculate_benefits", RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS)
+    version = get_ruleset("app_g1").version  # גרסת התעריפים היא חלק מהמפתח
+    return cache.get_or_compute((version, canonical_key(args)), lambda: calculate_benefits(*args))
+
+# ==============================================================================
+# תוצאה דחוסה לשמירה ב-session_state
+# ==============================================================================
+class BenefitSummary(NamedTuple):
+    """
+    Immutable result of one calculation, as kept per session by app_g1.
+
+    Holds only the salary / days it was computed for and one BenefitRecord
+    per entitlement; totals, table rows and chart slices are derived on
+    demand, so a session stores no lists of dicts.
+    """
+
+    avg_salary: float
+    reserve_days: int
+    records: tuple = ()
+
+    @property
+    def daily_salary_compensation(self):
+        return sum_shekels(r.amount for r in self.records if r.rule_id == "nii")
+
+    def total(self, table):
+        """Sum of the amounts in payment table `table` ("immediate" or "future")."""
+        return sum_shekels(r.amount for r in self.records if RULESET.rule(r.rule_id).table == table)
+
+    def entitlements(self):
+        """Rows of the entitlements table, as calculate_benefits returns them."""
+        return [_entitlement(RULESET.rule(r.rule_id), r.amount, r.note) for r in self.records]
+
+    def chart_slices(self):
+        """(chart label, amount) of every entitlement shown in the breakdown chart."""
+        labels = [(RULESET.rule(r.rule_id).labels.get("chart"), r.amount) for r in self.records]
+        return [(label, amount) for label, amount in labels if label is not None]
+
+    @classmethod
+    def from_hits(cls, inputs, hits):
+        """Summary of (rule, amount, note) hits, from iter_hits or an IncrementalEvaluation."""
+        records = tuple(BenefitRecord(rule.rule_id, rule.name, note, amount, rule.kind) for rule, amount, note in hits)
+        return cls(inputs["avg_salary"], inputs["reserve_days"], records)
+
+
+def summarize_benefits(*args, ruleset=None):
+    """calculate_benefits(*args) as a BenefitSummary (current rates unless `ruleset` is given)."""
+    inputs = {**INPUT_DEFAULTS, **dict(zip(INPUT_FIELD_TYPES, args))}
+    return BenefitSummary.from_hits(inputs, iter_hits(ruleset or get_ruleset("app_g1"), inputs))
+
+def summarize_benefits_cached(*args):
+    # BenefitSummary אינו ניתן לשינוי: כל הסשנים עם אותם נתונים מחזיקים את אותו אובייקט
+    cache = shared_cache("app_g1.summarize_benefits", RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, copy_value=lambda summary: summary)
+    ruleset = get_ruleset("app_g1")
+    return cache.get_or_compute((ruleset.version, canonical_key(args)), lambda: summarize_benefits(*args, ruleset=ruleset))
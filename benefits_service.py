@@ -0,0 +1,299 @@
+"""
+שירות HTTP/JSON מקומי לחישוב הטבות (asyncio, ללא Streamlit).
+
+Exposes the app_g rule engine (calculate_all_benefits) to programmatic
+callers such as payroll integrations:
+
+    POST /calculate         one profile (JSON object) -> its entitlements
+    POST /calculate/batch   {"profiles": [...]}       -> {"results": [...]}
+    GET  /metrics           request counts, latency percentiles, throughput, rates version
+    GET  /health
+    GET  /assets/<name>     bundled images (logo, insignia), ?width=120|180 to scale down
+
+Identical single-profile requests that arrive while one is already pending
+are coalesced onto the same result, and encoded responses are kept in the
+shared result cache. Large batches are split across a bounded process pool
+so CPU-bound work never blocks the event loop.
+
+Each request is computed with one snapshot of the rate tables (rates.py),
+so an updated rates.json takes effect for new requests without a restart;
+cached responses are keyed by the rates version.
+
+Usage:
+    python benefits_service.py --port 8765 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from urllib.parse import parse_qs
+
+from assets import ASSET_FILES, ASSET_WIDTHS, load_asset
+from benefits_g import RESULT_CACHE_TTL_SECONDS, calculate_all_benefits, normalize_inputs
+from rates import current_rates, rates_status, ruleset_for
+from result_cache import canonical_key, shared_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 2**20
+INLINE_BATCH_LIMIT = 256  # אצוות קטנות מחושבות ישירות בלולאת האירועים
+LATENCY_WINDOW = 10_000  # מספר המדידות האחרונות לחישוב אחוזונים
+RESPONSE_CACHE_SIZE = 4096
+RESULT_TABLES = ("direct", "future", "potential")
+
+# ==============================================================================
+# קידוד תוצאות ל-JSON
+# ==============================================================================
+def result_to_json(results):
+    """JSON-ready dict for a BenefitResults (NaN amounts become null)."""
+    def record(r):
+        amount = None if math.isnan(r.amount) else r.amount
+        return {"rule_id": r.rule_id, "name": r.name, "note": r.note, "amount": amount, "kind": r.kind}
+    payload = {table: [record(r) for r in getattr(results, table)] for table in RESULT_TABLES}
+    payload["totals"] = {table: results.total(table) for table in RESULT_TABLES}
+    return payload
+
+def encode_profile(profile, ruleset=None):
+    return json.dumps(result_to_json(calculate_all_benefits(profile, ruleset)), ensure_ascii=False)
+
+def encode_profiles(profiles, version=None):
+    """Worker-side batch job: the JSON fragments of each profile's result, with rates `version`."""
+    ruleset = current_rates().ruleset("app_g") if version is None else ruleset_for("app_g", version)
+    return [encode_profile(profile, ruleset) for profile in profiles]
+
+# ==============================================================================
+# מדדים
+# ==============================================================================
+class ServiceMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.profiles = 0
+        self.coalesced = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, seconds, profiles=0, ok=True):
+        self.requests += 1
+        self.profiles += profiles
+        self.errors += not ok
+        self.latencies.append(seconds)
+
+    def snapshot(self, cache_stats=None):
+        uptime = time.monotonic() - self.started
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000 if ordered else None
+
+        return {
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "profiles": self.profiles,
+            "coalesced": self.coalesced,
+            "requests_per_second": self.requests / uptime if uptime else 0.0,
+            "profiles_per_second": self.profiles / uptime if uptime else 0.0,
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99),
+                           "max": ordered[-1] * 1000 if ordered else None},
+            "cache": cache_stats,
+        }
+
+# ==============================================================================
+# השירות
+# ==============================================================================
+class BenefitService:
+    def __init__(self, workers=None, coalesce_window=0.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.coalesce_window = coalesce_window
+        self.metrics = ServiceMetrics()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._pool_slots = asyncio.Semaphore(self.workers * 2)
+        # התשובות המקודדות אינן ניתנות לשינוי (bytes) ולכן לא מועתקות
+        self._cache = shared_cache("service.responses", RESPONSE_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, copy_value=lambda value: value)
+        self._inflight = {}
+        self._pending = []
+        self._flush_handle = None
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    # --- בקשה בודדת עם איחוד בקשות זהות ---
+    async def calculate(self, profile, ruleset):
+        key = (ruleset.version, canonical_key(profile))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        future = self._inflight.get(key)
+        if future is not None:
+            self.metrics.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = self._inflight[key] = loop.create_future()
+            self._pending.append((key, profile, ruleset, future))
+            if self._flush_handle is None:
+                # חלון 0: כל הבקשות שפוענחו באותו סבב של הלולאה מחושבות יחד
+                self._flush_handle = loop.call_later(self.coalesce_window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        pending, self._pending, self._flush_handle = self._pending, [], None
+        for key, profile, ruleset, future in pending:
+            try:
+                body = encode_profile(profile, ruleset).encode("utf-8")
+                self._cache.put(key, body)
+                future.set_result(body)
+            except Exception as exc:  # noqa: BLE001 - מועבר לכל הממתינים
+                future.set_exception(exc)
+            finally:
+                del self._inflight[key]
+
+    # --- אצווה ---
+    async def calculate_batch(self, profiles, ruleset):
+        if len(profiles) <= INLINE_BATCH_LIMIT:
+            fragments = [encode_profile(profile, ruleset) for profile in profiles]
+        else:
+            size = math.ceil(len(profiles) / self.workers)
+            shards = [profiles[i:i + size] for i in range(0, len(profiles), size)]
+            fragments = []
+            for part in await asyncio.gather(*(self._run_in_pool(shard, ruleset.version) for shard in shards)):
+                fragments.extend(part)
+        return ('{"results":[' + ",".join(fragments) + "]}").encode("utf-8")
+
+    async def _run_in_pool(self, shard, version):
+        async with self._pool_slots:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, encode_profiles, shard, version)
+
+    # --- ניתוב ---
+    async def dispatch(self, method, path, body):
+        """Returns (status, body bytes, number of profiles computed)."""
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, b'{"status":"ok"}', 0
+        if method == "GET" and path == "/metrics":
+            metrics = dict(self.metrics.snapshot(self._cache.stats()), rates=rates_status())
+            return HTTPStatus.OK, json.dumps(metrics, ensure_ascii=False).encode("utf-8"), 0
+        if method != "POST" or path not in ("/calculate", "/calculate/batch"):
+            return HTTPStatus.NOT_FOUND, _error("not found"), 0
+        ruleset = current_rates().ruleset("app_g")  # תמונת מצב אחת של התעריפים לכל הבקשה
+        try:
+            payload = json.loads(body or b"null")
+            if path == "/calculate":
+                if not isinstance(payload, dict):
+                    raise ValueError("body must be a JSON object")
+                return HTTPStatus.OK, await self.calculate(normalize_inputs(payload), ruleset), 1
+            profiles = payload.get("profiles") if isinstance(payload, dict) else None
+            if not isinstance(profiles, list):
+                raise ValueError('body must be {"profiles": [...]}')
+            normalized = []
+            for i, profile in enumerate(profiles):
+                try:
+                    normalized.append(normalize_inputs(profile))
+                except (KeyError, ValueError, TypeError, AttributeError) as exc:
+                    raise ValueError(f"profiles[{i}]: {exc}") from exc
+            return HTTPStatus.OK, await self.calculate_batch(normalized, ruleset), len(normalized)
+        except (KeyError, ValueError, TypeError) as exc:
+            return HTTPStatus.BAD_REQUEST, _error(str(exc).strip("'\"")), 0
+        except RuntimeError as exc:
+            # ruleset_for בתהליך עובד: קובץ התעריפים התחלף באמצע הבקשה - ניסיון חוזר יחושב בתעריפים החדשים
+            return HTTPStatus.SERVICE_UNAVAILABLE, _error(f"{exc}; retry the request"), 0
+
+    # --- תמונות סטטיות (מהזיכרון, עם כותרות מטמון) ---
+    @staticmethod
+    def asset(path, query, if_none_match=None):
+        """Returns (status, body bytes, extra headers) for GET /assets/<name>."""
+        name = path[len("/assets/"):]
+        width = parse_qs(query).get("width", [""])[0]
+        # רק הרוחבות שהעמודים מציגים: כל רוחב אחר היה נשמר במטמון כעותק נוסף
+        if name not in ASSET_FILES or (width and (not width.isdigit() or int(width) not in ASSET_WIDTHS)):
+            return HTTPStatus.NOT_FOUND, _error("not found"), None
+        found = load_asset(name, int(width) if width else None)
+        if found is None:
+            return HTTPStatus.NOT_FOUND, _error("asset not bundled"), None
+        if if_none_match == found.etag:
+            return HTTPStatus.NOT_MODIFIED, b"", found.headers()
+        return HTTPStatus.OK, found.data, found.headers()
+
+    # --- חיבור HTTP/1.1 (כולל keep-alive) ---
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, _error("body too large"), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                path, _, query = path.partition("?")
+                extra, profiles = None, 0
+                try:
+                    if method == "GET" and path.startswith("/assets/"):
+                        status, payload, extra = self.asset(path, query, headers.get("if-none-match"))
+                    else:
+                        status, payload, profiles = await self.dispatch(method, path, body)
+                except Exception:  # noqa: BLE001 - שגיאה פנימית מוחזרת כ-500 והחיבור ממשיך
+                    status, payload, profiles = HTTPStatus.INTERNAL_SERVER_ERROR, _error("internal error"), 0
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive, extra)
+                self.metrics.observe(time.perf_counter() - started, profiles, ok=status < 400)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive, extra_headers=None):
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        headers.update(extra_headers or {})
+        headers["Content-Length"] = len(payload)
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+def _error(message):
+    return json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, coalesce_window=0.0):
+    service = BenefitService(workers, coalesce_window)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"serving on http://{host}:{port} with {service.workers} batch worker(s)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON reservist benefit calculation service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="process-pool size for large batches (default: CPU count)")
+    parser.add_argument("--coalesce-window-ms", type=float, default=0.0,
+                        help="how long a single request waits for identical ones to join it")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.coalesce_window_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
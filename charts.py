@@ -0,0 +1,215 @@
+"""
+גרפי פאי של הרכב ההטבות, במטמון לפי סכומים מעוגלים.
+
+Building a plotly express pie costs tens of milliseconds, and the results
+pages used to pay it on every rerun even when nothing changed. Figures are
+instead built once per distinct set of slice totals (rounded to whole
+shekels) and kept in a bounded, process-wide cache together with their JSON
+spec. The cached Figure is shared between sessions and must be treated as
+read-only; st.plotly_chart only reads it.
+
+For batch runs, slice_matrix() computes the slices of every roster row with
+the vectorized rule engine and render_images() writes one static image per
+distinct combination, in parallel (PNG / SVG / PDF need kaleido; JSON specs
+need nothing extra).
+
+Chart names follow the rule-set names: "app_g" is the composition pie of
+the results page, "app_g1" the donut of monetary additions.
+"""
+import functools
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+from benefit_records import VALUE_KIND_ILS
+from result_cache import shared_cache
+from rule_engine import evaluate_columns, prepare_columns
+
+CHART_CACHE_SIZE = 1024
+CHART_ROUNDING = 1  # ₪; ריצות batch יכולות לעגל גס יותר כדי לצמצם את מספר התמונות
+IMAGE_FORMATS = ("png", "svg", "pdf", "json")
+
+# שמות הפרוסות בגרף ההרכב של app_g, לפי טבלת התוצאות
+COMPOSITION_LABELS = {
+    "direct": "תשלומים ישירים",
+    "future": "תשלומים עתידיים",
+    "potential": "פוטנציאל מימוש",
+}
+
+
+class ChartSpec(NamedTuple):
+    """A built figure (read-only) and its serialized plotly JSON."""
+
+    figure: Any
+    json: str
+
+# ==============================================================================
+# 1. בניית הגרפים (זהים לגרפים שהיו נבנים ישירות בעמודים)
+# ==============================================================================
+def _composition_figure(slices):
+    import pandas as pd
+    import plotly.express as px
+    chart_data = pd.DataFrame({'קטגוריה': [label for label, _ in slices], 'סכום': [value for _, value in slices]})
+    fig = px.pie(
+        chart_data,
+        names='קטגוריה',
+        values='סכום',
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label', insidetextfont=dict(size=14, color='black'))
+    fig.update_layout(showlegend=True, title_text='חלוקת שווי ההטבות', title_x=0.5)
+    return fig
+
+def _breakdown_figure(slices):
+    import pandas as pd
+    import plotly.express as px
+    df_chart = pd.DataFrame({'name': [label for label, _ in slices], 'value': [value for _, value in slices]})
+    fig = px.pie(df_chart, values='value', names='name',
+                 title='פירוט התוספות הכספיות באחוזים',
+                 hole=0.4,
+                 color_discrete_sequence=px.colors.qualitative.Pastel)
+    fig.update_traces(textinfo='percent+label', pull=[0.05] * len(df_chart))
+    fig.update_layout(showlegend=True, title_x=0.5)
+    return fig
+
+CHART_BUILDERS = {
+    "app_g": _composition_figure,
+    "app_g1": _breakdown_figure,
+}
+
+# ==============================================================================
+# 2. מטמון לפי סכומים מעוגלים
+# ==============================================================================
+def chart_key(slices, rounding=CHART_ROUNDING):
+    """Slices rounded to `rounding` shekels, without the empty ones: the cache key of a chart."""
+    key = []
+    for label, value in slices:
+        rounded = int(round(value / rounding)) * rounding
+        if rounded > 0:
+            key.append((label, rounded))
+    return tuple(key)
+
+def _build(chart, key):
+    import plotly.io as pio
+    figure = CHART_BUILDERS[chart](key)
+    return ChartSpec(figure, pio.to_json(figure, validate=False))
+
+def pie_chart(chart, slices):
+    """
+    Cached ChartSpec for `chart` over (label, amount) slices, or None when no slice is positive.
+
+    The figure is drawn from the rounded amounts, so every profile that maps
+    to the same key gets exactly the same chart.
+    """
+    key = chart_key(slices)
+    if not key:
+        return None
+    # ChartSpec אינו משתנה לאחר הבנייה, ולכן לא מועתק
+    cache = shared_cache("charts.pie", CHART_CACHE_SIZE, ttl=None, copy_value=lambda spec: spec)
+    return cache.get_or_compute((chart, key), lambda: _build(chart, key))
+
+# ==============================================================================
+# 3. תמונות סטטיות לריצות Batch
+# ==============================================================================
+def slice_matrix(ruleset, roster):
+    """
+    (labels, amounts) with the chart slices of every roster row.
+
+    `amounts` is an (n, len(labels)) float array: table totals for the
+    "app_g" composition chart, chart-label totals for "app_g1".
+    """
+    import numpy as np
+    n, _ = prepare_columns(ruleset, roster)
+    if ruleset.name == "app_g":
+        labels = tuple(COMPOSITION_LABELS[table] for table in ruleset.tables)
+        slot = {rule.rule_id: ruleset.tables.index(rule.table) for rule in ruleset.rules if rule.kind == VALUE_KIND_ILS}
+    else:
+        labels = tuple(dict.fromkeys(rule.labels["chart"] for rule in ruleset.rules if rule.labels and "chart" in rule.labels))
+        slot = {rule.rule_id: labels.index(rule.labels["chart"])
+                for rule in ruleset.rules if rule.labels and "chart" in rule.labels}
+    amounts = np.zeros((n, len(labels)))
+    for hits in evaluate_columns(ruleset, roster, notes=False):
+        column = slot.get(hits.rule.rule_id)
+        if column is not None:
+            amounts[hits.rows, column] += np.nan_to_num(hits.amounts)
+    return labels, amounts
+
+def unique_keys(labels, amounts, rounding=CHART_ROUNDING):
+    """(distinct chart keys, per-row position in that list) for a slice_matrix result."""
+    import numpy as np
+    rounded = np.rint(amounts / rounding).astype(np.int64) * rounding
+    distinct, inverse = np.unique(rounded, axis=0, return_inverse=True)
+    keys = [tuple((label, value) for label, value in zip(labels, row) if value > 0) for row in distinct.tolist()]
+    return keys, inverse.reshape(-1)
+
+def image_name(chart, key, fmt):
+    """Stable file name for the image of one (chart, key) combination."""
+    digest = hashlib.blake2b(repr((chart, key)).encode("utf-8"), digest_size=10).hexdigest()
+    return f"{chart}_{digest}.{fmt}"
+
+def check_image_format(fmt):
+    """Raises ValueError for an unknown format and RuntimeError when its renderer is missing."""
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"unknown image format {fmt!r} (known: {', '.join(IMAGE_FORMATS)})")
+    if fmt != "json":
+        try:
+            import kaleido  # noqa: F401 - נדרש ל-write_image
+        except ImportError:
+            raise RuntimeError(f"Rendering {fmt} images requires kaleido (pip install kaleido).") from None
+
+@functools.lru_cache(maxsize=None)
+def _template(chart):
+    """The chart's figure dict for a one-slice key; its trace is re-filled for every batch key."""
+    return _build(chart, (("", 1),)).figure.to_plotly_json()
+
+def figure_dict(chart, key):
+    """
+    Plain figure dict for `key`, without building (and validating) a plotly Figure.
+
+    Per-slice trace attributes (labels, values, pull, ...) are the one-element
+    lists of the template, repeated for every slice.
+    """
+    template = _template(chart)
+    trace = dict(template["data"][0])
+    for name, value in trace.items():
+        if isinstance(value, (list, tuple)) and len(value) == 1:
+            trace[name] = list(value) * len(key)
+    trace["labels"] = [label for label, _ in key]
+    trace["values"] = [value for _, value in key]
+    return {"data": [trace], "layout": template["layout"]}
+
+def _write_image(job):
+    chart, key, path, fmt = job
+    import plotly.io as pio
+    figure = figure_dict(chart, key)
+    tmp = path + ".tmp"
+    if fmt == "json":
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(pio.to_json(figure, validate=False))
+    else:
+        pio.write_image(figure, tmp, format=fmt, validate=False)
+    os.replace(tmp, path)
+
+def render_images(chart, keys, out_dir, fmt="png", workers=None):
+    """
+    Writes one image per distinct key into `out_dir`.
+
+    Images are rendered in a process pool (JSON specs are cheap enough to
+    write inline). Images that already exist are kept, so an interrupted run
+    can resume. Returns the number of images written.
+    """
+    check_image_format(fmt)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for key in dict.fromkeys(keys):
+        path = os.path.join(out_dir, image_name(chart, key, fmt))
+        if key and not os.path.exists(path):
+            jobs.append((chart, key, path, fmt))
+    if len(jobs) <= 1 or workers == 1 or fmt == "json":
+        for job in jobs:
+            _write_image(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_write_image, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))))
+    return len(jobs)
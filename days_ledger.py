@@ -0,0 +1,211 @@
+"""
+ספר ימים מצטבר: זרם רשומות נוכחות -> אירועי שינוי בזכאויות כשמשרת חוצה סף ימים.
+
+Reserve days add up over the year, one call-up or attendance record at a
+time; an entitlement changes when a soldier's total crosses a day threshold
+(annual grant tiers, 28 days for tuition, 45 days for the vouchers, ...).
+DaysLedger keeps one day total (and year) per roster row and turns a stream
+of (row, days, date) records into EntitlementChange events, without
+evaluating the population again on every record.
+
+The thresholds are not listed here: they are found in the rule-set itself.
+Every rule that reads reserve_days is evaluated once, vectorized, over days
+0..max_days for each distinct combination of the other fields it reads in
+the roster (money fields only as zero / non-zero), and the days where it
+starts or stops applying, or its value moves by more than its regular
+per-day increment, are the rule-set's milestones - a short sorted tuple. A
+record then costs one bisect over the milestones; only when a soldier's
+total passes one are that soldier's rules evaluated, at each milestone
+passed, and the differences reported. Amounts that grow every day (daily
+compensation) report only when they start or stop applying.
+
+Records without a date accumulate; with dates, a record in a later year
+starts the soldier's count from zero. Records are assumed not to overlap
+(merge overlapping call-ups first, e.g. with service_periods.py).
+
+Usage:
+    python days_ledger.py roster.csv records.csv > events.csv
+    python days_ledger.py roster_g1.csv records.csv --ruleset app_g1
+"""
+import bisect
+import sys
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from benefit_records import VALUE_KIND_ILS
+from benefits_batch import MAX_RESERVE_DAYS
+from rule_engine import RuleSet, evaluate_columns, get_ruleset, iter_hits, prepare_columns
+
+DAYS_FIELD = "reserve_days"
+
+
+class EntitlementChange(NamedTuple):
+    """One entitlement of one soldier that changed when the day total reached `days`."""
+
+    row: int
+    days: int  # סך הימים שבו חל השינוי (אבן הדרך)
+    date: Any  # the date of the record that crossed it, or None
+    rule_id: str
+    name: str
+    before: Any  # amount (₪ rules) or note, None when it did not apply
+    after: Any
+
+
+def _probe_column(column, kind):
+    # סכומי כסף רק כאפס / לא-אפס (במקסימום, כדי שתקרות יישארו גלויות); שאר השדות כפי שהם
+    if kind is float:
+        return np.where(column > 0, column.max(), 0.0)
+    return column
+
+
+def day_milestones(ruleset, roster, max_days=MAX_RESERVE_DAYS):
+    """
+    (milestones, accruing rule ids) of `ruleset` for the profiles in `roster`.
+
+    Milestones are the day totals in 1..max_days where some rule changes
+    for some combination of roster values; accruing rules are those whose
+    amount grows with every day.
+    """
+    n, columns = prepare_columns(ruleset, roster)
+    days = np.arange(max_days + 1)
+    milestones, accruing = set(), set()
+    for rule in ruleset.rules:
+        fields = sorted(ruleset.dependencies[rule.rule_id] - {DAYS_FIELD})
+        if DAYS_FIELD not in ruleset.dependencies[rule.rule_id] or n == 0:
+            continue
+        probes = pd.DataFrame({name: _probe_column(columns[name], ruleset.fields[name]) for name in fields}).drop_duplicates()
+        m = len(probes) if fields else 1
+        grid = {name: np.full(m * days.size, columns[name][0]) for name in ruleset.fields}
+        grid.update({name: np.repeat(probes[name].to_numpy(), days.size) for name in fields})
+        grid[DAYS_FIELD] = np.tile(days, m)
+        applies = np.zeros(m * days.size, dtype=bool)
+        values = np.zeros(m * days.size)
+        for hits in evaluate_columns(ruleset, grid, rule_ids=(rule.rule_id,)):
+            applies[hits.rows] = True
+            if rule.kind == VALUE_KIND_ILS:
+                values[hits.rows] = hits.amounts
+            else:
+                notes = np.broadcast_to(np.asarray(hits.notes, dtype=object), hits.rows.shape)
+                values[hits.rows] = np.unique(notes.astype(str), return_inverse=True)[1].reshape(-1) + 1
+        applies, values = applies.reshape(m, days.size), values.reshape(m, days.size)
+        changed = applies[:, 1:] != applies[:, :-1]
+        steps = np.diff(values, axis=1).round(6)
+        if rule.kind == VALUE_KIND_ILS:
+            # צעד יומי קבוע (תגמול לפי ימים) אינו שינוי בזכאות; מדרגות ותוספות לכל 10 ימים כן
+            regular = np.median(steps, axis=1, keepdims=True)
+            if (regular != 0).any():
+                accruing.add(rule.rule_id)
+            else:
+                changed |= steps != 0
+        else:
+            changed |= steps != 0
+        milestones.update((np.flatnonzero(changed.any(axis=0)) + 1).tolist())
+    return tuple(sorted(milestones)), frozenset(accruing)
+
+
+class DaysLedger:
+    """
+    Running reserve-day totals of a roster, reporting entitlement changes as records arrive.
+
+    `roster` is a DataFrame or dict of columns with the rule-set's fields;
+    its reserve_days column, if any, holds the totals so far. Soldiers are
+    roster positions 0..n-1.
+    """
+
+    def __init__(self, ruleset, roster, max_days=MAX_RESERVE_DAYS):
+        self.ruleset = ruleset
+        if DAYS_FIELD not in roster:
+            present = {name: roster[name] for name in ruleset.fields if name in roster}
+            size = len(next(iter(present.values()))) if present else 0
+            roster = dict(present, **{DAYS_FIELD: np.zeros(size, dtype=np.int64)})
+        self.n, self._columns = prepare_columns(ruleset, roster)
+        self.milestones, self.accruing = day_milestones(ruleset, self._columns, max_days)
+        # במעבר אבן דרך מוערכים רק הכללים שתלויים בימים
+        self._day_rules = RuleSet(ruleset.name, ruleset.tables, ruleset.fields,
+                                  [rule for rule in ruleset.rules if DAYS_FIELD in ruleset.dependencies[rule.rule_id]],
+                                  ruleset.defaults, ruleset.constants.__dict__, ruleset.derive, ruleset.columns, ruleset.version,
+                                  ruleset.money)
+        self.days = np.asarray(self._columns[DAYS_FIELD], dtype=np.int32).copy()
+        self.year = np.zeros(self.n, dtype=np.int16)  # 0 = עוד לא התקבלה רשומה עם תאריך
+        self.records = 0
+        self.evaluations = 0  # הערכות של פרופיל (רק במעבר אבן דרך)
+
+    def _entitlements(self, row, days):
+        profile = {name: self._columns[name][row].item() for name in self.ruleset.fields}
+        profile[DAYS_FIELD] = days
+        self.evaluations += 1
+        state = {}
+        for rule, amount, note in iter_hits(self._day_rules, profile):
+            value = amount if rule.kind == VALUE_KIND_ILS else note
+            # תגמול מצטבר: רק תחילת / סוף הזכאות הם שינוי, לא הסכום שגדל כל יום
+            state[rule.rule_id] = (rule, value, True if rule.rule_id in self.accruing else value)
+        return state
+
+    def record(self, row, days=1, date=None):
+        """Adds `days` of service to soldier `row`; returns the EntitlementChange events (usually none)."""
+        if not 0 <= row < self.n:
+            raise IndexError(f"row {row} is not in the roster (0..{self.n - 1})")
+        if days < 0:
+            raise ValueError("days must not be negative")
+        self.records += 1
+        if date is not None:
+            year = int(str(date)[:4])
+            if year < self.year[row]:
+                raise ValueError(f"row {row}: record of {year} after records of {self.year[row]}")
+            if year > self.year[row]:
+                if self.year[row]:
+                    self.days[row] = 0  # שנה חדשה: הספירה מתחילה מאפס
+                self.year[row] = year
+        before = int(self.days[row])
+        after = before + days
+        self.days[row] = after
+        first = bisect.bisect_right(self.milestones, before)
+        last = bisect.bisect_right(self.milestones, after)
+        if first == last:
+            return []
+        events = []
+        previous = self._entitlements(row, before)
+        for milestone in self.milestones[first:last]:
+            current = self._entitlements(row, milestone)
+            for rule in self._day_rules.rules:
+                old, new = previous.get(rule.rule_id), current.get(rule.rule_id)
+                if (old and old[2]) != (new and new[2]):
+                    events.append(EntitlementChange(row, milestone, date, rule.rule_id, rule.name,
+                                                    old and old[1], new and new[1]))
+            previous = current
+        return events
+
+    def consume(self, records):
+        """Yields the events of (row, days[, date]) records, in order."""
+        for record in records:
+            yield from self.record(*record)
+
+
+def main(argv=None):
+    import argparse
+    from rule_engine import RULESET_MODULES
+    parser = argparse.ArgumentParser(description="Replay service-day records and print entitlement changes as CSV.")
+    parser.add_argument("roster", help="roster file (.csv or .parquet); its reserve_days are the totals so far")
+    parser.add_argument("records", help="records file (.csv) with row and days columns, and optionally date")
+    parser.add_argument("--ruleset", choices=sorted(RULESET_MODULES), default="app_g")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="records read at a time")
+    args = parser.parse_args(argv)
+    roster = pd.read_parquet(args.roster) if args.roster.endswith(".parquet") else pd.read_csv(args.roster)
+    ledger = DaysLedger(get_ruleset(args.ruleset), roster)
+    out = sys.stdout
+    out.write(",".join(EntitlementChange._fields) + "\n")
+    for chunk in pd.read_csv(args.records, chunksize=args.chunk_size):
+        missing = sorted({"row", "days"} - set(chunk.columns))
+        if missing:
+            sys.exit(f"{args.records}: missing column(s) {', '.join(missing)} (expected row, days[, date])")
+        dates = chunk["date"].tolist() if "date" in chunk else [None] * len(chunk)
+        events = list(ledger.consume(zip(chunk["row"].tolist(), chunk["days"].tolist(), dates)))
+        if events:
+            pd.DataFrame(events, columns=EntitlementChange._fields).to_csv(out, header=False, index=False)
+    print(f"{ledger.records:,} records, {ledger.evaluations:,} profile evaluations, "
+          f"milestones {', '.join(map(str, ledger.milestones))}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
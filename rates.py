@@ -0,0 +1,302 @@
+"""
+טבלאות תעריפים חיצוניות (rates.json) עם גרסה, טעינה מחדש חמה ותמונת מצב אחת לכל בקשה.
+
+The rates of both calculators (daily rates, grants, expense ceilings, tier
+thresholds - the RATES dict of benefits_g / benefits_g1) can be overridden
+by a versioned JSON file, so a policy update is a file edit instead of a
+code change and a restart:
+
+    {"version": "2025-07-01",
+     "app_g": {"MINIMUM_NII_DAILY_RATE": 310.5, "EXPENSE_CEILINGS": {...}, ...},
+     "app_g1": {...}}
+
+Sections and keys left out keep the values defined in code. The file is
+validated and compiled once per change into a RateSnapshot: immutable
+rule-sets with their tier tables built, tagged with the version (plus a
+content hash, so an edit that forgets to bump the version still gets fresh
+cache keys). current_rates() checks the file's mtime at most every
+RATES_CHECK_INTERVAL_SECONDS and swaps the snapshot atomically; an invalid
+file is reported and the previous snapshot stays in use.
+
+A request takes one snapshot and uses it throughout - `with pinned_rates():`
+makes every current_rates() / get_ruleset() call inside it return the same
+snapshot (Streamlit script runs, HTTP requests). Code that reruns on its own
+later but shows results computed earlier (Streamlit fragments and callbacks)
+pins the snapshot kept with those results instead, via pinned_to().
+
+Replace the file atomically (write a temporary file, then rename it), e.g.:
+
+    python rates.py rates.json --write-builtin 2025-07-01   # the rates defined in code
+    python rates.py new_rates.json && mv new_rates.json rates.json
+"""
+import contextlib
+import contextvars
+import functools
+import hashlib
+import importlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, NamedTuple
+
+from rule_engine import RULESET_MODULES, builtin_ruleset
+
+RATES_FILE = Path(os.environ.get("BENEFIT_RATES_FILE", Path(__file__).resolve().parent / "rates.json"))
+RATES_CHECK_INTERVAL_SECONDS = 2.0
+BUILTIN_VERSION = "builtin"
+
+
+class RateSnapshot(NamedTuple):
+    """One compiled, immutable version of the rate tables."""
+
+    version: str  # הגרסה שבקובץ + גיבוב התוכן, או "builtin"
+    source: str
+    rulesets: Any  # read-only mapping: rule-set name -> RuleSet compiled with these rates
+
+    def ruleset(self, name):
+        try:
+            return self.rulesets[name]
+        except KeyError:
+            raise KeyError(f"unknown rule-set {name!r} (known: {', '.join(self.rulesets)})") from None
+
+# ==============================================================================
+# 1. אימות והידור
+# ==============================================================================
+def _check(path, value, builtin):
+    """`value` checked against the shape of the value defined in code; JSON tier keys become ints."""
+    if isinstance(builtin, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"{path} must be an object")
+        sample = next(iter(builtin.values()))
+        if all(isinstance(key, int) for key in builtin):
+            # מדרגות: ספי הימים הם מפתחות, ומספרם יכול להשתנות
+            if not value:
+                raise ValueError(f"{path} must have at least one tier")
+            checked = {}
+            for key, item in value.items():
+                if not str(key).isdigit():
+                    raise ValueError(f"{path}: tier threshold {key!r} must be a whole number of days")
+                checked[int(key)] = _check(f"{path}.{key}", item, sample)
+            return checked
+        if set(value) != set(builtin):
+            missing, unknown = sorted(set(builtin) - set(value)), sorted(set(value) - set(builtin))
+            raise ValueError(f"{path}: missing key(s) {missing}, unknown key(s) {unknown}")
+        return {key: _check(f"{path}.{key}", value[key], builtin[key]) for key in builtin}
+    if isinstance(builtin, str):
+        if not isinstance(value, str):
+            raise ValueError(f"{path} must be a string")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{path} must be a non-negative number")
+    return value
+
+def compile_rates(document, source="<memory>"):
+    """
+    RateSnapshot for a parsed rates document.
+
+    Raises ValueError for a missing version, an unknown section or key, or
+    a value whose shape differs from the one defined in code.
+    """
+    if not isinstance(document, dict) or not isinstance(document.get("version"), str) or not document["version"]:
+        raise ValueError('rates must be a JSON object with a non-empty "version" string')
+    unknown = sorted(set(document) - {"version", *RULESET_MODULES})
+    if unknown:
+        raise ValueError(f"unknown rates section(s): {', '.join(unknown)}")
+    digest = hashlib.blake2b(json.dumps(document, sort_keys=True).encode("utf-8"), digest_size=4).hexdigest()
+    version = f"{document['version']}+{digest}"
+    rulesets = {}
+    for name, module_name in RULESET_MODULES.items():
+        module = importlib.import_module(module_name)
+        section = document.get(name, {})
+        if not isinstance(section, dict):
+            raise ValueError(f"{name} must be an object")
+        unknown = sorted(set(section) - set(module.RATES))
+        if unknown:
+            raise ValueError(f"{name}: unknown rate(s): {', '.join(unknown)}")
+        rates = dict(module.RATES)
+        rates.update({key: _check(f"{name}.{key}", value, module.RATES[key]) for key, value in section.items()})
+        rulesets[name] = module.RULESET.with_constants(version, **module.compile_rates(rates))
+    return RateSnapshot(version, source, MappingProxyType(rulesets))
+
+def load_rates(path=RATES_FILE):
+    """RateSnapshot compiled from the rates file at `path`."""
+    with open(path, encoding="utf-8") as f:
+        try:
+            document = json.load(f)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"invalid JSON: {exc}") from None
+    return compile_rates(document, str(path))
+
+def builtin_rates():
+    """RateSnapshot of the rates defined in code."""
+    rulesets = {name: importlib.import_module(module).RULESET for name, module in RULESET_MODULES.items()}
+    return RateSnapshot(BUILTIN_VERSION, "<code>", MappingProxyType(rulesets))
+
+def rates_document(version=None):
+    """The rates file content (a JSON-ready dict) equivalent to the rates defined in code."""
+    document = {"version": version or time.strftime("%Y-%m-%d")}
+    for name, module in RULESET_MODULES.items():
+        document[name] = importlib.import_module(module).RATES
+    return document
+
+# ==============================================================================
+# 2. טעינה מחדש חמה
+# ==============================================================================
+class RateStore:
+    """
+    The current RateSnapshot of one rates file, reloaded when the file changes.
+
+    current() costs a clock read between checks; a check is one os.stat().
+    The snapshot reference is replaced in a single assignment, so readers
+    never see a partly updated set of rates.
+    """
+
+    def __init__(self, path=RATES_FILE, interval=RATES_CHECK_INTERVAL_SECONDS, clock=time.monotonic, log=sys.stderr):
+        self.path = Path(path)
+        self.interval = interval
+        self.error = None  # the last load failure, if the file currently in place is invalid
+        self.reloads = 0
+        self._clock = clock
+        self._log = log
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._next_check = float("-inf")
+
+    def current(self):
+        if self._clock() >= self._next_check or self._snapshot is None:
+            with self._lock:
+                if self._clock() >= self._next_check or self._snapshot is None:
+                    self._refresh()
+                    self._next_check = self._clock() + self.interval
+        return self._snapshot
+
+    def reload(self):
+        """Checks the file now, regardless of the interval; returns the current snapshot."""
+        with self._lock:
+            self._refresh()
+            self._next_check = self._clock() + self.interval
+        return self._snapshot
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature and self._snapshot is not None:
+            return
+        self._signature = signature
+        if signature is None:
+            # אין קובץ: התעריפים שבקוד (אלא אם כבר נטען קובץ תקין - הוא נשאר בתוקף)
+            if self._snapshot is None:
+                self._snapshot = builtin_rates()
+            return
+        try:
+            snapshot = load_rates(self.path)
+        except (OSError, ValueError) as exc:
+            self.error = f"{self.path}: {exc}"
+            print(f"rates: keeping {self._snapshot.version if self._snapshot else BUILTIN_VERSION} rates, "
+                  f"could not load {self.error}", file=self._log)
+            if self._snapshot is None:
+                self._snapshot = builtin_rates()
+            return
+        if self._snapshot is not None and snapshot.version != self._snapshot.version:
+            self.reloads += 1
+        self._snapshot, self.error = snapshot, None
+
+
+_store = RateStore()
+_pinned = contextvars.ContextVar("pinned_rates", default=None)
+
+def current_rates():
+    """The RateSnapshot pinned for this request, or else the latest one of the rates file."""
+    return _pinned.get() or _store.current()
+
+def reload_rates():
+    """Re-reads the rates file now (e.g. from an admin endpoint or a signal handler)."""
+    return _store.reload()
+
+def ruleset_for(name, version):
+    """
+    Rule-set `name` with rates `version`, for a worker process computing part of a request.
+
+    Reloads the file if this process has not seen that version yet; raises
+    RuntimeError if the file has meanwhile moved on to another version.
+    """
+    ruleset = current_rates().ruleset(name)
+    if ruleset.version != version:
+        ruleset = reload_rates().ruleset(name)
+        if ruleset.version != version:
+            raise RuntimeError(f"rates changed during the request ({version} -> {ruleset.version})")
+    return ruleset
+
+def _plain(value):
+    # MappingProxyType אינו ניתן ל-pickle; מילונים רגילים כן
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+def ruleset_state(ruleset):
+    """(name, version, compiled constants) of a rule-set, as picklable values for worker processes."""
+    return ruleset.name, ruleset.version, {name: _plain(value) for name, value in ruleset.constants.__dict__.items()}
+
+def ruleset_from_state(state):
+    """The rule-set described by ruleset_state(), rebuilt from its module and those constants (no file access)."""
+    name, version, constants = state
+    return builtin_ruleset(name).with_constants(version, **constants)
+
+def rates_status():
+    """{"version", "source", "error", "reloads"} of the rates file, for /metrics and logs."""
+    snapshot = current_rates()
+    return {"version": snapshot.version, "source": snapshot.source, "error": _store.error, "reloads": _store.reloads}
+
+@contextlib.contextmanager
+def pinned_rates(snapshot=None):
+    """Within the block, current_rates() returns `snapshot` (default: the current one)."""
+    token = _pinned.set(snapshot or current_rates())
+    try:
+        yield _pinned.get()
+    finally:
+        _pinned.reset(token)
+
+def pinned_to(get_snapshot):
+    """
+    Decorator: the function runs within pinned_rates(get_snapshot()), e.g. a
+    Streamlit fragment or callback, which reruns outside the page's
+    pinned_rates() block but must use the rates of the results it shows.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def pinned(*args, **kwargs):
+            with pinned_rates(get_snapshot()):
+                return func(*args, **kwargs)
+        return pinned
+    return decorate
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Validate a rates file, or write one with the rates defined in code.")
+    parser.add_argument("path", nargs="?", default=str(RATES_FILE))
+    parser.add_argument("--write-builtin", metavar="VERSION", help="write the rates defined in code to PATH as VERSION")
+    args = parser.parse_args(argv)
+    if args.write_builtin:
+        tmp = args.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rates_document(version=args.write_builtin), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        os.replace(tmp, args.path)
+    try:
+        snapshot = load_rates(args.path)
+    except (OSError, ValueError) as exc:
+        sys.exit(f"{args.path}: {exc}")
+    print(f"{args.path}: rates {snapshot.version} OK ({', '.join(snapshot.rulesets)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+מטמון תוצאות חישוב (LRU + TTL) המשותף לכל הסשנים בתהליך.
+
+Streamlit re-executes the main script on every rerun, so a cache created at
+the top of app_g.py / app_g1.py would be thrown away each time. Caches are
+therefore registered here, in an imported module, via shared_cache(), and
+live for the whole server process.
+
+Values are copied on the way in and on the way out (copy.deepcopy by
+default, which deep-copies DataFrames), so callers never share a mutable
+object with the cache or with each other.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+DEFAULT_MAXSIZE = 512
+DEFAULT_TTL_SECONDS = 3600
+
+# ==============================================================================
+# מפתח קנוני
+# ==============================================================================
+def _canonical(value):
+    # סקלר של NumPy/pandas -> ערך פייתון רגיל
+    if getattr(value, "ndim", None) == 0 and hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, Mapping):
+        return canonical_key(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(v) for v in value)
+    # שם הטיפוס נשמר במפתח: 30 ו-30.0 שוות ב-hash אך מעוצבות אחרת בטקסט הפירוט
+    return (type(value).__name__, value)
+
+def canonical_key(values):
+    """Hashable key for a mapping (order-independent) or a sequence of inputs."""
+    if isinstance(values, Mapping):
+        return tuple((k, _canonical(v)) for k, v in sorted(values.items()))
+    return tuple(_canonical(v) for v in values)
+
+# ==============================================================================
+# המטמון
+# ==============================================================================
+class ResultCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL_SECONDS, copy_value=copy.deepcopy, clock=time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._copy = copy_value
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self._clock():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return self._copy(value)
+
+    def put(self, key, value):
+        value = self._copy(value)
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns a copy of the cached value, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # החישוב מתבצע מחוץ לנעילה; שני חוטים עשויים לחשב את אותו מפתח במקביל
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl}
+
+    def __len__(self):
+        return len(self._data)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def shared_cache(name, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL_SECONDS, **kwargs):
+    """Process-wide cache registered under `name` (created on first use)."""
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            cache = _registry[name] = ResultCache(maxsize, ttl, **kwargs)
+        return cache
@@ -0,0 +1,236 @@
+"""
+תוצאות מקודדות: קוד כלל קטן לכל זכאות, טבלת תוויות משותפת, ופירוט שמעוצב רק לפי דרישה.
+
+A batch result row repeats the same long Hebrew strings - the rule name, the
+payment type, the value kind and a detail sentence with a few numbers in it -
+for every soldier the rule applies to. CodedResults keeps instead, per hit:
+
+    rule     int16     code of the rule: its position in the rule-set, and
+                       the row of the shared label table (rule_labels)
+    amount   float64   like the amount column of the result tables
+
+and, only for the hits of rules whose detail reads values, those values
+(the template's v.<field>s, sums of money in agorot) in parameter columns:
+p<i> (int64: whole numbers and yes/no), f<i> (float64) and t<i> (int32
+codes into one shared tuple of texts), i being the value's position in the
+template. A parameter column has an entry only for the hits whose rule uses
+it, so a rule with a fixed detail costs its code and its amount alone. Hits
+are grouped by roster row (CSR, like service_periods.py): row `rows[i]` owns
+hits offsets[i]:offsets[i+1], in rule order.
+
+The detail texts are rendered from the templates only when asked for:
+details() for any subset of hits, to_frames() for the very tables that
+calculate_ruleset_batch returns. The rates a template shows (c.<...>) are
+written into the label's template when the labels are built, so the label
+table alone renders the details - results written under old rates stay
+readable after the rates file moves on (batch_arrow.read_coded).
+"""
+import string
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from benefit_records import VALUE_KINDS
+from rule_engine import NOTE_PARAMS, Values, evaluate_columns, note_kinds, to_shekels
+
+# סוג הערך -> קידומת עמודת הפרמטר שמחזיקה אותו
+PARAM_PREFIXES = {"bool": "p", "int": "p", "float": "f", "str": "t"}
+_PARAM_DTYPES = {"p": np.int64, "f": np.float64, "t": np.int32}
+
+
+class RuleLabel(NamedTuple):
+    """Row `code` of the shared label table: what every hit of one rule displays."""
+
+    rule_id: str
+    table: str
+    name: str
+    kind: str  # value kind (₪, נ"ז, ...)
+    template: str  # the rule's note template, with the rates it shows already filled in
+    fields: tuple  # the v.<field> names the template reads
+    kinds: tuple  # their kinds: "bool", "int" (money in agorot), "float" or "str"
+    money: tuple  # per field: a sum of money (kept in agorot, shown in shekels)
+    columns: tuple  # the parameter column holding each of them (p0, t0, ...)
+    labels: Any  # the rule's extra display fields (category, chart label, ...), or None
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+def _fill_constants(template, constants):
+    """`template` with its c.<...> fields formatted from `constants`; the v.<field>s are left in place."""
+    parsed = list(string.Formatter().parse(template))
+    if all(field is None for _, field, _, _ in parsed):
+        return _escape(template)  # פירוט קבוע מוצג כלשונו
+    parts = []
+    for literal, field, spec, conversion in parsed:
+        parts.append(_escape(literal))
+        if field is None:
+            continue
+        placeholder = "{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}"
+        parts.append(_escape(placeholder.format(c=constants)) if field.startswith("c.") else placeholder)
+    return "".join(parts)
+
+def rule_labels(ruleset):
+    """The label table of `ruleset`: one RuleLabel per rule, in rule order (index = rule code)."""
+    kinds = note_kinds(ruleset)
+    labels = []
+    for rule in ruleset.rules:
+        rule_kinds = kinds[rule.rule_id]
+        fields = ruleset.note_fields(rule.rule_id)
+        columns = tuple(f"{PARAM_PREFIXES[kind]}{position}" for position, kind in enumerate(rule_kinds))
+        labels.append(RuleLabel(rule.rule_id, rule.table, rule.name, rule.kind, _fill_constants(rule.note, ruleset.constants),
+                                fields, rule_kinds, tuple(name in ruleset.money for name in fields), columns, rule.labels))
+    return tuple(labels)
+
+def render_details(label, params, size):
+    """
+    `size` detail texts of one rule as a list of str, from its label and the
+    values its template reads (`params`: one column per label.fields name).
+    """
+    if not label.fields:
+        return [label.template.format()] * size
+    values = []
+    for column, money in zip(params, label.money):
+        column = column.tolist()
+        # ערכי פייתון רגילים (וסכומים בשקלים), כמו בחישוב הבודד
+        values.append([to_shekels(value) for value in column] if money else column)
+    return [label.template.format(v=Values(zip(label.fields, row))) for row in zip(*values)]
+
+def param_columns(labels):
+    """Names of the parameter columns used by a label table, sorted."""
+    return sorted({column for label in labels for column in label.columns})
+
+
+class CodedResults:
+    """
+    The results of a rule-set for a roster, as rule codes and template values.
+
+    Build with calculate_coded() (or batch_arrow.read_coded); `labels` is
+    rule_labels() of the rule-set, `tables` maps each of its result tables
+    to the display columns, and `params` maps each parameter column to its
+    entries, in hit order. Nothing here refers back to the rule-set or its
+    rates.
+    """
+
+    __slots__ = ("name", "version", "tables", "labels", "rows", "offsets", "rule", "amount", "params", "texts")
+
+    def __init__(self, name, version, tables, labels, rows, offsets, rule, amount, params, texts):
+        self.name = name  # שם סט הכללים
+        self.version = version  # גרסת התעריפים שבה חושבו התוצאות
+        self.tables = tables  # טבלה -> עמודות התצוגה, לפי סדר הטבלאות
+        self.labels = labels
+        self.rows = rows  # int64 roster row numbers with at least one hit
+        self.offsets = offsets  # int64, len(rows) + 1
+        self.rule = rule  # int16 rule code per hit
+        self.amount = amount  # float64 per hit
+        self.params = params  # עמודת פרמטר -> ערכים, רק לפגיעות של כללים שמשתמשים בה
+        self.texts = texts  # tuple of the texts behind the t<i> codes
+
+    def __len__(self):
+        return self.rule.size
+
+    @property
+    def nbytes(self):
+        """Memory held by the arrays and texts (the rule-set and label table are shared)."""
+        arrays = (self.rows, self.offsets, self.rule, self.amount, *self.params.values())
+        return sum(array.nbytes for array in arrays) + sum(len(text.encode("utf-8")) for text in self.texts)
+
+    def hit_rows(self):
+        """The roster row number of every hit."""
+        return np.repeat(self.rows, np.diff(self.offsets))
+
+    def uses(self, column):
+        """Bool per hit: whether the hit's rule keeps a value in parameter column `column`."""
+        used = np.array([column in label.columns for label in self.labels], dtype=bool)
+        return used[self.rule]
+
+    def details(self, positions=None):
+        """The detail texts of the hits at `positions` (all of them by default), rendered from the templates."""
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        codes = self.rule[positions]
+        out = np.empty(positions.size, dtype=object)
+        entry = {}  # עמודת פרמטר -> מיקום הערך של כל פגיעה בעמודה
+        texts = np.asarray(self.texts, dtype=object)
+        for code in np.unique(codes).tolist():
+            label = self.labels[code]
+            at = np.flatnonzero(codes == code)
+            params = []
+            for column, kind in zip(label.columns, label.kinds):
+                if column not in entry:
+                    entry[column] = np.cumsum(self.uses(column)) - 1
+                values = self.params[column][entry[column][positions[at]]]
+                params.append(texts[values] if kind == "str" else values.astype(bool) if kind == "bool" else values)
+            out[at] = render_details(label, params, at.size)
+        return out
+
+    def to_frames(self):
+        """The long-format result tables, as calculate_ruleset_batch returns them (details rendered)."""
+        import pandas as pd
+        rows, details = self.hit_rows(), self.details()
+        names = np.array([label.name for label in self.labels], dtype=object)
+        kinds = np.array([VALUE_KINDS.index(label.kind) for label in self.labels], dtype=np.int8)
+        order = list(self.tables)
+        tables = np.array([order.index(label.table) for label in self.labels], dtype=np.int64)
+        frames = []
+        for position, table in enumerate(order):
+            at = np.flatnonzero(tables[self.rule] == position)
+            codes = self.rule[at]
+            keys = ("row",) + tuple(self.tables[table])
+            frame = pd.DataFrame({keys[0]: rows[at], keys[1]: names[codes], keys[2]: details[at], keys[3]: self.amount[at]})
+            if len(keys) > 4:
+                frame[keys[4]] = pd.Categorical.from_codes(kinds[codes], categories=VALUE_KINDS)
+            frames.append(frame)
+        return tuple(frames)
+
+    def __repr__(self):
+        return f"CodedResults({self.name!r}, {self.rows.size:,} rows, {len(self):,} hits, {self.nbytes / 1e6:.1f} MB)"
+
+
+def calculate_coded(ruleset, roster, row_offset=0, dedup=True, report=None):
+    """
+    CodedResults of `ruleset` for a whole roster.
+
+    Row numbers are the DataFrame index of `roster` (or positions, for a
+    dict of columns) plus `row_offset`. `dedup` and `report` are passed to
+    evaluate_columns.
+    """
+    labels = rule_labels(ruleset)
+    codes = {label.rule_id: code for code, label in enumerate(labels)}
+    hits = list(evaluate_columns(ruleset, roster, notes=NOTE_PARAMS, dedup=dedup, report=report))
+    positions = np.concatenate([hit.rows for hit in hits] or [np.empty(0, dtype=np.int64)])
+    rule = np.concatenate([np.full(hit.rows.size, codes[hit.rule.rule_id], dtype=np.int16) for hit in hits]
+                          or [np.empty(0, dtype=np.int16)])
+    amount = np.concatenate([hit.amounts for hit in hits] or [np.empty(0)])
+    # לפי שורה ואז לפי סדר הכללים, כמו בטבלאות התוצאות
+    sort = np.lexsort((rule, positions))
+    positions, rule, amount = positions[sort], rule[sort], amount[sort]
+    starts = np.concatenate(([0], np.cumsum([hit.rows.size for hit in hits], dtype=np.int64)))
+    gathered, texts = {}, []
+    for column in param_columns(labels):
+        values = np.empty(sort.size, dtype=object if column[0] == "t" else _PARAM_DTYPES[column[0]])
+        for number, hit in enumerate(hits):
+            label = labels[codes[hit.rule.rule_id]]
+            if column in label.columns:
+                values[starts[number]:starts[number + 1]] = hit.notes[label.columns.index(column)]
+        used = np.array([column in label.columns for label in labels], dtype=bool)[rule]
+        gathered[column] = values[sort[used]]
+        if column[0] == "t":
+            texts.append(gathered[column].astype(str))
+    # טקסטים (תוויות מדרגה וכד') - טבלה אחת משותפת לכל עמודות ה-t
+    texts, inverse = np.unique(np.concatenate(texts), return_inverse=True) if texts else (np.empty(0, dtype=str), None)
+    start = 0
+    for column in gathered:
+        if column[0] == "t":
+            size = gathered[column].size
+            gathered[column] = inverse.reshape(-1)[start:start + size].astype(np.int32)
+            start += size
+    if hasattr(roster, "index"):
+        index = np.asarray(roster.index, dtype=np.int64)
+    else:
+        index = None
+    first = np.flatnonzero(np.diff(positions, prepend=-1))  # הפגיעה הראשונה של כל שורה
+    offsets = np.append(first, positions.size).astype(np.int64)
+    rows = (index[positions[first]] if index is not None else positions[first].astype(np.int64)) + row_offset
+    tables = {table: tuple(ruleset.columns[table]) for table in ruleset.tables}
+    return CodedResults(ruleset.name, ruleset.version, tables, labels, rows, offsets, rule, amount, gathered,
+                        tuple(texts.tolist()))
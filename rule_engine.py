@@ -0,0 +1,811 @@
+"""
+מנוע כללים מונחה-נתונים המשותף לשני המחשבונים (app_g, app_g1).
+
+A RuleSet bundles one app's input fields, constants, derived values and an
+ordered tuple of Rule specs. A rule states when it applies, what it is worth
+and how its note reads using only comparisons, `&` / `|` and the `op`
+helpers, so the very same spec runs on one profile (evaluate, plain Python)
+and on whole roster columns (evaluate_columns, NumPy - imported on demand).
+
+Rule-sets are registered by name (get_ruleset("app_g")) and are defined next
+to their constants in benefits_g / benefits_g1; get_ruleset returns them
+compiled with the current rate tables file (rates.py).
+
+Each rule's dependencies (the input fields and constants it reads, directly
+or through derived values) are recorded from the spec itself when the
+rule-set is built, so IncrementalEvaluation re-evaluates only the rules a
+changed field can affect, and batch jobs only the rules a rate change touches.
+The same dependencies drive batch deduplication: evaluate_columns(dedup=True)
+evaluates each rule once per distinct combination of the fields it reads,
+then copies the results back to every row with that combination.
+
+Money is computed in whole agorot (int64 columns, Python ints for one
+profile), so a batch total is the exact sum of the per-soldier amounts and
+the same inputs give the same agorot on every run and machine. A rule-set
+names its money inputs, derived values and rates (`money`); they are
+converted from shekels on the way in and the amounts back to shekels on the
+way out. The rounding points are explicit:
+
+    to_agorot()  inputs and rates, to the nearest agora (half to even)
+    op.divide()  a sum of money divided by a whole number (a daily rate)
+    op.scale()   a sum of money times a fraction (a refund percentage)
+
+each rounding to the nearest agora, half to even. Everything else in the
+rules (sums, caps, tiers, whole multiples) is exact integer arithmetic.
+Notes show sums of money in shekels.
+"""
+import importlib
+import math
+import re
+import string
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple
+
+from benefit_records import VALUE_KIND_ILS, BenefitRecord
+
+# שם הסט -> המודול שמגדיר אותו (כמשתנה RULESET)
+RULESET_MODULES = {
+    "app_g": "benefits_g",
+    "app_g1": "benefits_g1",
+}
+
+# ==============================================================================
+# 1. מרחבי ערכים ופעולות (סקלר / וקטור)
+# ==============================================================================
+class Values:
+    """Read-only-by-convention namespace: v.reserve_days, c.EXPENSE_CEILINGS in rules and note templates."""
+
+    def __init__(self, mapping=()):
+        self.__dict__.update(mapping)
+
+    def __getitem__(self, name):
+        return self.__dict__[name]
+
+    def __contains__(self, name):
+        return name in self.__dict__
+
+    def update(self, mapping):
+        self.__dict__.update(mapping)
+
+    def __repr__(self):
+        return f"Values({self.__dict__!r})"
+
+
+# --- כסף: כל סכום בחישוב הוא מספר שלם של אגורות ---
+AGOROT = 100  # agorot per shekel
+MAX_INPUT_VALUE = 1e12  # largest number normalize_inputs accepts (₪, days, ...)
+
+def to_agorot(value):
+    """
+    Shekels as whole agorot: a number, or a rate dict / TierTable of them.
+
+    Rounds to the nearest agora, half to even (like np.rint on columns);
+    strings, such as tier labels, are kept as they are.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: to_agorot(item) for key, item in value.items()})
+    if hasattr(value, "map_values"):
+        return value.map_values(to_agorot)
+    return round(value * AGOROT)
+
+def to_shekels(agorot):
+    """A sum in agorot in shekels, for display: an int when it is whole, else a float."""
+    return agorot // AGOROT if agorot % AGOROT == 0 else agorot / AGOROT
+
+def _agorot_column(column):
+    import numpy as np
+    return np.rint(np.asarray(column, dtype=np.float64) * AGOROT).astype(np.int64)
+
+
+class ScalarOps:
+    """`op` for a single profile: plain Python (sums of money are int agorot)."""
+
+    minimum = staticmethod(min)
+    maximum = staticmethod(max)
+
+    @staticmethod
+    def divide(agorot, divisor):
+        """agorot / divisor (a positive int), rounded to the nearest agora, half to even."""
+        quotient, remainder = divmod(agorot, divisor)
+        return quotient + (2 * remainder > divisor or (2 * remainder == divisor and quotient % 2 == 1))
+
+    @staticmethod
+    def scale(agorot, factor):
+        """agorot * factor (e.g. a percentage as 0.5), rounded to the nearest agora, half to even."""
+        return round(agorot * factor)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        return if_true if condition else if_false
+
+    @staticmethod
+    def not_(value):
+        return not value
+
+    @staticmethod
+    def tier_by(tables, key, days):
+        """Value from the TierTable registered under `key` (0 when there is none)."""
+        table = tables.get(key)
+        return table.lookup(days) if table else 0
+
+
+class VectorOps:
+    """`op` for roster columns: the NumPy counterparts of ScalarOps."""
+
+    @staticmethod
+    def minimum(a, b):
+        import numpy as np
+        return np.minimum(a, b)
+
+    @staticmethod
+    def maximum(a, b):
+        import numpy as np
+        return np.maximum(a, b)
+
+    @staticmethod
+    def divide(agorot, divisor):
+        import numpy as np
+        quotient, remainder = np.divmod(agorot, divisor)
+        return quotient + ((2 * remainder > divisor) | ((2 * remainder == divisor) & (quotient % 2 == 1)))
+
+    @staticmethod
+    def scale(agorot, factor):
+        import numpy as np
+        return np.rint(np.multiply(agorot, factor)).astype(np.int64)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        import numpy as np
+        return np.where(condition, if_true, if_false)
+
+    @staticmethod
+    def not_(value):
+        import numpy as np
+        return np.logical_not(value)
+
+    @staticmethod
+    def tier_by(tables, key, days):
+        import numpy as np
+        key, days = np.broadcast_arrays(np.asarray(key), np.asarray(days))
+        dtype = np.asarray([value for table in tables.values() for value in table.values] or [0]).dtype
+        out = np.zeros(key.shape, dtype=dtype)
+        for name, table in tables.items():
+            hit = key == name
+            out[hit] = table.lookup(days[hit])
+        return out
+
+# ==============================================================================
+# 2. כללים וסטים של כללים
+# ==============================================================================
+class Rule(NamedTuple):
+    """One entitlement: when it applies, what it is worth and how it is shown."""
+
+    rule_id: str
+    table: str
+    name: str
+    when: Callable  # (v, c, op) -> bool, or a bool array over roster columns
+    amount: Any  # (v, c, op) -> sum of money in agorot, or a fixed amount (NOT_MONETARY when not a sum of money)
+    note: str = ""  # str.format template over v (inputs + derived values) and c (constants)
+    kind: str = VALUE_KIND_ILS
+    labels: Any = None  # extra display fields for the front end (category, chart label, ...)
+
+
+_TEMPLATE_FIELD = re.compile(r"v\.(\w+)")
+_TEMPLATE_CONSTANT = re.compile(r"c\.(\w+)")
+
+def _note_fields(note):
+    """None for a literal note, else the v.<field> names its template reads."""
+    fields = [field for _, field, _, _ in string.Formatter().parse(note) if field is not None]
+    if not fields:
+        return None
+    names = []
+    for field in fields:
+        match = _TEMPLATE_FIELD.match(field)
+        if match and match.group(1) not in names:
+            names.append(match.group(1))
+    return tuple(names)
+
+
+class _ReadRecorder:
+    """Namespace that records which names a rule spec reads (see RuleSet dependencies)."""
+
+    __slots__ = ("_values", "reads")
+
+    def __init__(self, values):
+        self._values = values
+        self.reads = set()
+
+    def __getattr__(self, name):
+        self.reads.add(name)
+        return self._values[name]
+
+    __getitem__ = __getattr__
+
+# ערכי דוגמה למעקב אחר קריאות (ערכים שאינם אפס, כדי שחלוקה לא תיכשל)
+_SAMPLE_VALUES = {int: 1, float: 1.0, bool: True, str: ""}
+
+def _trace(func, v, c):
+    """(input / derived names, constant names) read by func(v, c, op); None if the spec can't be traced."""
+    v, c = _ReadRecorder(v), _ReadRecorder(c)
+    try:
+        func(v, c, ScalarOps)
+    except Exception:  # noqa: BLE001 - כלל שלא ניתן לעקוב אחריו נחשב תלוי בכל הקלטים
+        return None
+    return v.reads, c.reads
+
+
+class RuleSet:
+    """A named, ordered set of rules together with the input fields and constants they read."""
+
+    __slots__ = ("name", "tables", "fields", "defaults", "constants", "derive", "rules", "columns", "version",
+                 "money", "agorot_constants", "dependencies", "constant_dependencies", "derived_dependencies",
+                 "_by_id", "_notes", "_money_fields", "_money_notes", "_plan")
+
+    def __init__(self, name, tables, fields, rules, defaults=None, constants=None, derive=None, columns=None, version="builtin",
+                 money=()):
+        self.name = name
+        self.tables = tuple(tables)
+        self.fields = dict(fields)  # שם שדה -> טיפוס פייתון (int / float / bool / str)
+        self.rules = tuple(rules)
+        self.defaults = dict(defaults or {})
+        # טבלאות תעריפים (מילונים) נעטפות לקריאה בלבד: סט כללים אינו משתנה אחרי שנבנה
+        self.constants = Values({name: MappingProxyType(value) if isinstance(value, dict) else value
+                                 for name, value in (constants or {}).items()})
+        # שמות הקלטים, הערכים הנגזרים והתעריפים שהם סכומי כסף (בשקלים); החישוב עצמו באגורות
+        self.money = frozenset(money)
+        self.agorot_constants = Values({name: to_agorot(value) if name in self.money else value
+                                        for name, value in self.constants.__dict__.items()})
+        self.version = version  # גרסת התעריפים (rates.py); חלק ממפתחות המטמון של התוצאות
+        # שם ערך נגזר -> (v, c, op) -> ערך; מחושבים לפי הסדר, פעם אחת לכל פרופיל / טבלה
+        self.derive = dict(derive or {})
+        self.columns = dict(columns or {})  # table -> display column names
+        self._by_id = {}
+        for rule in self.rules:
+            if rule.rule_id in self._by_id:
+                raise ValueError(f"{name}: duplicate rule id {rule.rule_id!r}")
+            if rule.table not in self.tables:
+                raise ValueError(f"{name}: rule {rule.rule_id!r} targets unknown table {rule.table!r}")
+            self._by_id[rule.rule_id] = rule
+        self._notes = {rule.rule_id: _note_fields(rule.note) for rule in self.rules}
+        # קלטים שמומרים לאגורות, וכללים שההערה שלהם מציגה סכום כסף (המרה חזרה לשקלים)
+        self._money_fields = tuple(name for name in self.fields if name in self.money)
+        self._money_notes = {rule_id: bool(fields and self.money.intersection(fields)) for rule_id, fields in self._notes.items()}
+        # (rule, when, amount, amount is computed, note, note is a template) - בלי בדיקות בכל קריאה
+        self._plan = tuple((rule, rule.when, rule.amount, callable(rule.amount), rule.note, self._notes[rule.rule_id] is not None)
+                           for rule in self.rules)
+        self._trace_dependencies()
+
+    def _trace_dependencies(self):
+        """Fills {name: frozenset} maps of the input fields and constants each rule / derived value reads."""
+        constants = self.agorot_constants.__dict__
+        all_fields, all_constants = frozenset(self.fields), frozenset(constants)
+        values = {name: self.defaults.get(name, _SAMPLE_VALUES.get(kind, 1.0)) for name, kind in self.fields.items()}
+        values.update({name: to_agorot(values[name]) for name in self.money if name in values})
+
+        def resolve(funcs, extra_fields=(), extra_constants=()):
+            fields, names = set(extra_fields), set(extra_constants)
+            traced = [_trace(func, values, constants) for func in funcs if callable(func)]
+            if any(reads is None for reads in traced):
+                return all_fields, all_constants
+            for field_reads, constant_reads in traced:
+                for name in field_reads:
+                    if name in derived:  # ערך נגזר: התלויות שלו במקום שמו
+                        fields |= derived[name][0]
+                        names |= derived[name][1]
+                    else:
+                        fields.add(name)
+                names |= constant_reads
+            return frozenset(fields & all_fields), frozenset(names & all_constants)
+
+        derived = {}
+        for name, func in self.derive.items():
+            derived[name] = resolve([func])
+            values[name] = func(Values(values), self.agorot_constants, ScalarOps)
+        self.derived_dependencies = derived
+        self.dependencies, self.constant_dependencies = {}, {}
+        for rule in self.rules:
+            fields, names = resolve([rule.when, rule.amount], _TEMPLATE_FIELD.findall(rule.note), _TEMPLATE_CONSTANT.findall(rule.note))
+            for field in _TEMPLATE_FIELD.findall(rule.note):
+                if field in derived:
+                    fields, names = fields | derived[field][0], names | derived[field][1]
+            self.dependencies[rule.rule_id], self.constant_dependencies[rule.rule_id] = fields, names
+
+    def derive_into(self, v, c, op, only=None):
+        """Adds the derived values (those named in `only`, if given) to the namespace v, in order."""
+        target = v.__dict__
+        for name, func in self.derive.items():
+            if only is None or name in only:
+                target[name] = func(v, c, op)
+
+    def affected_rules(self, fields=(), constants=()):
+        """Ids (in rule order) of the rules that read any of `fields` or `constants`."""
+        fields, constants = set(fields), set(constants)
+        return tuple(rule.rule_id for rule in self.rules
+                     if fields & self.dependencies[rule.rule_id] or constants & self.constant_dependencies[rule.rule_id])
+
+    def with_constants(self, version=None, **changes):
+        """A copy of the rule-set with some constants replaced (e.g. updated rates), tagged `version`."""
+        unknown = [name for name in changes if name not in self.constants]
+        if unknown:
+            raise KeyError(f"{self.name}: unknown constant(s): {', '.join(unknown)}")
+        return RuleSet(self.name, self.tables, self.fields, self.rules, self.defaults,
+                       dict(self.constants.__dict__, **changes), self.derive, self.columns, version or self.version, self.money)
+
+    @property
+    def required_fields(self):
+        return tuple(name for name in self.fields if name not in self.defaults)
+
+    def rule(self, rule_id):
+        return self._by_id[rule_id]
+
+    def note_fields(self, rule_id):
+        """The v.<field> names a rule's note template reads, in order (empty for a literal note)."""
+        return self._notes[rule_id] or ()
+
+    def __repr__(self):
+        return f"RuleSet({self.name!r}, {len(self.rules)} rules, rates {self.version!r})"
+
+
+def builtin_ruleset(name):
+    """The rule-set registered as `name`, with the rates defined in its module (imported on first use)."""
+    try:
+        module = RULESET_MODULES[name]
+    except KeyError:
+        raise KeyError(f"unknown rule-set {name!r} (known: {', '.join(RULESET_MODULES)})") from None
+    return importlib.import_module(module).RULESET
+
+def get_ruleset(name):
+    """The rule-set registered as `name`, compiled with the current rate tables (see rates.py)."""
+    from rates import current_rates
+    return current_rates().ruleset(name)
+
+def normalize_inputs(ruleset, inputs):
+    """
+    Full inputs dict for `ruleset` from a partial one (e.g. a JSON body).
+
+    Missing optional fields get the rule-set defaults; a missing required
+    field raises KeyError, and a value of the wrong type, a non-finite
+    number (NaN, Infinity) or one above MAX_INPUT_VALUE raises ValueError.
+    """
+    missing = [name for name in ruleset.required_fields if name not in inputs]
+    if missing:
+        raise KeyError(f"missing required field(s): {', '.join(missing)}")
+    profile = {}
+    for name, kind in ruleset.fields.items():
+        value = inputs.get(name, ruleset.defaults.get(name))
+        if kind is str:
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be a string")
+        elif kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{name} must be true or false")
+        elif kind is int:
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"{name} must be a non-negative integer")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+            # JSON מקבל Infinity / NaN; ערך כזה היה נכשל רק בהמשך החישוב (OverflowError)
+            raise ValueError(f"{name} must be a finite non-negative number")
+        if kind in (int, float) and value > MAX_INPUT_VALUE:
+            # ערך עצום (1e307) עובר את הבדיקות למעלה ונכשל בהמרה לאגורות
+            raise ValueError(f"{name} must be at most {MAX_INPUT_VALUE:,.0f}")
+        profile[name] = value
+    return profile
+
+# ==============================================================================
+# 3. הערכה לפרופיל בודד
+# ==============================================================================
+def _agorot_inputs(ruleset, inputs):
+    values = dict(inputs)
+    for name in ruleset._money_fields:
+        if name in values:
+            values[name] = round(values[name] * AGOROT)
+    return values
+
+def _format_note(ruleset, rule, v):
+    """A rule's note for one profile; sums of money in it are shown in shekels."""
+    if not ruleset._money_notes[rule.rule_id]:
+        return rule.note.format(v=v, c=ruleset.constants)
+    money = ruleset.money
+    shown = Values({name: to_shekels(v[name]) if name in money else v[name] for name in ruleset._notes[rule.rule_id]})
+    return rule.note.format(v=shown, c=ruleset.constants)
+
+def iter_hits(ruleset, inputs):
+    """Yields (rule, amount, note) for every rule that applies to one profile, in rule order (amounts in shekels)."""
+    c = ruleset.agorot_constants
+    v = Values(_agorot_inputs(ruleset, inputs))
+    ruleset.derive_into(v, c, ScalarOps)
+    op = ScalarOps
+    for rule, when, amount, computed, note, templated in ruleset._plan:
+        if when(v, c, op):
+            yield (rule, amount(v, c, op) / AGOROT if computed else amount,
+                   _format_note(ruleset, rule, v) if templated else note)
+
+def evaluate(ruleset, inputs):
+    """{table: tuple of BenefitRecord} for one profile."""
+    grouped = {table: [] for table in ruleset.tables}
+    for rule, amount, note in iter_hits(ruleset, inputs):
+        grouped[rule.table].append(BenefitRecord(rule.rule_id, rule.name, note, amount, rule.kind))
+    return {table: tuple(records) for table, records in grouped.items()}
+
+class IncrementalEvaluation:
+    """
+    One profile's evaluation, kept current as its inputs change.
+
+    update() re-derives only the derived values and re-evaluates only the
+    rules whose dependencies include a changed field, and returns the ids of
+    the rules whose result actually changed - a page re-renders only when
+    that is not empty. `evaluations` counts rule evaluations so far.
+    """
+
+    __slots__ = ("ruleset", "inputs", "evaluations", "_values", "_hits")
+
+    def __init__(self, ruleset, inputs):
+        self.ruleset = ruleset
+        self.inputs = dict(inputs)
+        self.evaluations = 0
+        self._values = Values(_agorot_inputs(ruleset, self.inputs))
+        self._hits = {}
+        ruleset.derive_into(self._values, ruleset.agorot_constants, ScalarOps)
+        self._evaluate(ruleset._plan)
+
+    def _evaluate(self, plan):
+        ruleset = self.ruleset
+        v, c, op = self._values, ruleset.agorot_constants, ScalarOps
+        changed = []
+        for rule, when, amount, computed, note, templated in plan:
+            hit = None
+            if when(v, c, op):
+                hit = (amount(v, c, op) / AGOROT if computed else amount,
+                       _format_note(ruleset, rule, v) if templated else note)
+            if self._hits.get(rule.rule_id) != hit:
+                changed.append(rule.rule_id)
+            self._hits[rule.rule_id] = hit
+        self.evaluations += len(plan)
+        return tuple(changed)
+
+    def update(self, inputs):
+        """Applies new values for some inputs; returns the ids (in rule order) of the rules whose result changed."""
+        ruleset = self.ruleset
+        # True == 1, ולכן גם שינוי טיפוס נחשב שינוי
+        changed = {name for name, value in inputs.items()
+                   if name in ruleset.fields and (self.inputs.get(name) != value or type(self.inputs.get(name)) is not type(value))}
+        if not changed:
+            return ()
+        for name in changed:
+            self.inputs[name] = inputs[name]
+            self._values.__dict__[name] = to_agorot(inputs[name]) if name in ruleset.money else inputs[name]
+        stale = {name for name, (fields, _) in ruleset.derived_dependencies.items() if fields & changed}
+        ruleset.derive_into(self._values, ruleset.agorot_constants, ScalarOps, only=stale)
+        return self._evaluate(tuple(entry for entry in ruleset._plan if ruleset.dependencies[entry[0].rule_id] & changed))
+
+    def iter_hits(self):
+        """Yields (rule, amount, note) like iter_hits(ruleset, self.inputs), without evaluating anything."""
+        for rule in self.ruleset.rules:
+            hit = self._hits[rule.rule_id]
+            if hit is not None:
+                yield (rule,) + hit
+
+# ==============================================================================
+# 4. הערכה וקטורית לטבלת משרתים שלמה
+# ==============================================================================
+class ColumnHits(NamedTuple):
+    """Where one rule applies in a roster: row positions, amounts and notes."""
+
+    rule: Rule
+    rows: Any  # int64 positions of the rows the rule applies to
+    amounts: Any  # float64, aligned with rows
+    notes: Any  # list of notes aligned with rows, or one str shared by all of them (a tuple of columns for NOTE_PARAMS)
+
+
+# evaluate_columns(notes=NOTE_PARAMS): הערכים שתבנית ההערה קוראת במקום הטקסט המעוצב
+NOTE_PARAMS = "params"
+
+
+def prepare_columns(ruleset, roster):
+    """(n, {field: NumPy column}) from a DataFrame or dict of columns, with defaults filled in."""
+    import numpy as np
+    present = [name for name in ruleset.fields if name in roster]
+    missing = [name for name in ruleset.required_fields if name not in roster]
+    if missing:
+        raise KeyError(f"Missing required roster column: {', '.join(missing)}")
+    n = len(roster[present[0]]) if present else 0
+    columns = {}
+    for name, kind in ruleset.fields.items():
+        column = np.asarray(roster[name]) if name in roster else np.full(n, ruleset.defaults[name])
+        if kind is int:
+            column = column.astype(np.int64)
+        elif kind is bool:
+            column = column.astype(bool)
+        elif kind is str:
+            column = column.astype(str)
+        elif column.dtype == bool or not np.issubdtype(column.dtype, np.number):
+            column = column.astype(np.float64)
+        columns[name] = column
+    return n, columns
+
+def note_kinds(ruleset):
+    """
+    {rule_id: kinds} of the values each rule's note template reads, in
+    note_fields() order: "bool", "int" (money in agorot), "float" or "str",
+    as the vectorized evaluation produces them.
+    """
+    import numpy as np
+    # שורה אחת של ערכי דוגמה מספיקה: הטיפוס של עמודה אינו תלוי בערכים
+    sample = {name: [ruleset.defaults.get(name, _SAMPLE_VALUES.get(kind, 1.0))] for name, kind in ruleset.fields.items()}
+    _, columns = prepare_columns(ruleset, sample)
+    v = Values({name: _agorot_column(column) if name in ruleset.money else column for name, column in columns.items()})
+    ruleset.derive_into(v, ruleset.agorot_constants, VectorOps)
+    kinds = {"b": "bool", "i": "int", "u": "int", "f": "float"}
+    return {rule.rule_id: tuple(kinds.get(np.asarray(v[name]).dtype.kind, "str") for name in ruleset.note_fields(rule.rule_id))
+            for rule in ruleset.rules}
+
+class DedupReport:
+    """Row and evaluation counts of deduplicated evaluate_columns calls (summed over calls)."""
+
+    __slots__ = ("rows", "profiles", "rule_rows", "evaluated_rows", "parts")
+
+    def __init__(self, rows=0, profiles=0, rule_rows=0, evaluated_rows=0, parts=0):
+        self.rows = rows  # שורות בטבלה
+        # פרופילים שונים (כל שדות הקלט) בכל קריאה, בסכום על הקריאות: פרופיל שחוזר
+        # במקטעים / רסיסים שונים נספר בכל אחד מהם, ולכן זה אינו מספר הפרופילים השונים בטבלה כולה
+        self.profiles = profiles
+        self.rule_rows = rule_rows  # הערכות כלל x שורה ללא איחוד
+        self.evaluated_rows = evaluated_rows  # הערכות כלל x צירוף שונה שבוצעו בפועל
+        self.parts = parts  # קריאות evaluate_columns (מקטעים / רסיסים) שנספרו
+
+    def add(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    @property
+    def ratio(self):
+        """Rule evaluations saved: rows evaluated without deduplication per row actually evaluated."""
+        return self.rule_rows / self.evaluated_rows if self.evaluated_rows else 1.0
+
+    def __str__(self):
+        if self.parts > 1:
+            profiles = f"{self.profiles:,} distinct profiles summed over {self.parts:,} chunks / shards"
+        else:
+            profiles = f"{self.profiles:,} distinct profiles"
+        return (f"{self.rows:,} rows, {profiles}, "
+                f"{self.evaluated_rows:,} of {self.rule_rows:,} rule evaluations ({self.ratio:.1f}x dedup)")
+
+    def __repr__(self):
+        return f"DedupReport({self.rows}, {self.profiles}, {self.rule_rows}, {self.evaluated_rows}, {self.parts})"
+
+
+class _RowGroups:
+    """
+    Distinct combinations of roster columns, over any set of fields.
+
+    Each column is factorized once: booleans and small-range integers are
+    their own codes (no sort), other columns get np.unique codes. A set of
+    fields gets its codes combined into one int64 key per row; keys of a
+    small range are relabelled densely with a bincount, larger ones with
+    np.unique. Any row of a combination can stand for it.
+    """
+
+    def __init__(self, n, columns):
+        self.n = n
+        self.columns = columns
+        self._codes = {}
+        self._groups = {}
+
+    def _code(self, name):
+        """(int64 code of every row, number of possible codes) of one column."""
+        import numpy as np
+        if name not in self._codes:
+            column = self.columns[name]
+            if column.dtype == bool:
+                self._codes[name] = column.astype(np.int64), 2
+            elif column.dtype.kind in "iu" and column.size and int(column.max()) - int(column.min()) < 4 * self.n:
+                low = int(column.min())
+                self._codes[name] = column.astype(np.int64) - low, int(column.max()) - low + 1
+            else:
+                values, inverse = np.unique(column, return_inverse=True)
+                self._codes[name] = inverse.reshape(-1).astype(np.int64), max(values.size, 1)
+        return self._codes[name]
+
+    def groups(self, fields, max_share=0.5):
+        """
+        (representative row positions, combination of every row) for `fields`,
+        or None when there are more than `max_share` * n combinations.
+        """
+        import numpy as np
+        key = frozenset(fields)
+        if key not in self._groups:
+            limit = max_share * self.n
+            combined, size = np.zeros(self.n, dtype=np.int64), 1
+            groups = None
+            for name in sorted(key):
+                code, cardinality = self._code(name)
+                if cardinality > limit:
+                    break
+                if size * cardinality >= 2 ** 62:
+                    _, combined = np.unique(combined, return_inverse=True)
+                    combined, size = combined.reshape(-1), int(combined.max()) + 1
+                combined, size = combined * cardinality + code, size * cardinality
+            else:
+                if size <= 4 * self.n:
+                    present = np.bincount(combined, minlength=size) > 0
+                    inverse = (np.cumsum(present) - 1)[combined]
+                    first = np.empty(int(present.sum()), dtype=np.int64)
+                    first[inverse] = np.arange(self.n)
+                else:
+                    _, first, inverse = np.unique(combined, return_index=True, return_inverse=True)
+                    inverse = inverse.reshape(-1)
+                if first.size <= limit or not key:
+                    groups = first, inverse
+            self._groups[key] = groups
+        return self._groups[key]
+
+    def count(self, fields):
+        """Number of distinct combinations of `fields`."""
+        groups = self.groups(fields, max_share=1.0)
+        return groups[0].size if groups is not None else self.n
+
+
+def _evaluate_rule(ruleset, rule, v, c, n, notes):
+    """(rows, amounts, note) of one rule over n rows of v, or None when it applies to none."""
+    import numpy as np
+    rows = np.flatnonzero(np.broadcast_to(np.asarray(rule.when(v, c, VectorOps), dtype=bool), (n,)))
+    if rows.size == 0:
+        return None
+    if callable(rule.amount):
+        # אגורות -> שקלים, רק ביציאה
+        amounts = np.broadcast_to(np.asarray(rule.amount(v, c, VectorOps)), (n,))[rows] / AGOROT
+    else:
+        amounts = np.broadcast_to(np.asarray(rule.amount, dtype=np.float64), (n,))[rows]
+    fields = ruleset._notes[rule.rule_id]
+    if notes == NOTE_PARAMS:
+        note = tuple(np.broadcast_to(v[name], (n,))[rows] for name in fields or ())
+    elif not notes or fields is None:
+        note = rule.note
+    elif not fields:
+        note = rule.note.format(v=v, c=ruleset.constants)
+    else:
+        note = render_notes(ruleset, rule, [np.broadcast_to(v[name], (n,))[rows] for name in fields], rows.size)
+    return rows, amounts, note
+
+def render_notes(ruleset, rule, params, size):
+    """
+    `size` notes of `rule` as a list of str, from the values its template
+    reads: `params` holds one column per note_fields() name (sums of money
+    in agorot, as evaluate_columns(notes=NOTE_PARAMS) returns them).
+    """
+    fields = ruleset._notes[rule.rule_id]
+    if not fields:
+        return [rule.note if fields is None else rule.note.format(v=Values(), c=ruleset.constants)] * size
+    # ערכי פייתון רגילים (וסכומים בשקלים), כדי שהעיצוב יהיה זהה לחישוב הבודד
+    values = []
+    for name, column in zip(fields, params):
+        column = column.tolist()
+        values.append([to_shekels(value) for value in column] if name in ruleset.money else column)
+    return [rule.note.format(v=Values(zip(fields, row)), c=ruleset.constants) for row in zip(*values)]
+
+def evaluate_columns(ruleset, roster, notes=True, rule_ids=None, dedup=False, report=None):
+    """
+    Vectorized evaluate: yields ColumnHits for each rule that applies to at least one row.
+
+    With notes=False the per-row note formatting is skipped and every hit
+    carries the rule's raw note template (much faster on millions of rows);
+    with notes=NOTE_PARAMS it carries instead the values the template reads,
+    one column per note_fields() name, for render_notes() to format later.
+    `rule_ids` restricts the evaluation to those rules (e.g. affected_rules()).
+
+    With dedup=True each rule is evaluated once per distinct combination of
+    the input fields it reads (its traced dependencies) and the results are
+    scattered back to the rows: a grant that reads only the days and the
+    unit type is computed for a few hundred combinations, not per soldier.
+    Rules whose fields are mostly distinct are evaluated row by row. A
+    DedupReport passed as `report` receives the counts.
+    """
+    import numpy as np
+    n, columns = prepare_columns(ruleset, roster)
+    columns = {name: _agorot_column(column) if name in ruleset.money else column for name, column in columns.items()}
+    c = ruleset.agorot_constants
+    v = Values(columns)
+    ruleset.derive_into(v, c, VectorOps)
+    rules = ruleset.rules
+    if rule_ids is not None:
+        rule_ids = set(rule_ids)
+        rules = [rule for rule in rules if rule.rule_id in rule_ids]
+    groups = _RowGroups(n, columns) if dedup else None
+    if report is not None:
+        report.rows += n
+        report.parts += 1
+        report.profiles += groups.count(ruleset.fields) if groups is not None else n
+        report.rule_rows += n * len(rules)
+    representatives = {}  # שדות -> ערכי השורות המייצגות (קלט ונגזרים)
+    for rule in rules:
+        grouped = groups.groups(ruleset.dependencies[rule.rule_id]) if groups is not None else None
+        if grouped is None:
+            hit = _evaluate_rule(ruleset, rule, v, c, n, notes)
+            if report is not None:
+                report.evaluated_rows += n
+            if hit is not None:
+                yield ColumnHits(rule, *hit)
+            continue
+        first, inverse = grouped
+        key = ruleset.dependencies[rule.rule_id]
+        if key not in representatives:
+            representatives[key] = Values({name: value[first] if np.ndim(value) else value
+                                           for name, value in v.__dict__.items()})
+        hit = _evaluate_rule(ruleset, rule, representatives[key], c, first.size, notes)
+        if report is not None:
+            report.evaluated_rows += first.size
+        if hit is None:
+            continue
+        # פיזור התוצאה של כל צירוף לכל השורות שלו
+        unique_rows, unique_amounts, note = hit
+        slot = np.full(first.size, -1, dtype=np.int64)
+        slot[unique_rows] = np.arange(unique_rows.size)
+        slots = slot[inverse]
+        rows = np.flatnonzero(slots >= 0)
+        slots = slots[rows]
+        if isinstance(note, tuple):
+            note = tuple(column[slots] for column in note)
+        elif not isinstance(note, str):
+            note = np.asarray(note, dtype=object)[slots]
+        yield ColumnHits(rule, rows, unique_amounts[slots], note)
+
+# ==============================================================================
+# 5. הערכה על רשת תרחישים (מכפלה קרטזית של ערכי קלט)
+# ==============================================================================
+def _grid_dtype(kind):
+    import numpy as np
+    return {int: np.int64, bool: bool, str: str}.get(kind, np.float64)
+
+def evaluate_grid(ruleset, axes, base):
+    """
+    Dense monetary totals per table over the Cartesian product of `axes`.
+
+    `axes` maps input fields to 1-D sequences of values, one grid dimension
+    each (in order); `base` supplies the other fields (rule-set defaults
+    apply). Every axis stays a broadcastable array such as shape (1, D, 1),
+    so rules only expand to the full grid where they combine axes, and
+    string comparisons run on the short axis alone.
+
+    Returns {table: float64 array of shape (len(axis), ...)}; amounts that
+    are not a sum of money are not counted.
+    """
+    import numpy as np
+    unknown = [name for name in axes if name not in ruleset.fields]
+    if unknown:
+        raise KeyError(f"unknown grid field(s): {', '.join(unknown)}")
+    names = list(axes)
+    shape = tuple(len(axes[name]) for name in names)
+    columns = {}
+    for name, kind in ruleset.fields.items():
+        if name in axes:
+            position = names.index(name)
+            columns[name] = np.asarray(axes[name], dtype=_grid_dtype(kind)).reshape(
+                [-1 if i == position else 1 for i in range(len(shape))])
+        elif name in base or name in ruleset.defaults:
+            columns[name] = np.asarray(base[name] if name in base else ruleset.defaults[name], dtype=_grid_dtype(kind))
+        else:
+            raise KeyError(f"missing required field: {name}")
+        if name in ruleset.money:
+            columns[name] = _agorot_column(columns[name])
+    c = ruleset.agorot_constants
+    v = Values(columns)
+    ruleset.derive_into(v, c, VectorOps)
+    totals = {table: np.zeros(shape, dtype=np.int64) for table in ruleset.tables}
+    for rule in ruleset.rules:
+        if rule.kind != VALUE_KIND_ILS:
+            continue
+        applies = np.asarray(rule.when(v, c, VectorOps), dtype=bool)
+        if not applies.any():
+            continue
+        if callable(rule.amount):
+            amount = rule.amount(v, c, VectorOps)
+        elif math.isnan(rule.amount):
+            continue  # NOT_MONETARY
+        else:
+            amount = to_agorot(rule.amount)  # סכום קבוע בשקלים, כמו בעמודות התוצאה
+        np.add(totals[rule.table], np.asarray(amount, dtype=np.int64), out=totals[rule.table], where=applies)
+    return {table: total / AGOROT for table, total in totals.items()}
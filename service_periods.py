@@ -0,0 +1,167 @@
+"""
+תקופות שירות לפי תאריכים: אינדקס אינטרוולים לכל משרת, ימים לפי חודש קלנדרי וחפיפה לתקופות חגים.
+
+A soldier's call-ups are a list of (start, end) dates, both days included,
+that may overlap or follow each other (a call-up extended by a new order).
+ServicePeriods merges the call-ups of a whole roster into an interval index:
+per soldier, sorted and disjoint day ranges, stored as flat NumPy arrays with
+offsets (soldier i owns intervals offsets[i]:offsets[i+1]). Every query is
+vectorized over all the intervals of all soldiers at once:
+
+    days()          distinct days of service per soldier
+    month_days()    (soldier, calendar month, days) for every month served
+    months_served() calendar months with at least one day of service
+    month_share()   the months served, each counted as its share of days served
+    overlap_days()  days that fall inside another set of periods (holidays)
+
+fields() turns these into the rule-engine inputs (reserve_days,
+service_months, service_month_share, holiday_days), so the per-calendar-month
+caps and the holiday rules use the actual dates instead of a day count and a
+yes/no answer.
+"""
+import numpy as np
+
+
+def _days(values):
+    """Day numbers (days since 1970-01-01) of dates, ISO strings or datetime64 values."""
+    return np.asarray(values, dtype="datetime64[D]").astype(np.int64)
+
+def _month(days):
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+def _month_start(months):
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+class ServicePeriods:
+    """Merged service intervals of `n` soldiers (day numbers, both ends included)."""
+
+    __slots__ = ("n", "offsets", "owner", "starts", "ends")
+
+    def __init__(self, n, owner, starts, ends):
+        self.n = n
+        self.owner = owner
+        self.starts = starts
+        self.ends = ends
+        self.offsets = np.searchsorted(owner, np.arange(n + 1))
+
+    @classmethod
+    def from_intervals(cls, owner, starts, ends, n=None):
+        """
+        Interval index of call-ups given as parallel columns.
+
+        `owner` is each call-up's soldier (roster position 0..n-1); `starts`
+        and `ends` are dates. Overlapping and adjacent call-ups of the same
+        soldier are merged. Raises ValueError for a call-up that ends before
+        it starts.
+        """
+        owner = np.asarray(owner, dtype=np.int64)
+        starts, ends = _days(starts), _days(ends)
+        if n is None:
+            n = int(owner.max()) + 1 if owner.size else 0
+        if owner.size == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(n, empty, empty, empty)
+        if (ends < starts).any():
+            raise ValueError("a service period ends before it starts")
+        if owner.min() < 0 or owner.max() >= n:
+            raise ValueError(f"service period owners must be roster positions 0..{n - 1}")
+        order = np.lexsort((starts, owner))
+        owner, starts, ends = owner[order], starts[order], ends[order]
+        # סוף רץ (מקסימום מצטבר) לכל משרת: הזזה לפי המשרת כך שהמקסימום אינו חוצה משרתים
+        base = starts.min()
+        span = int(ends.max() - base) + 2
+        shifted_ends = np.maximum.accumulate(owner * span + (ends - base))
+        previous = np.concatenate(([-span], shifted_ends[:-1]))
+        new = owner * span + (starts - base) > previous + 1  # רווח של יום לפחות; תקופות צמודות מתמזגות
+        first = np.flatnonzero(new)
+        last = np.concatenate((first[1:] - 1, [owner.size - 1]))
+        merged_owner = owner[first]
+        return cls(n, merged_owner, starts[first], shifted_ends[last] - merged_owner * span + base)
+
+    @classmethod
+    def from_dates(cls, periods):
+        """Interval index of one soldier from (start, end) pairs."""
+        periods = list(periods)
+        return cls.from_intervals(np.zeros(len(periods), dtype=np.int64),
+                                  [start for start, _ in periods], [end for _, end in periods], n=1)
+
+    def intervals(self, soldier):
+        """The merged (start, end) datetime64[D] intervals of one soldier."""
+        window = slice(self.offsets[soldier], self.offsets[soldier + 1])
+        return list(zip(self.starts[window].astype("datetime64[D]"), self.ends[window].astype("datetime64[D]")))
+
+    def days(self):
+        """Distinct days of service of every soldier (int64, length n)."""
+        return np.bincount(self.owner, weights=self.ends - self.starts + 1, minlength=self.n).astype(np.int64)
+
+    def month_days(self):
+        """
+        (owner, month, days) arrays: the days served in every calendar month
+        with any service, sorted by soldier and month (month is datetime64[M]).
+        """
+        first_month, last_month = _month(self.starts), _month(self.ends)
+        counts = last_month - first_month + 1
+        interval = np.repeat(np.arange(self.owner.size), counts)
+        step = np.arange(interval.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        month = first_month[interval] + step
+        # החלק של כל אינטרוול שנופל בחודש
+        days = (np.minimum(self.ends[interval], _month_start(month + 1) - 1)
+                - np.maximum(self.starts[interval], _month_start(month)) + 1)
+        # אינטרוולים נפרדים של אותו משרת יכולים ליפול באותו חודש
+        lowest = month.min() if month.size else 0
+        span = int(month.max() - lowest) + 1 if month.size else 1
+        keys, inverse = np.unique(self.owner[interval] * span + (month - lowest), return_inverse=True)
+        months = (keys % span + lowest).astype("datetime64[M]")
+        return keys // span, months, np.bincount(inverse.reshape(-1), weights=days, minlength=keys.size).astype(np.int64)
+
+    def months_served(self):
+        """Number of calendar months with at least one day of service, per soldier."""
+        owner, _, _ = self.month_days()
+        return np.bincount(owner, minlength=self.n).astype(np.int64)
+
+    def month_share(self):
+        """
+        Sum over the calendar months served of the share of the month's days
+        that were served, per soldier (float64: 10 days of a 30-day month
+        count as 1/3).
+        """
+        owner, months, days = self.month_days()
+        length = _month_start(months.astype(np.int64) + 1) - _month_start(months.astype(np.int64))
+        return np.bincount(owner, weights=days / length, minlength=self.n)
+
+    def overlap_days(self, other):
+        """
+        Days of service of every soldier that fall inside `other`, a
+        one-soldier ServicePeriods such as a holiday calendar.
+        """
+        if other.n != 1:
+            raise ValueError("overlap_days() takes a single set of periods")
+        if other.owner.size == 0:
+            return np.zeros(self.n, dtype=np.int64)
+        cumulative = np.concatenate(([0], np.cumsum(other.ends - other.starts + 1)))
+
+        def covered_before(day):
+            # ימים של `other` לפני `day`: אינטרוולים שמתחילים לפניו, פחות החלק שאחריו
+            k = np.searchsorted(other.starts, day, side="left")
+            tail = np.where(k > 0, np.maximum(0, other.ends[np.maximum(k - 1, 0)] + 1 - day), 0)
+            return cumulative[k] - tail
+
+        overlap = covered_before(self.ends + 1) - covered_before(self.starts)
+        return np.bincount(self.owner, weights=overlap, minlength=self.n).astype(np.int64)
+
+    def fields(self, holidays=None):
+        """Rule-engine input columns: reserve_days, service_months, service_month_share and (with `holidays`) holiday_days."""
+        fields = {"reserve_days": self.days(), "service_months": self.months_served(), "service_month_share": self.month_share()}
+        if holidays is not None:
+            fields["holiday_days"] = self.overlap_days(holidays)
+        return fields
+
+
+def holiday_calendar(periods):
+    """One-soldier ServicePeriods of (start, end) holiday periods, for overlap_days()."""
+    return ServicePeriods.from_dates(periods)
+
+def service_fields(periods, holidays=None):
+    """fields() of one soldier's (start, end) call-ups, as plain Python numbers."""
+    return {name: column[0].item() for name, column in ServicePeriods.from_dates(periods).fields(holidays).items()}
@@ -0,0 +1,45 @@
+"""
+טבלאות מדרגות לפי ימי שירות (מענק שנתי, נקודות זכות, שוברים וכו').
+
+Threshold dicts such as {37: 5400, 20: 4050, ...} are compiled once into
+sorted breakpoint/value tuples. A lookup returns the value of the highest
+threshold reached, independent of the dict's insertion order. Scalars are
+resolved with bisect; arrays (NumPy, pandas, lists) with np.searchsorted.
+"""
+import bisect
+
+
+class TierTable:
+    """Sorted day-count breakpoints with the value unlocked at each one."""
+
+    __slots__ = ("breakpoints", "values", "default", "_np_breakpoints", "_np_values")
+
+    def __init__(self, thresholds, default=0):
+        items = sorted(thresholds.items())
+        self.breakpoints = tuple(days for days, _ in items)
+        self.values = tuple(value for _, value in items)
+        self.default = default
+        self._np_breakpoints = None
+        self._np_values = None
+
+    def lookup(self, days):
+        """Value of the highest tier with threshold <= days, or `default` below the first tier."""
+        if getattr(days, "ndim", 0) == 0 and not isinstance(days, (list, tuple)):
+            i = bisect.bisect_right(self.breakpoints, days)
+            return self.values[i - 1] if i else self.default
+        return self._lookup_array(days)
+
+    def _lookup_array(self, days):
+        import numpy as np
+        if self._np_values is None:
+            self._np_breakpoints = np.asarray(self.breakpoints)
+            # אינדקס 0 שמור לערך ברירת המחדל (מתחת למדרגה הראשונה)
+            self._np_values = np.asarray((self.default,) + self.values)
+        return self._np_values[np.searchsorted(self._np_breakpoints, np.asarray(days), side="right")]
+
+    def map_values(self, func):
+        """A TierTable with the same breakpoints and func() of every value (and of the default)."""
+        return TierTable(dict(zip(self.breakpoints, map(func, self.values))), default=func(self.default))
+
+    def __repr__(self):
+        return f"TierTable({dict(zip(self.breakpoints, self.values))!r}, default={self.default!r})"